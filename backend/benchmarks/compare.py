@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+Compare two benchmark result files.
+
+Usage (from backend/):
+    python -m benchmarks.compare baseline.json candidate.json --threshold 0.10
+
+Exits with status 1 if any measurement regressed by more than the threshold.
+"""
+import argparse
+import json
+import sys
+
+
+def _load(path: str):
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    return report["meta"], {
+        (r["component"], r["operation"], r["size"]): r for r in report["results"]
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline", help="Results of the reference commit")
+    parser.add_argument("candidate", help="Results of the commit under test")
+    parser.add_argument("--metric", default="median_seconds", help="Result field to compare")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative slowdown reported as a regression (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    base_meta, baseline = _load(args.baseline)
+    cand_meta, candidate = _load(args.candidate)
+    print(f"baseline:  {base_meta.get('commit', 'unknown')[:12]}  ({base_meta.get('timestamp')})")
+    print(f"candidate: {cand_meta.get('commit', 'unknown')[:12]}  ({cand_meta.get('timestamp')})")
+    print()
+    print(f"{'benchmark':<40} {'size':>9} {'baseline':>12} {'candidate':>12} {'change':>9}")
+
+    regressions = 0
+    for key in sorted(set(baseline) | set(candidate)):
+        name = f"{key[0]}.{key[1]}"
+        base = baseline.get(key, {}).get(args.metric)
+        cand = candidate.get(key, {}).get(args.metric)
+        if base is None or cand is None:
+            print(f"{name:<40} {key[2]:>9} {'-' if base is None else f'{base * 1000:.2f}ms':>12} "
+                  f"{'-' if cand is None else f'{cand * 1000:.2f}ms':>12} {'n/a':>9}")
+            continue
+        change = (cand - base) / base if base else 0.0
+        marker = ""
+        if change > args.threshold:
+            regressions += 1
+            marker = "  REGRESSION"
+        print(f"{name:<40} {key[2]:>9} {base * 1000:>10.2f}ms {cand * 1000:>10.2f}ms {change:>+8.1%}{marker}")
+
+    print()
+    print(f"{regressions} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
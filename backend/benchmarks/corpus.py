@@ -0,0 +1,151 @@
+"""
+Deterministic synthetic legal corpus for benchmarks.
+
+Produces mixed English/Bengali statute-like text from fixed vocabularies
+and a seeded RNG, so the same arguments always yield the same corpus.
+"""
+import random
+from typing import Dict, List, Tuple
+
+ENGLISH_SUBJECTS = [
+    "the tenant", "the landlord", "the accused", "the petitioner", "the respondent",
+    "the Government", "the employer", "the worker", "the company", "the court",
+    "the Magistrate", "the Registrar", "any person", "the purchaser", "the trustee",
+]
+ENGLISH_VERBS = [
+    "shall pay", "may apply for", "shall be liable for", "is entitled to", "shall not transfer",
+    "may appeal against", "shall submit", "shall be punished with", "may revoke", "shall register",
+]
+ENGLISH_OBJECTS = [
+    "the rent due under the lease", "compensation for the loss suffered", "a writ of certiorari",
+    "imprisonment for a term which may extend to seven years", "the deed of transfer",
+    "the order of the Tribunal", "a certified copy of the judgment", "the security deposit",
+    "the licence issued under this Act", "maintenance at the prescribed rate",
+]
+ENGLISH_QUALIFIERS = [
+    "within thirty days of the notice", "subject to the provisions of section {n}",
+    "notwithstanding anything contained in any other law", "in the manner prescribed by rules",
+    "before the High Court Division", "under Article {n} of the Constitution",
+    "unless the court otherwise directs", "on or before the seventh day of each month",
+]
+BENGALI_SENTENCES = [
+    "ভাড়াটিয়া প্রতি মাসের সাত তারিখের মধ্যে ভাড়া পরিশোধ করিবেন।",
+    "দণ্ডবিধির {n} ধারায় এই অপরাধের শাস্তির বিধান রয়েছে।",
+    "কোন ব্যক্তি এই আইনের অধীন প্রদত্ত আদেশের বিরুদ্ধে আপীল করিতে পারিবেন।",
+    "সরকার, সরকারি গেজেটে প্রজ্ঞাপন দ্বারা, এই আইনের উদ্দেশ্য পূরণকল্পে বিধি প্রণয়ন করিতে পারিবে।",
+    "হাইকোর্ট বিভাগ সংবিধানের {n} অনুচ্ছেদের অধীন রিট আবেদন গ্রহণ করিতে পারিবে।",
+    "নিয়োগকারী শ্রমিককে নির্ধারিত হারে ক্ষতিপূরণ প্রদান করিতে বাধ্য থাকিবেন।",
+    "দলিল রেজিস্ট্রেশনের জন্য নির্ধারিত ফি প্রদান করিতে হইবে।",
+]
+QUERY_TEMPLATES = [
+    "What is the punishment under section {n}?",
+    "When must {subject} pay {object}?",
+    "Can {subject} appeal against the order of the Tribunal?",
+    "How to file a writ petition under Article {n}?",
+    "ধারা {n} অনুযায়ী শাস্তি কী?",
+    "ভাড়া পরিশোধের সময়সীমা কত?",
+]
+
+
+def _english_sentence(rng: random.Random) -> str:
+    qualifier = rng.choice(ENGLISH_QUALIFIERS).format(n=rng.randint(1, 500))
+    sentence = f"{rng.choice(ENGLISH_SUBJECTS)} {rng.choice(ENGLISH_VERBS)} {rng.choice(ENGLISH_OBJECTS)} {qualifier}."
+    return sentence[0].upper() + sentence[1:]
+
+
+def _bengali_sentence(rng: random.Random) -> str:
+    return rng.choice(BENGALI_SENTENCES).format(n=rng.randint(1, 500))
+
+
+def generate_text(rng: random.Random, length: int, bengali_ratio: float = 0.3) -> str:
+    """
+    Generate roughly `length` characters of section-structured legal text.
+
+    Args:
+        rng: Seeded random generator
+        length: Target length in characters
+        bengali_ratio: Fraction of Bengali sentences
+
+    Returns:
+        str: Generated text
+    """
+    parts = []
+    size = 0
+    section = rng.randint(1, 400)
+    while size < length:
+        if rng.random() < 0.15:
+            section += 1
+            paragraph = f"\n\nSection {section}. "
+        else:
+            paragraph = " "
+        sentence = _bengali_sentence(rng) if rng.random() < bengali_ratio else _english_sentence(rng)
+        parts.append(paragraph + sentence)
+        size += len(paragraph) + len(sentence)
+    return "".join(parts).strip()
+
+
+def generate_documents(count: int, length: int = 20000, seed: int = 42, bengali_ratio: float = 0.3) -> List[str]:
+    """
+    Generate full documents (e.g. for chunking benchmarks).
+
+    Args:
+        count: Number of documents
+        length: Characters per document
+        seed: RNG seed
+        bengali_ratio: Fraction of Bengali sentences
+
+    Returns:
+        List of document texts
+    """
+    rng = random.Random(seed)
+    return [generate_text(rng, length, bengali_ratio) for _ in range(count)]
+
+
+def generate_chunks(count: int, length: int = 1000, seed: int = 42, bengali_ratio: float = 0.3) -> Tuple[List[str], List[Dict]]:
+    """
+    Generate chunk-sized texts with metadata resembling ingested chunks.
+
+    Args:
+        count: Number of chunks
+        length: Characters per chunk
+        seed: RNG seed
+        bengali_ratio: Fraction of Bengali sentences
+
+    Returns:
+        Tuple of (texts, metadatas)
+    """
+    rng = random.Random(seed)
+    texts = []
+    metadatas = []
+    chunks_per_document = 50
+    for i in range(count):
+        texts.append(generate_text(rng, length, bengali_ratio))
+        document = i // chunks_per_document
+        metadatas.append({
+            "filename": f"gazette_{document:06d}.pdf",
+            "source": f"data/uploads/gazette_{document:06d}.pdf",
+            "chunk_index": i % chunks_per_document,
+        })
+    return texts, metadatas
+
+
+def generate_queries(count: int, seed: int = 7) -> List[str]:
+    """
+    Generate user-style questions in English and Bengali.
+
+    Args:
+        count: Number of queries
+        seed: RNG seed
+
+    Returns:
+        List of query strings
+    """
+    rng = random.Random(seed)
+    return [
+        rng.choice(QUERY_TEMPLATES).format(
+            n=rng.randint(1, 500),
+            subject=rng.choice(ENGLISH_SUBJECTS),
+            object=rng.choice(ENGLISH_OBJECTS),
+        )
+        for _ in range(count)
+    ]
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+"""
+Component microbenchmarks.
+
+Benchmarks Chunker.chunk_text, VectorStoreRepository.add_documents /
+hybrid_search, EmbeddingService.embed_documents and Reranker.rerank on a
+deterministic synthetic corpus at several sizes, and writes the results as
+JSON so two commits can be compared with benchmarks/compare.py.
+
+Runs offline on CPU: models must already be in the local HuggingFace cache.
+
+Usage (from backend/):
+    python -m benchmarks.run --output bench-results.json
+    python -m benchmarks.run --components chunker,vector_store --sizes 1000,10000,100000,1000000
+"""
+import os
+
+# Offline, CPU-only; must be set before any model library is imported
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+from benchmarks.corpus import generate_chunks, generate_documents, generate_queries
+
+COMPONENTS = ("chunker", "vector_store", "embedder", "reranker")
+DEFAULT_SIZES = (1000, 10000, 100000)
+EMBEDDING_DIM = 384
+STORE_BATCH_SIZE = 5000
+
+
+def _measure(func: Callable[[], None], repeat: int) -> List[float]:
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def _percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))]
+
+
+def _result(component: str, operation: str, size: int, items: int, durations: List[float], **extra) -> Dict:
+    median = statistics.median(durations)
+    result = {
+        "component": component,
+        "operation": operation,
+        "size": size,
+        "items": items,
+        "runs": len(durations),
+        "min_seconds": min(durations),
+        "median_seconds": median,
+        "mean_seconds": statistics.fmean(durations),
+        "throughput_per_second": items / median if median > 0 else None,
+    }
+    result.update(extra)
+    print(f"  {component}.{operation} size={size}: median {median * 1000:.1f} ms "
+          f"({result['throughput_per_second'] or 0:.0f} items/s)", flush=True)
+    return result
+
+
+def bench_chunker(sizes, repeat: int, seed: int) -> List[Dict]:
+    from src.core.chunking import Chunker
+
+    chunker = Chunker()
+    results = []
+    for size in sizes:
+        # Documents of ~20 chunks each until `size` chunks are produced
+        documents = generate_documents(max(1, size // 20), length=20000, seed=seed)
+        produced = sum(len(chunker.chunk_text(doc)) for doc in documents)  # Also warms up
+        durations = _measure(lambda: [chunker.chunk_text(doc, {"filename": "bench.pdf"}) for doc in documents], repeat)
+        results.append(_result("chunker", "chunk_text", size, produced, durations,
+                               characters=sum(len(doc) for doc in documents)))
+    return results
+
+
+def bench_vector_store(sizes, repeat: int, seed: int, queries: int) -> List[Dict]:
+    import numpy as np
+    from src.repositories.vector_store_repo import VectorStoreRepository
+
+    rng = np.random.default_rng(seed)
+    query_texts = generate_queries(queries, seed=seed)
+    results = []
+    for size in sizes:
+        texts, metadatas = generate_chunks(size, seed=seed)
+        embeddings = rng.standard_normal((size, EMBEDDING_DIM), dtype=np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        query_embeddings = rng.standard_normal((queries, EMBEDDING_DIM), dtype=np.float32)
+
+        with tempfile.TemporaryDirectory(prefix="legalai-bench-") as directory:
+            repo = VectorStoreRepository(persist_directory=directory, collection_name="bench")
+
+            def add_all():
+                # As bulk ingestion does: no BM25 rebuild per batch, one load at the end
+                for start in range(0, size, STORE_BATCH_SIZE):
+                    end = start + STORE_BATCH_SIZE
+                    repo.add_documents(texts[start:end], embeddings[start:end].tolist(), metadatas[start:end],
+                                       update_lexical=False)
+
+            # Writes are not idempotent: measured once per size
+            durations = _measure(add_all, 1)
+            results.append(_result("vector_store", "add_documents", size, size, durations,
+                                   batch_size=STORE_BATCH_SIZE))
+            durations = _measure(lambda: repo.sync_lexical_index(force=True), 1)
+            results.append(_result("vector_store", "load_lexical_index", size, size, durations))
+
+            latencies = []
+            for _ in range(repeat):
+                for text, embedding in zip(query_texts, query_embeddings):
+                    started = time.perf_counter()
+                    repo.hybrid_search(embedding.tolist(), text, k=10)
+                    latencies.append(time.perf_counter() - started)
+            results.append(_result("vector_store", "hybrid_search", size, 1, latencies,
+                                   p95_seconds=_percentile(latencies, 95),
+                                   p99_seconds=_percentile(latencies, 99)))
+    return results
+
+
+def bench_embedder(sizes, repeat: int, seed: int, max_items: int) -> List[Dict]:
+    from src.services.embedding_service import EmbeddingService
+
+    embedder = EmbeddingService()
+    embedder.embed_documents(["warmup"])
+    results = []
+    for size in sizes:
+        if size > max_items:
+            print(f"  embedder size={size}: skipped (above --max-model-items={max_items})")
+            continue
+        texts, _ = generate_chunks(size, seed=seed)
+        durations = _measure(lambda: embedder.embed_documents(texts), repeat)
+        results.append(_result("embedder", "embed_documents", size, size, durations, backend=embedder.backend))
+    return results
+
+
+def bench_reranker(sizes, repeat: int, seed: int, max_items: int, candidates: int = 10) -> List[Dict]:
+    from src.utils.reranker import Reranker
+
+    reranker = Reranker(cache_size=0)  # Measure the model, not the score cache
+    results = []
+    for size in sizes:
+        if size > max_items:
+            print(f"  reranker size={size}: skipped (above --max-model-items={max_items})")
+            continue
+        query_count = max(1, size // candidates)
+        texts, _ = generate_chunks(query_count * candidates, seed=seed)
+        queries = generate_queries(query_count, seed=seed)
+
+        def rerank_all():
+            for i, query in enumerate(queries):
+                reranker.rerank(query, texts[i * candidates:(i + 1) * candidates], top_k=5)
+
+        durations = _measure(rerank_all, repeat)
+        results.append(_result("reranker", "rerank", size, query_count * candidates, durations,
+                               candidates_per_query=candidates, backend=reranker.backend))
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run component microbenchmarks")
+    parser.add_argument("--components", default=",".join(COMPONENTS),
+                        help=f"Comma-separated subset of: {', '.join(COMPONENTS)}")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="Comma-separated corpus sizes in chunks (1000-1000000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed repetitions per measurement")
+    parser.add_argument("--queries", type=int, default=50, help="Queries per hybrid_search measurement")
+    parser.add_argument("--max-model-items", type=int, default=10000,
+                        help="Largest size run through the embedder/reranker models")
+    parser.add_argument("--seed", type=int, default=42, help="Corpus seed")
+    parser.add_argument("--output", default="bench-results.json", help="Where to write the JSON results")
+    args = parser.parse_args(argv)
+
+    components = [c.strip() for c in args.components.split(",") if c.strip()]
+    unknown = set(components) - set(COMPONENTS)
+    if unknown:
+        parser.error(f"Unknown components: {', '.join(sorted(unknown))}")
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    results = []
+    for component in components:
+        print(f"Benchmarking {component}...", flush=True)
+        if component == "chunker":
+            results += bench_chunker(sizes, args.repeat, args.seed)
+        elif component == "vector_store":
+            results += bench_vector_store(sizes, args.repeat, args.seed, args.queries)
+        elif component == "embedder":
+            results += bench_embedder(sizes, args.repeat, args.seed, args.max_model_items)
+        elif component == "reranker":
+            results += bench_reranker(sizes, args.repeat, args.seed, args.max_model_items)
+
+    from src.core.config import settings
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "inference_backend": settings.INFERENCE_BACKEND,
+            "embedding_model": settings.EMBEDDING_MODEL_NAME,
+            "reranker_model": settings.RERANKER_MODEL_NAME,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+"""
+Replay a captured query log against a running API.
+
+Reads the JSONL files written with QUERY_LOG_ENABLED=true, re-sends every
+recorded /query, /query/stream and /search request in its original order
+- at the recorded pace, a multiple of it, or as fast as --concurrency
+allows - and compares each response with the recording: latency, and the
+retrieved chunk IDs and source documents. Point it at a build with a
+different CHUNK_SIZE, HYBRID_SEARCH_ALPHA or reranker to see what the
+change does to production traffic.
+
+Turns of one chat session are replayed in order on a session of their own.
+Every request carries X-Request-ID replay-<n>, where n is its position in
+the log, so it can be found in the server logs.
+
+Recorded latencies are measured by the server from the moment its request
+middleware received the request; replayed ones by this client, so they
+also include the network and HTTP client overhead. Replay from a host close
+to the server, and to compare two builds, replay the log against both.
+
+Usage (from backend/):
+    python -m loadtest.replay data/query_log --base-url http://127.0.0.1:8000
+    python -m loadtest.replay data/query_log --base-url http://127.0.0.1:8000 --speed 10 --output replay.json
+    python -m loadtest.replay queries-a.jsonl queries-b.jsonl --base-url http://127.0.0.1:8000 --speed 0 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from loadtest.run_load import _percentile  # noqa: E402
+
+ENDPOINTS = ("query", "query_stream", "search")
+
+
+def load_records(paths: List[str], endpoints: Tuple[str, ...], limit: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Read query log files (or directories of them) and order the records by arrival.
+
+    Args:
+        paths: Log files or directories holding queries-*.jsonl files
+        endpoints: Endpoints to keep
+        limit: Keep only the first this many records (0 = all)
+
+    Returns:
+        Tuple of (records, number of unreadable lines skipped)
+    """
+    files = []
+    for path in map(Path, paths):
+        files.extend(sorted(path.glob("queries-*.jsonl")) if path.is_dir() else [path])
+    records, skipped = [], 0
+    for file in files:
+        with open(file, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    skipped += 1  # e.g. a line cut short by a crash
+                    continue
+                if record.get("endpoint") in endpoints and record.get("status") == 200:
+                    records.append(record)
+    records.sort(key=lambda record: record["ts"])
+    return (records[:limit] if limit else records), skipped
+
+
+async def send(client, base_url: str, record: Dict[str, Any], request_id: str, session_id: Optional[str]) -> Dict[str, Any]:
+    """
+    Send one recorded request.
+
+    Returns:
+        Dict with 'status', 'latency_ms', 'chunk_ids', 'sources' and, for
+        streams, 'first_token_ms'
+    """
+    headers = {"X-Request-ID": request_id}
+    started = time.perf_counter()
+    outcome = {"status": "exception", "chunk_ids": None, "sources": None}
+    try:
+        if record["endpoint"] == "search":
+            params = record.get("params") or {}
+            response = await client.post(f"{base_url}/search/", headers=headers, json={
+                "query": record["query"], "limit": params.get("limit", 10), "rerank": params.get("rerank", True),
+            })
+            outcome["status"] = response.status_code
+            if response.status_code == 200:
+                results = response.json()["results"]
+                outcome["chunk_ids"] = [result["chunk_id"] for result in results]
+                outcome["sources"] = sorted({(result["metadata"] or {}).get("filename", "Unknown") for result in results})
+        elif record["endpoint"] == "query":
+            response = await client.post(f"{base_url}/query/", headers=headers, json={
+                "query": record["query"], "session_id": session_id,
+            })
+            outcome["status"] = response.status_code
+            if response.status_code == 200:
+                body = response.json()
+                outcome["chunk_ids"] = body.get("chunk_ids")
+                outcome["sources"] = sorted(body["sources"])
+        else:
+            async with client.stream("POST", f"{base_url}/query/stream", headers=headers, json={
+                "query": record["query"], "session_id": session_id,
+            }) as response:
+                outcome["status"] = response.status_code
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    if event["type"] == "sources":
+                        outcome["chunk_ids"] = event.get("chunk_ids")
+                        outcome["sources"] = sorted(event["sources"])
+                    elif event["type"] == "token" and "first_token_ms" not in outcome:
+                        outcome["first_token_ms"] = (time.perf_counter() - started) * 1000
+                    elif event["type"] == "error":
+                        outcome["status"] = "stream_error"
+    except Exception as e:
+        outcome["error"] = str(e)
+    outcome["latency_ms"] = (time.perf_counter() - started) * 1000
+    return outcome
+
+
+def _jaccard(a: List[Any], b: List[Any]) -> float:
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def compare(record: Dict[str, Any], replayed: Dict[str, Any]) -> Dict[str, Any]:
+    """Latency and retrieved-set differences between a recording and its replay."""
+    recorded_ids, replayed_ids = record.get("chunk_ids") or [], replayed["chunk_ids"] or []
+    return {
+        "latency_delta_ms": replayed["latency_ms"] - record["latency_ms"],
+        "identical": recorded_ids == replayed_ids,
+        "same_set": set(recorded_ids) == set(replayed_ids),
+        "chunk_jaccard": _jaccard(recorded_ids, replayed_ids),
+        "top1_changed": recorded_ids[:1] != replayed_ids[:1],
+        "added": len(set(replayed_ids) - set(recorded_ids)),
+        "removed": len(set(recorded_ids) - set(replayed_ids)),
+        "source_jaccard": _jaccard(record.get("sources") or [], replayed["sources"] or []),
+    }
+
+
+def _latency_summary(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    return {
+        "p50_ms": _percentile(values, 50),
+        "p90_ms": _percentile(values, 90),
+        "p99_ms": _percentile(values, 99),
+        "mean_ms": statistics.fmean(values),
+    }
+
+
+def summarize(pairs: List[Tuple[Dict[str, Any], Dict[str, Any]]], most_changed: int) -> Dict[str, Any]:
+    """
+    Aggregate per endpoint: recorded vs replayed latency percentiles, and
+    how much the retrieved sets changed.
+    """
+    by_endpoint = defaultdict(list)
+    for record, replayed in pairs:
+        by_endpoint[record["endpoint"]].append((record, replayed))
+
+    endpoints = {}
+    for endpoint, items in sorted(by_endpoint.items()):
+        answered = [(record, replayed) for record, replayed in items if replayed["status"] == 200]
+        diffs = [compare(record, replayed) for record, replayed in answered]
+        recorded = _latency_summary([record["latency_ms"] for record, _ in answered])
+        replayed_latency = _latency_summary([replayed["latency_ms"] for _, replayed in answered])
+        summary = {
+            "requests": len(items),
+            "errors": len(items) - len(answered),
+            "recorded": recorded,
+            "replayed": replayed_latency,
+            "latency_delta": {
+                key: replayed_latency[key] - recorded[key] for key in recorded
+            } if answered else None,
+            "median_request_delta_ms": statistics.median(d["latency_delta_ms"] for d in diffs) if diffs else None,
+        }
+        first_tokens = [(record["first_token_ms"], replayed["first_token_ms"]) for record, replayed in answered
+                        if "first_token_ms" in record and "first_token_ms" in replayed]
+        if first_tokens:
+            summary["first_token"] = {
+                "recorded_p50_ms": _percentile([recorded for recorded, _ in first_tokens], 50),
+                "replayed_p50_ms": _percentile([replayed for _, replayed in first_tokens], 50),
+            }
+        if diffs:
+            summary["retrieval"] = {
+                "identical_rate": sum(d["identical"] for d in diffs) / len(diffs),
+                "same_set_rate": sum(d["same_set"] for d in diffs) / len(diffs),
+                "top1_changed_rate": sum(d["top1_changed"] for d in diffs) / len(diffs),
+                "mean_chunk_jaccard": statistics.fmean(d["chunk_jaccard"] for d in diffs),
+                "mean_source_jaccard": statistics.fmean(d["source_jaccard"] for d in diffs),
+            }
+            changed = sorted(zip(answered, diffs), key=lambda item: item[1]["chunk_jaccard"])[:most_changed]
+            summary["most_changed"] = [
+                {"query": record["query"], "chunk_jaccard": d["chunk_jaccard"], "added": d["added"],
+                 "removed": d["removed"], "source_jaccard": d["source_jaccard"]}
+                for (record, _), d in changed if not d["identical"]
+            ]
+        endpoints[endpoint] = summary
+    return {"requests": len(pairs), "endpoints": endpoints}
+
+
+async def replay(records: List[Dict[str, Any]], args) -> Dict[str, Any]:
+    """
+    Send the records on their recorded schedule, compressed by --speed.
+
+    Returns:
+        Dict: Replay summary
+    """
+    import httpx
+
+    run_id = uuid.uuid4().hex[:8]
+    session_locks = defaultdict(asyncio.Lock)
+    in_flight = asyncio.Semaphore(args.concurrency)
+    pairs, lags = [], []
+    first_ts = records[0]["ts"]
+
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(args.request_timeout, connect=10.0)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        started = time.monotonic()
+
+        async def run(index: int, record: Dict[str, Any]):
+            if args.speed > 0:
+                await asyncio.sleep(max(0.0, started + (record["ts"] - first_ts) / args.speed - time.monotonic()))
+            # Later turns of a session wait for the earlier ones
+            session = record.get("session")
+            lock = session_locks[session] if session else None
+            if lock is not None:
+                await lock.acquire()
+            try:
+                async with in_flight:
+                    if args.speed > 0:
+                        lags.append((time.monotonic() - started - (record["ts"] - first_ts) / args.speed) * 1000)
+                    session_id = f"replay-{run_id}-{session}" if session else None
+                    replayed = await send(client, args.base_url, record, f"replay-{index}", session_id)
+            finally:
+                if lock is not None:
+                    lock.release()
+            pairs.append((record, replayed))
+
+        tasks = [asyncio.create_task(run(index, record)) for index, record in enumerate(records)]
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - started
+
+    summary = summarize(pairs, args.most_changed)
+    summary["pacing"] = {
+        "speed": args.speed,
+        "recorded_seconds": records[-1]["ts"] - first_ts,
+        "replay_seconds": elapsed,
+        "p99_send_lag_ms": _percentile(lags, 99),
+        "max_send_lag_ms": max(lags) if lags else None,
+    }
+    return summary
+
+
+def print_summary(summary: Dict[str, Any]):
+    pacing = summary["pacing"]
+    print(f"\nReplayed {summary['requests']} request(s) recorded over {pacing['recorded_seconds']:.1f}s "
+          f"in {pacing['replay_seconds']:.1f}s (speed {pacing['speed'] or 'max'})")
+    if pacing["p99_send_lag_ms"] is not None and pacing["p99_send_lag_ms"] > 1000:
+        print(f"Warning: requests were sent up to {pacing['max_send_lag_ms']:.0f} ms late; "
+              f"raise --concurrency or lower --speed to keep the recorded pace")
+    header = (f"{'endpoint':<14}{'count':>7}{'errors':>8}{'rec p50':>10}{'new p50':>10}{'rec p99':>10}{'new p99':>10}"
+              f"{'same set':>10}{'top1 chg':>10}{'jaccard':>9}")
+    print(header)
+    print("-" * len(header))
+    for endpoint, stats in summary["endpoints"].items():
+        recorded, replayed = stats["recorded"] or {}, stats["replayed"] or {}
+        retrieval = stats.get("retrieval") or {}
+        print(f"{endpoint:<14}{stats['requests']:>7}{stats['errors']:>8}"
+              f"{recorded.get('p50_ms', 0):>10.0f}{replayed.get('p50_ms', 0):>10.0f}"
+              f"{recorded.get('p99_ms', 0):>10.0f}{replayed.get('p99_ms', 0):>10.0f}"
+              f"{retrieval.get('same_set_rate', 0):>10.1%}{retrieval.get('top1_changed_rate', 0):>10.1%}"
+              f"{retrieval.get('mean_chunk_jaccard', 0):>9.2f}")
+        for changed in stats.get("most_changed", [])[:5]:
+            print(f"{'':<14}jaccard {changed['chunk_jaccard']:.2f} (+{changed['added']}/-{changed['removed']}): "
+                  f"{changed['query'][:80]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a captured query log against a running API")
+    parser.add_argument("paths", nargs="+", help="Query log files or directories (QUERY_LOG_DIR)")
+    parser.add_argument("--base-url", required=True, help="API to replay against")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Pace relative to the recording (2 = twice as fast, 0 = as fast as --concurrency allows)")
+    parser.add_argument("--concurrency", type=int, default=64, help="Maximum requests in flight")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="Comma-separated endpoints to replay")
+    parser.add_argument("--limit", type=int, default=0, help="Replay only the first N records (0 = all)")
+    parser.add_argument("--most-changed", type=int, default=20, help="Queries with the largest retrieval changes to report")
+    parser.add_argument("--request-timeout", type=float, default=120.0, help="Client timeout per request")
+    parser.add_argument("--output", default=None, help="Write the JSON summary here")
+    args = parser.parse_args(argv)
+    if args.speed < 0:
+        parser.error("--speed must be >= 0")
+    args.base_url = args.base_url.rstrip("/")
+
+    endpoints = tuple(endpoint.strip() for endpoint in args.endpoints.split(",") if endpoint.strip())
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"Unknown endpoint(s): {', '.join(sorted(unknown))}")
+    records, skipped = load_records(args.paths, endpoints, args.limit)
+    if skipped:
+        print(f"Skipped {skipped} unreadable line(s)", file=sys.stderr)
+    if not records:
+        parser.error("No recorded requests to replay")
+    print(f"Replaying {len(records)} request(s) against {args.base_url}...", flush=True)
+
+    summary = asyncio.run(replay(records, args))
+    print_summary(summary)
+    if args.output:
+        summary["meta"] = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "arguments": vars(args),
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
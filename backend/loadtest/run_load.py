@@ -0,0 +1,387 @@
+#!/usr/bin/env python
+"""
+End-to-end load test.
+
+Starts the Gemini stub server and the API (production mode, isolated data
+directory) with GOOGLE_API_ENDPOINT pointing at the stub, seeds a corpus,
+then drives concurrent mixed traffic - blocking queries, streamed queries
+and DOCX/image ingestion - and reports latency percentiles, throughput and
+error rates per operation.
+
+Use --base-url to load an already running deployment instead; it must be
+configured against a stub (or a real endpoint) by the operator.
+
+Usage (from backend/):
+    python -m loadtest.run_load --concurrency 32 --duration 60
+    python -m loadtest.run_load --workers 4 --stub-latency-ms 1500 --output load-results.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.corpus import generate_documents, generate_queries  # noqa: E402
+
+OPERATIONS = ("query", "query_stream", "ingest_docx", "ingest_image")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))]
+
+
+def make_docx(text: str) -> bytes:
+    """Render text as a DOCX file, one paragraph per section."""
+    from docx import Document
+
+    document = Document()
+    for paragraph in text.split("\n\n"):
+        document.add_paragraph(paragraph)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def make_png(seed: int) -> bytes:
+    """Small scanned-page lookalike; the stub answers OCR calls with fixed text."""
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (600, 300), "white")
+    draw = ImageDraw.Draw(image)
+    draw.text((20, 20), f"Gazette page {seed}", fill="black")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@contextmanager
+def managed_stack(args):
+    """
+    Start the stub server and the API in a temporary working directory.
+
+    Yields:
+        str: Base URL of the API
+    """
+    workdir = Path(tempfile.mkdtemp(prefix="legalai-load-"))
+    stub_port = _free_port()
+    api_port = _free_port()
+    logs = []
+    processes = []
+    try:
+        stub_log = open(workdir / "stub.log", "w")
+        logs.append(stub_log)
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "loadtest.stub_servers",
+             "--port", str(stub_port),
+             "--latency-ms", str(args.stub_latency_ms),
+             "--jitter-ms", str(args.stub_jitter_ms),
+             "--answer-tokens", str(args.stub_answer_tokens),
+             "--token-interval-ms", str(args.stub_token_interval_ms),
+             "--ocr-latency-ms", str(args.stub_ocr_latency_ms),
+             "--error-rate", str(args.stub_error_rate)],
+            cwd=BACKEND_DIR, stdout=stub_log, stderr=subprocess.STDOUT,
+        ))
+
+        env = dict(os.environ)
+        env.update({
+            "GOOGLE_API_KEY": "stub-key",
+            "GOOGLE_API_ENDPOINT": f"http://127.0.0.1:{stub_port}",
+            "HOST": "127.0.0.1",
+            "PORT": str(api_port),
+            "WORKERS": str(args.workers),
+            "PYTHONPATH": str(BACKEND_DIR),
+        })
+        api_log = open(workdir / "api.log", "w")
+        logs.append(api_log)
+        # The data directories are relative to the working directory, so each run starts empty
+        processes.append(subprocess.Popen(
+            [sys.executable, str(BACKEND_DIR / "run.py"), "--prod", "--workers", str(args.workers)],
+            cwd=workdir, env=env, stdout=api_log, stderr=subprocess.STDOUT,
+        ))
+        print(f"Stub on :{stub_port}, API on :{api_port}, logs in {workdir}", flush=True)
+        yield f"http://127.0.0.1:{api_port}"
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+        for process in reversed(processes):
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        for log in logs:
+            log.close()
+        if args.keep_workdir:
+            print(f"Working directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+async def wait_ready(client, base_url: str, timeout: float):
+    """Poll /health/ready until the API reports ready (models warmed)."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = await client.get(f"{base_url}/health/ready")
+            if response.status_code == 200 and response.json().get("status") == "ready":
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(1.0)
+    raise RuntimeError(f"API not ready after {timeout:.0f}s")
+
+
+class LoadRecorder:
+    """
+    Per-operation latencies, status codes and errors.
+    """
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.first_byte: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, operation: str, seconds: float, status, ok: bool, first_byte: float = None):
+        self.latencies[operation].append(seconds)
+        self.statuses[operation][str(status)] += 1
+        if first_byte is not None:
+            self.first_byte[operation].append(first_byte)
+        if not ok:
+            self.errors[operation] += 1
+
+    def summary(self, elapsed: float) -> Dict:
+        operations = {}
+        for operation, latencies in self.latencies.items():
+            count = len(latencies)
+            summary = {
+                "requests": count,
+                "errors": self.errors[operation],
+                "error_rate": self.errors[operation] / count if count else 0.0,
+                "throughput_per_second": count / elapsed if elapsed > 0 else None,
+                "statuses": dict(self.statuses[operation]),
+            }
+            for p in (50, 90, 99):
+                summary[f"p{p}_ms"] = _percentile(latencies, p) * 1000
+            summary["max_ms"] = max(latencies) * 1000
+            if self.first_byte[operation]:
+                summary["first_token_p50_ms"] = _percentile(self.first_byte[operation], 50) * 1000
+                summary["first_token_p99_ms"] = _percentile(self.first_byte[operation], 99) * 1000
+            operations[operation] = summary
+        total = sum(len(v) for v in self.latencies.values())
+        errors = sum(self.errors.values())
+        return {
+            "elapsed_seconds": elapsed,
+            "requests": total,
+            "errors": errors,
+            "error_rate": errors / total if total else 0.0,
+            "throughput_per_second": total / elapsed if elapsed > 0 else None,
+            "operations": operations,
+        }
+
+
+async def run_query(client, base_url: str, query: str, recorder: LoadRecorder):
+    started = time.perf_counter()
+    status = "exception"
+    try:
+        response = await client.post(f"{base_url}/query/", json={"query": query})
+        status = response.status_code
+    finally:
+        recorder.record("query", time.perf_counter() - started, status, status == 200)
+
+
+async def run_query_stream(client, base_url: str, query: str, recorder: LoadRecorder):
+    started = time.perf_counter()
+    first_token = None
+    status = "exception"
+    ok = False
+    try:
+        async with client.stream("POST", f"{base_url}/query/stream", json={"query": query}) as response:
+            status = response.status_code
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event["type"] == "token" and first_token is None:
+                    first_token = time.perf_counter() - started
+                elif event["type"] == "done":
+                    ok = status == 200
+                elif event["type"] == "error":
+                    status = "stream_error"
+    finally:
+        recorder.record("query_stream", time.perf_counter() - started, status, ok, first_byte=first_token)
+
+
+async def run_ingest(client, base_url: str, operation: str, filename: str, content: bytes, content_type: str, recorder: LoadRecorder):
+    started = time.perf_counter()
+    status = "exception"
+    ok = False
+    try:
+        response = await client.post(f"{base_url}/ingest/", files=[("files", (filename, content, content_type))])
+        status = response.status_code
+        ok = status == 200 and response.json().get("failure_count", 0) == 0
+    finally:
+        recorder.record(operation, time.perf_counter() - started, status, ok)
+
+
+async def seed_corpus(client, base_url: str, documents: List[str]):
+    """Ingest the seed documents before traffic starts (not measured)."""
+    for i in range(0, len(documents), 10):
+        files = [("files", (f"seed_{i + j:04d}.docx", make_docx(text),
+                            "application/vnd.openxmlformats-officedocument.wordprocessingml.document"))
+                 for j, text in enumerate(documents[i:i + 10])]
+        response = await client.post(f"{base_url}/ingest/", files=files)
+        response.raise_for_status()
+
+
+async def drive_load(base_url: str, args) -> Dict:
+    """
+    Seed the corpus and run the traffic mix with a fixed number of concurrent clients.
+
+    Returns:
+        Dict: Load summary
+    """
+    import httpx
+
+    rng = random.Random(args.seed)
+    queries = generate_queries(args.distinct_queries, seed=args.seed)
+    hot_queries = queries[:max(1, len(queries) // 20)]
+    ingest_documents = generate_documents(64, length=4000, seed=args.seed + 1)
+    docx_payloads = [make_docx(text) for text in ingest_documents]
+    png_payloads = [make_png(i) for i in range(8)]
+    weights = [args.query_weight, args.stream_weight, args.ingest_weight, args.image_weight]
+    recorder = LoadRecorder()
+
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(args.request_timeout, connect=10.0)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        if not args.base_url:
+            await wait_ready(client, base_url, args.startup_timeout)
+        if args.seed_documents:
+            print(f"Seeding {args.seed_documents} documents...", flush=True)
+            await seed_corpus(client, base_url, generate_documents(args.seed_documents, length=8000, seed=args.seed))
+
+        counter = {"issued": 0, "ingested": 0}
+        deadline = time.monotonic() + args.duration
+
+        def next_query() -> str:
+            return rng.choice(hot_queries) if rng.random() < args.hot_query_ratio else rng.choice(queries)
+
+        async def client_loop():
+            while time.monotonic() < deadline and (not args.requests or counter["issued"] < args.requests):
+                counter["issued"] += 1
+                operation = rng.choices(OPERATIONS, weights=weights)[0]
+                try:
+                    if operation == "query":
+                        await run_query(client, base_url, next_query(), recorder)
+                    elif operation == "query_stream":
+                        await run_query_stream(client, base_url, next_query(), recorder)
+                    elif operation == "ingest_docx":
+                        counter["ingested"] += 1
+                        await run_ingest(client, base_url, operation, f"load_{counter['ingested']:06d}.docx",
+                                         rng.choice(docx_payloads),
+                                         "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                                         recorder)
+                    else:
+                        counter["ingested"] += 1
+                        await run_ingest(client, base_url, operation, f"scan_{counter['ingested']:06d}.png",
+                                         rng.choice(png_payloads), "image/png", recorder)
+                except Exception:
+                    pass  # Already recorded as an error
+
+        print(f"Running {args.concurrency} clients for up to {args.duration:.0f}s...", flush=True)
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        summary = recorder.summary(elapsed)
+        try:
+            summary["server_metrics"] = (await client.get(f"{base_url}/metrics")).text
+        except Exception:
+            summary["server_metrics"] = None
+    return summary
+
+
+def print_summary(summary: Dict):
+    print(f"\n{summary['requests']} requests in {summary['elapsed_seconds']:.1f}s "
+          f"({summary['throughput_per_second']:.1f} req/s), error rate {summary['error_rate']:.2%}")
+    header = f"{'operation':<14}{'count':>7}{'req/s':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>8}"
+    print(header)
+    print("-" * len(header))
+    for operation, stats in sorted(summary["operations"].items()):
+        print(f"{operation:<14}{stats['requests']:>7}{stats['throughput_per_second']:>8.2f}"
+              f"{stats['p50_ms']:>10.0f}{stats['p90_ms']:>10.0f}{stats['p99_ms']:>10.0f}"
+              f"{stats['max_ms']:>10.0f}{stats['errors']:>8}")
+        if "first_token_p50_ms" in stats:
+            print(f"{'':<14}first token p50 {stats['first_token_p50_ms']:.0f} ms, p99 {stats['first_token_p99_ms']:.0f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the end-to-end load test")
+    parser.add_argument("--base-url", default=None, help="Load an already running API instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="API worker processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds of traffic")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests (0 = duration only)")
+    parser.add_argument("--query-weight", type=float, default=0.55, help="Share of blocking /query requests")
+    parser.add_argument("--stream-weight", type=float, default=0.35, help="Share of /query/stream requests")
+    parser.add_argument("--ingest-weight", type=float, default=0.08, help="Share of DOCX ingestion requests")
+    parser.add_argument("--image-weight", type=float, default=0.02, help="Share of image (OCR) ingestion requests")
+    parser.add_argument("--distinct-queries", type=int, default=500, help="Size of the query pool")
+    parser.add_argument("--hot-query-ratio", type=float, default=0.3, help="Share of queries drawn from the hot 5%%")
+    parser.add_argument("--seed-documents", type=int, default=50, help="Documents ingested before traffic starts")
+    parser.add_argument("--request-timeout", type=float, default=120.0, help="Client timeout per request")
+    parser.add_argument("--startup-timeout", type=float, default=600.0, help="Seconds to wait for readiness")
+    parser.add_argument("--stub-latency-ms", type=float, default=800.0, help="Stub LLM mean time to first token")
+    parser.add_argument("--stub-jitter-ms", type=float, default=200.0, help="Stub latency std deviation")
+    parser.add_argument("--stub-answer-tokens", type=int, default=120, help="Stub tokens per answer")
+    parser.add_argument("--stub-token-interval-ms", type=float, default=10.0, help="Stub delay between streamed tokens")
+    parser.add_argument("--stub-ocr-latency-ms", type=float, default=1500.0, help="Stub OCR mean latency")
+    parser.add_argument("--stub-error-rate", type=float, default=0.0, help="Fraction of stub calls failing with 503")
+    parser.add_argument("--seed", type=int, default=42, help="Traffic and corpus seed")
+    parser.add_argument("--keep-workdir", action="store_true", help="Keep the temporary data directory and logs")
+    parser.add_argument("--output", default=None, help="Write the JSON summary here")
+    args = parser.parse_args(argv)
+
+    if args.base_url:
+        summary = asyncio.run(drive_load(args.base_url.rstrip("/"), args))
+    else:
+        with managed_stack(args) as base_url:
+            summary = asyncio.run(drive_load(base_url, args))
+
+    print_summary(summary)
+    if args.output:
+        summary["meta"] = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "arguments": vars(args),
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+"""
+Stub of the Gemini REST API used by ChatGoogleGenerativeAI and Gemini Vision.
+
+Serves `POST /{version}/models/{model}:generateContent` and
+`:streamGenerateContent` with configurable latency, jitter, answer length,
+token pacing and error rate. Requests carrying inline image data are
+answered with OCR-style text, everything else with a legal-sounding answer.
+
+Point the backend at it with GOOGLE_API_ENDPOINT=http://127.0.0.1:<port>.
+
+Usage (from backend/):
+    python -m loadtest.stub_servers --port 9100 --latency-ms 800 --jitter-ms 200
+"""
+import argparse
+import asyncio
+import json
+import random
+from dataclasses import dataclass
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ANSWER_WORDS = (
+    "Under the relevant provisions of the Act the court may grant relief to the aggrieved party "
+    "provided that the application is filed within the prescribed period and supported by documents. "
+    "The petitioner should consult a qualified advocate before proceeding further."
+).split()
+OCR_TEXT = (
+    "GOVERNMENT OF THE PEOPLE'S REPUBLIC OF BANGLADESH\n"
+    "Section 12. The tenant shall pay the rent on or before the seventh day of each month.\n"
+    "ধারা ১২। ভাড়াটিয়া প্রতি মাসের সাত তারিখের মধ্যে ভাড়া পরিশোধ করিবেন।"
+)
+
+
+@dataclass
+class StubConfig:
+    latency_ms: float = 800.0
+    jitter_ms: float = 200.0
+    answer_tokens: int = 120
+    token_interval_ms: float = 10.0
+    ocr_latency_ms: float = 1500.0
+    error_rate: float = 0.0
+    seed: int = 1234
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    """
+    Build the stub application.
+
+    Args:
+        config: Latency and behaviour settings
+
+    Returns:
+        FastAPI app
+    """
+    app = FastAPI(title="Gemini API stub")
+    rng = random.Random(config.seed)
+    counters = {"requests": 0, "stream_requests": 0, "vision_requests": 0, "errors": 0}
+
+    def _is_vision(body: dict) -> bool:
+        for content in body.get("contents", []):
+            for part in content.get("parts", []):
+                if "inlineData" in part or "inline_data" in part:
+                    return True
+        return False
+
+    def _delay(base_ms: float) -> float:
+        return max(0.0, rng.gauss(base_ms, config.jitter_ms)) / 1000.0
+
+    def _candidate(text: str, finish: bool = True) -> dict:
+        candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+        if finish:
+            candidate["finishReason"] = "STOP"
+        return candidate
+
+    def _usage(prompt_chars: int, output_tokens: int) -> dict:
+        prompt_tokens = prompt_chars // 4
+        return {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": output_tokens,
+            "totalTokenCount": prompt_tokens + output_tokens,
+        }
+
+    def _answer_tokens() -> list:
+        return [rng.choice(ANSWER_WORDS) + " " for _ in range(config.answer_tokens)]
+
+    @app.get("/stats")
+    async def stats():
+        return counters
+
+    @app.post("/{version}/models/{model_method:path}")
+    async def generate(version: str, model_method: str, request: Request):
+        model, _, method = model_method.partition(":")
+        if method not in ("generateContent", "streamGenerateContent"):
+            raise HTTPException(status_code=404, detail=f"Unknown method: {method}")
+
+        body = await request.json()
+        prompt_chars = len(json.dumps(body))
+        vision = _is_vision(body)
+        counters["requests"] += 1
+        counters["vision_requests"] += int(vision)
+
+        if rng.random() < config.error_rate:
+            counters["errors"] += 1
+            await asyncio.sleep(_delay(config.latency_ms) / 2)
+            return JSONResponse(status_code=503, content={"error": {"code": 503, "message": "stub overload", "status": "UNAVAILABLE"}})
+
+        if method == "generateContent":
+            await asyncio.sleep(_delay(config.ocr_latency_ms if vision else config.latency_ms))
+            if vision:
+                return {"candidates": [_candidate(OCR_TEXT)], "usageMetadata": _usage(prompt_chars, len(OCR_TEXT) // 4), "modelVersion": model}
+            tokens = _answer_tokens()
+            return {"candidates": [_candidate("".join(tokens).strip())], "usageMetadata": _usage(prompt_chars, len(tokens)), "modelVersion": model}
+
+        counters["stream_requests"] += 1
+        sse = request.query_params.get("alt") == "sse"
+        tokens = [OCR_TEXT] if vision else _answer_tokens()
+
+        async def events():
+            await asyncio.sleep(_delay(config.ocr_latency_ms if vision else config.latency_ms))
+            if not sse:
+                yield "["
+            for i, token in enumerate(tokens):
+                last = i == len(tokens) - 1
+                chunk = {"candidates": [_candidate(token, finish=last)], "modelVersion": model}
+                if last:
+                    chunk["usageMetadata"] = _usage(prompt_chars, len(tokens))
+                payload = json.dumps(chunk, ensure_ascii=False)
+                if sse:
+                    yield f"data: {payload}\r\n\r\n"
+                else:
+                    yield payload + ("]" if last else ",\r\n")
+                await asyncio.sleep(config.token_interval_ms / 1000.0)
+
+        media_type = "text/event-stream" if sse else "application/json"
+        return StreamingResponse(events(), media_type=media_type)
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Gemini API stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=StubConfig.latency_ms, help="Mean time to first token")
+    parser.add_argument("--jitter-ms", type=float, default=StubConfig.jitter_ms, help="Std deviation of the latency")
+    parser.add_argument("--answer-tokens", type=int, default=StubConfig.answer_tokens, help="Tokens per answer")
+    parser.add_argument("--token-interval-ms", type=float, default=StubConfig.token_interval_ms, help="Delay between streamed tokens")
+    parser.add_argument("--ocr-latency-ms", type=float, default=StubConfig.ocr_latency_ms, help="Mean latency of vision (OCR) calls")
+    parser.add_argument("--error-rate", type=float, default=StubConfig.error_rate, help="Fraction of requests answered with 503")
+    parser.add_argument("--seed", type=int, default=StubConfig.seed)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    config = StubConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        answer_tokens=args.answer_tokens,
+        token_interval_ms=args.token_interval_ms,
+        ocr_latency_ms=args.ocr_latency_ms,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,80 @@
 #!/usr/bin/env python
 """
 Run the FastAPI backend server.
+
+Development (default): single uvicorn process with auto-reload.
+Production (--prod): a gunicorn master loads the models once, then forks
+uvicorn workers that share the model weights copy-on-write.
 """
+import argparse
+import os
 import uvicorn
 
-if __name__ == "__main__":
+
+def run_dev():
     uvicorn.run(
         "src.api.main:app",
         host="0.0.0.0",
         port=8000,
         reload=True
     )
+
+
+def run_prod(workers: int = None):
+    # Tokenizer thread pools must not be created before fork
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    # Workers exchange metric snapshots so any of them can answer a scrape
+    os.environ.setdefault("METRICS_MULTIPROC_DIR", "data/metrics")
+
+    from gunicorn.app.base import BaseApplication
+    from src.core.config import settings
+    from src.api.main import app
+    from src.api.warmup import preload_models
+    from src.core.metrics import worker_snapshots
+
+    def post_fork(server, worker):
+        if settings.WORKER_TORCH_THREADS > 0:
+            import torch
+            torch.set_num_threads(settings.WORKER_TORCH_THREADS)
+
+    class PreforkApplication(BaseApplication):
+        """Gunicorn application serving an already imported ASGI app."""
+
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    # Load models in the master so forked workers share them
+    preload_models()
+    if worker_snapshots is not None:
+        worker_snapshots.clear()
+
+    options = {
+        "bind": f"{settings.HOST}:{settings.PORT}",
+        "workers": workers or settings.WORKERS,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "timeout": settings.WORKER_TIMEOUT,
+        "preload_app": True,
+        "post_fork": post_fork,
+    }
+    PreforkApplication(app, options).run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Legal AI Doc Assistant API")
+    parser.add_argument("--prod", action="store_true", help="Multi-worker mode with preloaded shared models")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (--prod only)")
+    args = parser.parse_args()
+
+    if args.prod:
+        run_prod(args.workers)
+    else:
+        run_dev()
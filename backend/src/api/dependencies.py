@@ -1,15 +1,36 @@
-from functools import lru_cache
+from functools import lru_cache, wraps
+from threading import Lock
 from src.services.document_service import DocumentService
 from src.services.query_service import QueryService
+from src.services.search_service import SearchService
 from src.services.embedding_service import EmbeddingService
+from src.services.ingest_jobs import IngestJobStore
 from src.repositories.document_repo import DocumentRepository
 from src.repositories.vector_store_repo import VectorStoreRepository
 from src.utils.parsers import FileParser
 from src.core.chunking import Chunker
 from src.utils.reranker import Reranker
 
+def singleton(func):
+    """
+    Thread-safe lru_cache for zero-argument providers.
+    Background warmup and request threads may race to build the same
+    component; the lock ensures it is constructed only once.
+    """
+    cached = lru_cache()(func)
+    lock = Lock()
+
+    @wraps(func)
+    def wrapper():
+        with lock:
+            return cached()
+
+    wrapper.cache_clear = cached.cache_clear
+    wrapper.is_loaded = lambda: cached.cache_info().currsize > 0
+    return wrapper
+
 # Singleton instances (cached) for heavy/stateful components
-@lru_cache()
+@singleton
 def get_embedding_service() -> EmbeddingService:
     """
     Singleton embedding service.
@@ -17,22 +38,30 @@ def get_embedding_service() -> EmbeddingService:
     """
     return EmbeddingService()
 
-@lru_cache()
+@singleton
 def get_vector_store_repo() -> VectorStoreRepository:
     """
     Singleton vector store repository.
     ChromaDB connection is created once and reused.
+    Cached re-ranking scores of deleted chunks are invalidated through it.
     """
-    return VectorStoreRepository()
+    repo = VectorStoreRepository()
+    repo.add_delete_listener(_invalidate_reranker_cache)
+    return repo
 
-@lru_cache()
+def _invalidate_reranker_cache(deleted_texts):
+    # Only touch the reranker if it is loaded; never load a model for this
+    if get_reranker.is_loaded():
+        get_reranker().invalidate_documents(deleted_texts)
+
+@singleton
 def get_document_repo() -> DocumentRepository:
     """
     Singleton document repository.
     """
     return DocumentRepository()
 
-@lru_cache()
+@singleton
 def get_parser() -> FileParser:
     """
     Singleton file parser.
@@ -40,14 +69,14 @@ def get_parser() -> FileParser:
     """
     return FileParser()
 
-@lru_cache()
+@singleton
 def get_chunker() -> Chunker:
     """
     Singleton text chunker.
     """
     return Chunker()
 
-@lru_cache()
+@singleton
 def get_reranker() -> Reranker:
     """
     Singleton Reranker.
@@ -55,6 +84,14 @@ def get_reranker() -> Reranker:
     """
     return Reranker()
 
+@singleton
+def get_ingest_job_store() -> IngestJobStore:
+    """
+    Singleton store of background ingestion job status.
+    Keeps running job tasks referenced.
+    """
+    return IngestJobStore()
+
 # Service instances (lightweight, can be created per request)
 def get_document_service() -> DocumentService:
     """
@@ -66,16 +103,30 @@ def get_document_service() -> DocumentService:
         vector_store_repo=get_vector_store_repo(),
         parser=get_parser(),
         chunker=get_chunker(),
-        embedder=get_embedding_service()
+        embedder=get_embedding_service(),
+        job_store=get_ingest_job_store()
     )
 
+@singleton
 def get_query_service() -> QueryService:
     """
-    Dependency provider for QueryService.
-    Uses cached singletons for heavy components.
+    Singleton QueryService.
+    Shared so identical in-flight queries can be coalesced across requests.
     """
     return QueryService(
         vector_store_repo=get_vector_store_repo(),
         embedder=get_embedding_service(),
         reranker=get_reranker()
     )
+
+@singleton
+def get_search_service() -> SearchService:
+    """
+    Singleton SearchService.
+    Shared so the ranked list cache serves later pages of a search.
+    """
+    return SearchService(
+        vector_store_repo=get_vector_store_repo(),
+        embedder=get_embedding_service(),
+        reranker=get_reranker()
+    )
@@ -1,11 +1,22 @@
 from fastapi import FastAPI, Request, status
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
-from src.api.routes import ingest, query
-from src.core.exceptions import LegalAIException
+from src.api.routes import ingest, query, search, uploads
+from src.core.exceptions import (
+    LegalAIException, LLMTimeoutError, LLMUnavailableError, InvalidCursorError,
+    UploadNotFoundError, UploadPartError, UploadIncompleteError, ServiceOverloadedError,
+)
 from src.core.logging_config import setup_logging, get_logger
+from src.core.metrics import worker_snapshots
+from src.core.query_log import query_log
+from src.core.request_context import start_request, get_timings, set_priority, BULK
+from src.api.warmup import run_warmup
+from src.api.dependencies import get_vector_store_repo
+from src.core.config import settings
 from dotenv import load_dotenv
+import asyncio
 import os
+import time
 
 # Load environment variables from .env file
 load_dotenv()
@@ -20,13 +31,62 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Paths whose model work queues behind interactive queries and searches
+BULK_PATH_PREFIXES = ("/ingest", "/query/batch")
+
+# Request context: request ID propagation and Server-Timing breakdown
+@app.middleware("http")
+async def request_context_middleware(request: Request, call_next):
+    """
+    Assign a request ID (or reuse the client's X-Request-ID) for log correlation,
+    set the admission control priority of the request and report the
+    durations of the pipeline stages in a Server-Timing header.
+    """
+    request_id = start_request(request.headers.get("X-Request-ID"))
+    if request.url.path.startswith(BULK_PATH_PREFIXES):
+        set_priority(BULK)
+    timings = get_timings()
+    started_at, started = time.time(), time.perf_counter()
+    response = await call_next(request)
+    total_seconds = time.perf_counter() - started
+    response.headers["X-Request-ID"] = request_id
+    response.headers["Server-Timing"] = timings.server_timing(total_seconds)
+    # Query log entry left by the route, timed at the same boundary as a client sees it
+    entry = getattr(request.state, "query_log", None)
+    if entry is not None:
+        query_log.record(started_at=started_at, latency_ms=total_seconds * 1000, status=response.status_code, **entry)
+    return response
+
 # Exception handlers
 @app.exception_handler(LegalAIException)
 async def legal_ai_exception_handler(request: Request, exc: LegalAIException):
     """Handle custom Legal AI exceptions."""
-    logger.error(f"LegalAI error: {exc.__class__.__name__}: {str(exc)}")
+    if isinstance(exc, ServiceOverloadedError):
+        logger.warning("Request rejected: %s", exc)
+        return JSONResponse(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            headers={"Retry-After": str(exc.retry_after)},
+            content={
+                "error": exc.__class__.__name__,
+                "message": str(exc),
+                "retry_after": exc.retry_after
+            }
+        )
+    logger.error("LegalAI error: %s: %s", exc.__class__.__name__, str(exc))
+    if isinstance(exc, (InvalidCursorError, UploadPartError)):
+        status_code = status.HTTP_400_BAD_REQUEST
+    elif isinstance(exc, UploadNotFoundError):
+        status_code = status.HTTP_404_NOT_FOUND
+    elif isinstance(exc, UploadIncompleteError):
+        status_code = status.HTTP_409_CONFLICT
+    elif isinstance(exc, LLMTimeoutError):
+        status_code = status.HTTP_504_GATEWAY_TIMEOUT
+    elif isinstance(exc, LLMUnavailableError):
+        status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    else:
+        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
     return JSONResponse(
-        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        status_code=status_code,
         content={
             "error": exc.__class__.__name__,
             "message": str(exc),
@@ -37,7 +97,7 @@ async def legal_ai_exception_handler(request: Request, exc: LegalAIException):
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """Handle request validation errors."""
-    logger.warning(f"Validation error: {exc.errors()}")
+    logger.warning("Validation error: %s", exc.errors())
     return JSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content={
@@ -50,7 +110,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
     """Handle unexpected exceptions."""
-    logger.error(f"Unexpected error: {exc}", exc_info=True)
+    logger.error("Unexpected error: %s", exc, exc_info=True)
     return JSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={
@@ -64,6 +124,11 @@ async def general_exception_handler(request: Request, exc: Exception):
 async def startup_event():
     """Run on application startup."""
     logger.info("Starting Legal AI Doc Assistant API...")
+    if worker_snapshots is not None:
+        worker_snapshots.start()
+    if settings.WARMUP_ON_STARTUP:
+        # Load models in the background; /health/ready reports not-ready until done
+        app.state.warmup_task = asyncio.create_task(run_warmup())
     logger.info("Application initialized successfully")
 
 # Shutdown event
@@ -71,12 +136,23 @@ async def startup_event():
 async def shutdown_event():
     """Run on application shutdown."""
     logger.info("Shutting down Legal AI Doc Assistant API...")
+    if get_vector_store_repo.is_loaded():
+        # Commit chunks still waiting in the write buffer
+        await asyncio.to_thread(get_vector_store_repo().flush_writes)
+    # Write query log records still queued
+    await asyncio.to_thread(query_log.close)
+    if worker_snapshots is not None:
+        # Keep this worker's final counts in the merged metrics
+        await asyncio.to_thread(worker_snapshots.stop)
 
 # Include routers
-from src.api.routes import health
+from src.api.routes import health, metrics
 app.include_router(health.router)
+app.include_router(metrics.router)
 app.include_router(ingest.router)
+app.include_router(uploads.router)
 app.include_router(query.router)
+app.include_router(search.router)
 
 @app.get("/")
 def read_root():
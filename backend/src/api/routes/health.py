@@ -1,9 +1,12 @@
 from fastapi import APIRouter, status
 from fastapi.responses import JSONResponse
+from src.core.admission import admission
 from src.core.config import settings
 from src.core.logging_config import get_logger
-from src.repositories.vector_store_repo import VectorStoreRepository
+from src.api.dependencies import get_reranker, get_query_service, get_vector_store_repo
+from src.api.warmup import warmup_state
 from pathlib import Path
+import asyncio
 import sys
 
 logger = get_logger(__name__)
@@ -29,6 +32,7 @@ async def readiness_check():
     """
     checks = {
         "api": "ok",
+        "warmup": "unknown",
         "vector_store": "unknown",
         "file_storage": "unknown",
         "config": "unknown"
@@ -36,16 +40,30 @@ async def readiness_check():
     
     all_healthy = True
     
-    # Check vector store
+    # Check warmup (models loaded and exercised)
+    if not settings.WARMUP_ON_STARTUP:
+        checks["warmup"] = "disabled"
+    elif warmup_state.ready:
+        checks["warmup"] = "ok"
+    else:
+        checks["warmup"] = "in progress" if warmup_state.started else "not started"
+        all_healthy = False
+    
+    # Check vector store (while warming up, reuse the singleton rather than
+    # building a second one from the probe; without warmup, load it here)
     try:
-        repo = VectorStoreRepository()
-        repo.collection.count()  # Test connection
-        checks["vector_store"] = "ok"
-        logger.debug("Vector store health check: OK")
+        if get_vector_store_repo.is_loaded() or not settings.WARMUP_ON_STARTUP:
+            repo = await asyncio.to_thread(get_vector_store_repo)
+            repo.collection.count()  # Test connection
+            checks["vector_store"] = "ok"
+            logger.debug("Vector store health check: OK")
+        else:
+            checks["vector_store"] = "not loaded"
+            all_healthy = False
     except Exception as e:
         checks["vector_store"] = f"error: {str(e)}"
         all_healthy = False
-        logger.error(f"Vector store health check failed: {e}")
+        logger.error("Vector store health check failed: %s", e)
     
     # Check file storage
     try:
@@ -60,7 +78,7 @@ async def readiness_check():
     except Exception as e:
         checks["file_storage"] = f"error: {str(e)}"
         all_healthy = False
-        logger.error(f"File storage health check failed: {e}")
+        logger.error("File storage health check failed: %s", e)
     
     # Check configuration
     try:
@@ -73,7 +91,7 @@ async def readiness_check():
     except Exception as e:
         checks["config"] = f"error: {str(e)}"
         all_healthy = False
-        logger.error(f"Configuration health check failed: {e}")
+        logger.error("Configuration health check failed: %s", e)
     
     status_code = status.HTTP_200_OK if all_healthy else status.HTTP_503_SERVICE_UNAVAILABLE
     
@@ -82,6 +100,8 @@ async def readiness_check():
         content={
             "status": "ready" if all_healthy else "not_ready",
             "checks": checks,
+            "warmup": warmup_state.to_dict(),
+            "admission": admission.stats(),
             "settings": {
                 "upload_dir": settings.UPLOAD_DIR,
                 "chroma_db_dir": settings.CHROMA_DB_DIR,
@@ -111,3 +131,44 @@ async def info():
         }
     }
 
+@router.get("/cache")
+async def cache_stats():
+    """
+    Cache statistics endpoint.
+    Returns size and hit-rate metrics of the re-ranking score cache
+    (empty until the re-ranker is loaded; the probe never loads it).
+    """
+    return {
+        "reranker_scores": get_reranker().cache_stats() if get_reranker.is_loaded() else {}
+    }
+
+@router.get("/coalescing")
+async def coalescing_stats():
+    """
+    Request coalescing statistics endpoint.
+    Returns how often identical in-flight queries shared a pipeline run
+    (empty until the query service is loaded; the probe never builds it).
+    """
+    return {
+        "query": get_query_service().coalescing_stats() if get_query_service.is_loaded() else {}
+    }
+
+@router.get("/admission")
+async def admission_stats():
+    """
+    Admission control statistics endpoint.
+    Returns slots in use, queue depth per priority and rejections of each model stage.
+    """
+    return {
+        "enabled": settings.ADMISSION_ENABLED,
+        "stages": admission.stats()
+    }
+
+@router.get("/llm")
+async def llm_stats():
+    """
+    LLM latency control statistics endpoint.
+    Returns hedging, fallback, timeout and circuit breaker state
+    (empty until the query service is loaded; the probe never builds it).
+    """
+    return get_query_service().llm_service.stats() if get_query_service.is_loaded() else {}
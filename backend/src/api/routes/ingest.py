@@ -1,12 +1,17 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status
 from typing import List
-from src.api.dependencies import get_document_service
+from src.api.dependencies import get_document_service, get_ingest_job_store
 from src.services.document_service import DocumentService
+from src.services.ingest_jobs import IngestJobStore
+from src.core.admission import admission
 from src.core.logging_config import get_logger
 
 logger = get_logger(__name__)
 router = APIRouter(prefix="/ingest", tags=["Ingestion"])
 
+# Model stages every ingested file goes through (OCR only for images)
+INGEST_STAGES = ("embedding",)
+
 @router.post("/")
 async def ingest_documents(
     files: List[UploadFile] = File(...),
@@ -26,16 +31,66 @@ async def ingest_documents(
     Returns:
         Ingestion result with success/failure counts
     """
-    logger.info(f"Ingestion request received for {len(files)} file(s)")
+    logger.info("Ingestion request received for %s file(s)", len(files))
     
     if not files:
         logger.warning("No files provided in ingestion request")
         raise HTTPException(status_code=400, detail="No files provided")
+    admission.admit(INGEST_STAGES)
     
     try:
         result = await service.ingest(files)
-        logger.info(f"Ingestion completed: {result}")
+        logger.info("Ingestion completed: %s", result)
         return result
     except Exception as e:
-        logger.error(f"Ingestion failed: {e}", exc_info=True)
+        logger.error("Ingestion failed: %s", e, exc_info=True)
         raise
+
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def start_ingest_job(
+    files: List[UploadFile] = File(...),
+    service: DocumentService = Depends(get_document_service)
+):
+    """
+    Upload documents and process them in the background.
+    
+    The files are saved before the response; parsing, chunking, embedding
+    and storage continue afterwards. Poll GET /ingest/jobs/{job_id} for
+    per-file progress and the final ingestion result.
+    
+    Args:
+        files: List of uploaded files (PDF, DOCX, images)
+        
+    Returns:
+        Initial job status with the job ID
+    """
+    logger.info("Ingestion job request received for %s file(s)", len(files))
+    
+    if not files:
+        logger.warning("No files provided in ingestion job request")
+        raise HTTPException(status_code=400, detail="No files provided")
+    admission.admit(INGEST_STAGES)
+    
+    return await service.start_ingest_job(files)
+
+@router.get("/jobs/{job_id}")
+def get_ingest_job(
+    job_id: str,
+    job_store: IngestJobStore = Depends(get_ingest_job_store)
+):
+    """
+    Status of a background ingestion job.
+    Reads the job's status file, so any worker process can answer and no
+    model is loaded.
+    
+    Args:
+        job_id: ID returned by POST /ingest/jobs
+        
+    Returns:
+        Job status: overall status, per-file stage and status, and the
+        ingestion result once completed
+    """
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found or expired")
+    return job
@@ -0,0 +1,171 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from src.api.dependencies import (
+    get_embedding_service,
+    get_query_service,
+    get_reranker,
+    get_search_service,
+    get_vector_store_repo,
+)
+from src.core.admission import admission
+from src.core.metrics import registry, worker_snapshots
+from src.core.logging_config import get_logger, logging_stats
+from src.core.query_log import query_log
+import os
+
+logger = get_logger(__name__)
+router = APIRouter(tags=["Metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Scrape-time collectors. They only read components that are already
+# loaded, so a scrape never triggers a model load.
+
+def _reranker_cache():
+    if get_reranker.is_loaded():
+        stats = get_reranker().cache_stats()
+        yield {"cache": "reranker_scores", "result": "hit"}, stats["hits"]
+        yield {"cache": "reranker_scores", "result": "miss"}, stats["misses"]
+    if get_search_service.is_loaded():
+        stats = get_search_service().cache_stats()
+        yield {"cache": "search_results", "result": "hit"}, stats["hits"]
+        yield {"cache": "search_results", "result": "miss"}, stats["misses"]
+
+def _reranker_cache_size():
+    if get_reranker.is_loaded():
+        yield {"cache": "reranker_scores"}, get_reranker().cache_stats()["size"]
+    if get_search_service.is_loaded():
+        yield {"cache": "search_results"}, get_search_service().cache_stats()["size"]
+
+def _coalesced_queries():
+    if get_query_service.is_loaded():
+        stats = get_query_service().coalescing_stats()
+        yield {"mode": "query", "role": "leader"}, stats["leaders"]
+        yield {"mode": "query", "role": "coalesced"}, stats["coalesced"]
+        yield {"mode": "stream", "role": "leader"}, stats["stream_leaders"]
+        yield {"mode": "stream", "role": "coalesced"}, stats["stream_coalesced"]
+
+def _conversations():
+    if get_query_service.is_loaded():
+        stats = get_query_service().conversation_stats()
+        yield {}, stats["sessions"]
+
+def _conversation_retrievals():
+    if get_query_service.is_loaded():
+        for mode, count in get_query_service().conversation_stats()["retrievals"].items():
+            yield {"mode": mode}, count
+
+def _llm_events():
+    if get_query_service.is_loaded():
+        stats = get_query_service().llm_service.stats()
+        for event in ("calls", "hedges_sent", "hedge_wins", "fallbacks", "timeouts", "failures"):
+            yield {"event": event}, stats[event]
+
+def _admission_queue():
+    for stage, stats in admission.stats().items():
+        yield {"stage": stage, "state": "in_use"}, stats["in_use"]
+        yield {"stage": stage, "state": "queued_interactive"}, stats["queued_interactive"]
+        yield {"stage": stage, "state": "queued_bulk"}, stats["queued_bulk"]
+
+def _admission_rejections():
+    for stage, stats in admission.stats().items():
+        yield {"stage": stage}, stats["rejected"]
+
+def _collection_size():
+    if get_vector_store_repo.is_loaded():
+        yield {}, get_vector_store_repo().collection.count()
+
+def _lexical_index():
+    if get_vector_store_repo.is_loaded():
+        repo = get_vector_store_repo()
+        index = repo.bm25_index
+        yield {"measure": "documents"}, len(repo.bm25_docs)
+        yield {"measure": "vocabulary"}, len(index.idf) if index is not None else 0
+
+def _write_buffer():
+    if get_vector_store_repo.is_loaded():
+        stats = get_vector_store_repo().write_buffer_stats()
+        yield {"measure": "pending_chunks"}, stats["pending_chunks"]
+        yield {"measure": "pending_bytes"}, stats["pending_bytes"]
+
+def _write_buffer_flushes():
+    if get_vector_store_repo.is_loaded():
+        stats = get_vector_store_repo().write_buffer_stats()
+        yield {"result": "ok"}, stats["flushes"]
+        yield {"result": "failed"}, stats["failed_flushes"]
+
+def _duplicate_chunks():
+    if get_vector_store_repo.is_loaded():
+        stats = get_vector_store_repo().duplicate_stats
+        yield {"outcome": "checked"}, stats["checked"]
+        yield {"outcome": "duplicate"}, stats["duplicates"]
+        yield {"outcome": "clustered"}, stats["clustered"]
+        yield {"outcome": "promoted"}, stats["promoted"]
+
+def _duplicate_bytes_saved():
+    if get_vector_store_repo.is_loaded():
+        yield {}, get_vector_store_repo().duplicate_stats["bytes_saved"]
+
+def _module_bytes(module) -> int:
+    parameters = getattr(module, "parameters", None)
+    if parameters is None:
+        return 0
+    return sum(p.numel() * p.element_size() for p in parameters())
+
+def _model_memory():
+    if get_embedding_service.is_loaded():
+        embedder = get_embedding_service()
+        yield {"model": "embedder", "backend": embedder.backend}, _module_bytes(embedder.model)
+    if get_reranker.is_loaded():
+        reranker = get_reranker()
+        yield {"model": "reranker", "backend": reranker.backend}, _module_bytes(getattr(reranker.model, "model", reranker.model))
+
+def _log_records():
+    stats = logging_stats()
+    yield {"state": "queued"}, stats["queued"]
+    yield {"state": "dropped"}, stats["dropped"]
+
+def _query_log_records():
+    stats = query_log.stats()
+    yield {"state": "queued"}, stats["queued"]
+    yield {"state": "written"}, stats["written"]
+    yield {"state": "dropped"}, stats["dropped"]
+    yield {"state": "failed"}, stats["failed"]
+
+def _process_memory():
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+        yield {}, resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return
+
+registry.callback("legalai_cache_lookups", "Cache lookups by result.", "counter", _reranker_cache)
+registry.callback("legalai_cache_entries", "Number of cached entries.", "gauge", _reranker_cache_size)
+registry.callback("legalai_query_coalescing", "Queries by single-flight role (leader ran the pipeline, coalesced shared it).", "counter", _coalesced_queries)
+registry.callback("legalai_conversation_sessions", "Chat sessions held in memory.", "gauge", _conversations)
+registry.callback("legalai_conversation_retrievals", "Retrievals of chat session questions by mode (full hybrid search, or follow-up reusing cached candidates).", "counter", _conversation_retrievals)
+registry.callback("legalai_llm_events", "LLM call events (calls, hedges, fallbacks, timeouts, failures).", "counter", _llm_events)
+registry.callback("legalai_admission_slots", "Model stage slots in use and callers queued by priority.", "gauge", _admission_queue)
+registry.callback("legalai_admission_rejections", "Requests rejected with 429 because a model stage queue was full.", "counter", _admission_rejections)
+registry.callback("legalai_vector_store_documents", "Number of chunks in the vector collection.", "gauge", _collection_size)
+registry.callback("legalai_lexical_index_size", "Size of the BM25 lexical index.", "gauge", _lexical_index)
+registry.callback("legalai_write_buffer", "Chunks and estimated bytes waiting in the vector store write buffer.", "gauge", _write_buffer)
+registry.callback("legalai_write_buffer_flushes", "Vector store write buffer flushes by result.", "counter", _write_buffer_flushes)
+registry.callback("legalai_ingest_duplicate_chunks", "Ingested chunks checked for near-duplicates, stored as back-references, clustered, and promoted after a delete.", "counter", _duplicate_chunks)
+registry.callback("legalai_ingest_duplicate_bytes_saved", "Estimated text and embedding bytes not stored because of near-duplicate detection.", "counter", _duplicate_bytes_saved)
+registry.callback("legalai_model_parameter_bytes", "Memory held by model parameters (0 for non-PyTorch backends).", "gauge", _model_memory)
+registry.callback("legalai_log_records", "Log records waiting for the writer thread, and dropped because the queue was full.", "gauge", _log_records)
+registry.callback("legalai_query_log_records", "Query log records queued, written, dropped on overflow and lost to write errors.", "gauge", _query_log_records)
+registry.callback("legalai_process_resident_memory_bytes", "Resident memory of this worker process.", "gauge", _process_memory)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Prometheus metrics endpoint.
+    Returns stage latency histograms, counters and gauges in text exposition format.
+    With several workers, returns the merged metrics of all of them.
+    Runs in the threadpool because some gauges query the vector store.
+    """
+    body = worker_snapshots.render() if worker_snapshots is not None else registry.render()
+    return PlainTextResponse(body, media_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,15 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, validator
-from typing import List
+from typing import List, Dict, Any, Optional
 from src.api.dependencies import get_query_service
+from src.core.admission import admission
+from src.core.config import settings
+from src.core.query_log import query_log, request_elapsed_ms
 from src.services.query_service import QueryService
 from src.core.logging_config import get_logger
+from src.core.request_context import get_request_id, get_timings, start_budget
+import json
+import time
 
 logger = get_logger(__name__)
 router = APIRouter(prefix="/query", tags=["Query"])
 
+# Model stages a question goes through (checked for room before it is accepted)
+QUERY_STAGES = ("embedding", "rerank", "llm")
+
 class QueryRequest(BaseModel):
     query: str = Field(..., min_length=1, max_length=1000, description="User query")
+    debug: bool = Field(False, description="Include candidate counts, fusion and re-rank scores in the response")
+    session_id: Optional[str] = Field(None, min_length=1, max_length=128, description="Chat session ID; follow-ups reuse the session's retrieval")
     
     @validator('query')
     def validate_query(cls, v):
@@ -17,14 +29,59 @@ class QueryRequest(BaseModel):
             raise ValueError("Query cannot be empty")
         return v.strip()
 
+class BatchQueryRequest(BaseModel):
+    queries: List[str] = Field(..., description="User questions")
+    
+    @validator('queries')
+    def validate_queries(cls, v):
+        if not v:
+            raise ValueError("At least one query is required")
+        if len(v) > settings.QUERY_BATCH_MAX_QUESTIONS:
+            raise ValueError(f"At most {settings.QUERY_BATCH_MAX_QUESTIONS} queries per batch")
+        queries = [q.strip() for q in v]
+        for q in queries:
+            if not q:
+                raise ValueError("Query cannot be empty")
+            if len(q) > 1000:
+                raise ValueError("Query must be at most 1000 characters")
+        return queries
+
 class QueryResponse(BaseModel):
     response: str
     sources: List[str] = []
+    chunk_ids: List[Optional[str]] = []
+    session_id: Optional[str] = None
+    degradations: List[str] = []
+    debug: Optional[Dict[str, Any]] = None
+
+def _start_budget(budget_ms: Optional[int]):
+    """Give the request its time budget: the client's X-Request-Budget-Ms, else settings.QUERY_BUDGET_MS."""
+    if budget_ms is not None and not 1 <= budget_ms <= settings.QUERY_BUDGET_MAX_MS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"X-Request-Budget-Ms must be between 1 and {settings.QUERY_BUDGET_MAX_MS}"
+        )
+    start_budget(budget_ms or settings.QUERY_BUDGET_MS)
+
+def _debug_payload(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pipeline debug details plus this request's ID and stage timings (those
+    of the shared run, and the ID of the request that ran it, if coalesced).
+    """
+    timings = get_timings()
+    return {
+        "request_id": get_request_id(),
+        "coalesced_with": timings.coalesced_with if timings else None,
+        "timings_ms": {stage: round(seconds * 1000, 1) for stage, seconds in timings.totals().items()} if timings else {},
+        **(result.get("debug") or {}),
+    }
 
 @router.post("/", response_model=QueryResponse)
 async def query_documents(
     request: QueryRequest,
-    service: QueryService = Depends(get_query_service)
+    http_request: Request,
+    service: QueryService = Depends(get_query_service),
+    x_request_budget_ms: Optional[int] = Header(None, description="Time budget of the request in milliseconds")
 ):
     """
     Endpoint to query the RAG system.
@@ -34,22 +91,130 @@ async def query_documents(
     2. Call QueryService.query(query).
     3. Return response with sources.
     
+    When the time budget runs low, the pipeline degrades in steps and lists
+    them in 'degradations': reduced_initial_k, skipped_lexical,
+    skipped_rerank, capped_generation (and truncated_generation for streams).
+    The LLM call and its fallback must answer before the budget runs out.
+    
     Args:
         request: Query request with user question
+        http_request: Incoming HTTP request (carries the query log entry to the middleware)
+        x_request_budget_ms: Time budget (defaults to settings.QUERY_BUDGET_MS)
         
     Returns:
-        QueryResponse with answer and source documents
+        QueryResponse with answer, source documents and retrieved chunk IDs
     """
-    logger.info(f"Query request received: {request.query[:100]}...")
+    logger.info("Query request received: %s...", request.query[:100])
+    _start_budget(x_request_budget_ms)
+    admission.admit(QUERY_STAGES)
     
     try:
-        result = await service.query(request.query)
+        result = await service.query(request.query, session_id=request.session_id)
         response = QueryResponse(
             response=result["response"],
-            sources=result["sources"]
+            sources=result["sources"],
+            chunk_ids=result.get("chunk_ids", []),
+            session_id=request.session_id,
+            degradations=result.get("degradations", []),
+            debug=_debug_payload(result) if request.debug else None
         )
-        logger.info(f"Query processed successfully")
+        # Recorded by the request middleware once the response is ready
+        http_request.state.query_log = {
+            "endpoint": "query", "query": request.query, "chunk_ids": result.get("chunk_ids"),
+            "sources": result["sources"], "session_id": request.session_id,
+        }
+        logger.info("Query processed successfully")
         return response
     except Exception as e:
-        logger.error(f"Query failed: {e}", exc_info=True)
+        logger.error("Query failed: %s", e, exc_info=True)
         raise
+
+@router.post("/stream")
+async def query_documents_stream(
+    request: QueryRequest,
+    service: QueryService = Depends(get_query_service),
+    x_request_budget_ms: Optional[int] = Header(None, description="Time budget of the request in milliseconds")
+):
+    """
+    Endpoint to query the RAG system with a streamed answer.
+    
+    Returns newline-delimited JSON events: one 'sources' event, then
+    'token' events as the answer is generated, then 'done' (or 'error').
+    The 'done' event lists the degradations applied to meet the time budget.
+    Identical queries in flight share one generation.
+    
+    Args:
+        request: Query request with user question
+        x_request_budget_ms: Time budget (defaults to settings.QUERY_BUDGET_MS)
+        
+    Returns:
+        StreamingResponse of NDJSON events
+    """
+    logger.info("Streaming query request received: %s...", request.query[:100])
+    _start_budget(x_request_budget_ms)
+    admission.admit(QUERY_STAGES)
+    started_at = time.time() - request_elapsed_ms() / 1000
+    
+    async def event_stream():
+        retrieved, first_token_ms = {}, None
+        try:
+            async for event in service.query_stream(request.query, session_id=request.session_id):
+                if event["type"] == "sources":
+                    retrieved = event
+                elif event["type"] == "token" and first_token_ms is None:
+                    first_token_ms = request_elapsed_ms()
+                elif event["type"] == "done":
+                    query_log.record("query_stream", request.query, started_at, request_elapsed_ms(), status.HTTP_200_OK,
+                                     chunk_ids=retrieved.get("chunk_ids"), sources=retrieved.get("sources"),
+                                     session_id=request.session_id, first_token_ms=first_token_ms)
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        except Exception as e:
+            logger.error("Streaming query failed: %s", e, exc_info=True)
+            yield json.dumps({"type": "error", "message": str(e)}, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+@router.delete("/session/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def end_session(
+    session_id: str,
+    service: QueryService = Depends(get_query_service)
+):
+    """
+    Forget the conversation state of a chat session (e.g. when the chat is cleared).
+    Unknown or expired sessions are ignored.
+    
+    Args:
+        session_id: Chat session ID
+    """
+    service.end_session(session_id)
+
+@router.post("/batch")
+async def query_documents_batch(
+    request: BatchQueryRequest,
+    service: QueryService = Depends(get_query_service)
+):
+    """
+    Endpoint to answer many questions in one request.
+    
+    Returns newline-delimited JSON events: one 'result' (or 'error') event
+    per question as soon as it is answered, carrying the question's 'index'
+    in the request, then a final 'done' event.
+    
+    Args:
+        request: Batch request with the user questions
+        
+    Returns:
+        StreamingResponse of NDJSON events
+    """
+    logger.info("Batch query request received: %s question(s)", len(request.queries))
+    admission.admit(QUERY_STAGES)
+    
+    async def event_stream():
+        try:
+            async for event in service.query_batch(request.queries):
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        except Exception as e:
+            logger.error("Batch query failed: %s", e, exc_info=True)
+            yield json.dumps({"type": "error", "message": str(e)}, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends, Request
+from pydantic import BaseModel, Field, validator
+from typing import List, Dict, Any, Optional
+from src.api.dependencies import get_search_service
+from src.services.search_service import SearchService
+from src.core.admission import admission
+from src.core.config import settings
+from src.core.logging_config import get_logger
+import functools
+
+logger = get_logger(__name__)
+router = APIRouter(prefix="/search", tags=["Search"])
+
+class SearchRequest(BaseModel):
+    query: str = Field(..., min_length=1, max_length=1000, description="Search text")
+    limit: int = Field(10, ge=1, le=settings.SEARCH_MAX_PAGE_SIZE, description="Results per page")
+    cursor: Optional[str] = Field(None, description="Cursor from the previous page")
+    rerank: bool = Field(True, description="Re-rank candidates with the cross-encoder")
+    
+    @validator('query')
+    def validate_query(cls, v):
+        if not v.strip():
+            raise ValueError("Query cannot be empty")
+        return v.strip()
+
+class SearchResult(BaseModel):
+    chunk_id: Optional[str]
+    text: str
+    metadata: Dict[str, Any] = {}
+    rank: int
+    scores: Dict[str, Any] = {}
+
+class SearchResponse(BaseModel):
+    results: List[SearchResult]
+    total: int
+    next_cursor: Optional[str] = None
+
+@router.post("/", response_model=SearchResponse)
+async def search_documents(
+    request: SearchRequest,
+    http_request: Request,
+    service: SearchService = Depends(get_search_service)
+):
+    """
+    Endpoint to find passages without generating an answer.
+    
+    Runs embedding, hybrid search and (optionally) re-ranking and returns
+    the ranked chunks with their per-stage scores. Pass 'next_cursor' back
+    as 'cursor' to get the next page.
+    Runs on the admission thread pool because every stage is CPU or disk
+    bound and the model stages may wait for a slot.
+    
+    Args:
+        request: Search request with query, page size and cursor
+        http_request: Incoming HTTP request (carries the query log entry to the middleware)
+        
+    Returns:
+        SearchResponse with one page of ranked passages
+    """
+    logger.info("Search request received: %s...", request.query[:100])
+    admission.admit(("embedding", "rerank") if request.rerank else ("embedding",))
+    result = await admission.run(
+        functools.partial(service.search, request.query, limit=request.limit, cursor=request.cursor,
+                          rerank=request.rerank)
+    )
+    if request.cursor is None:
+        # Later pages depend on the first one and are not replayed
+        # Recorded by the request middleware once the response is ready
+        http_request.state.query_log = {
+            "endpoint": "search", "query": request.query,
+            "chunk_ids": [r["chunk_id"] for r in result["results"]],
+            "sources": list({(r["metadata"] or {}).get("filename", "Unknown") for r in result["results"]}),
+            "params": {"limit": request.limit, "rerank": request.rerank},
+        }
+    return SearchResponse(**result)
@@ -0,0 +1,157 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from pydantic import BaseModel, Field, validator
+from typing import Optional
+from src.api.dependencies import get_document_repo, get_document_service
+from src.api.routes.ingest import INGEST_STAGES
+from src.core.admission import admission
+from src.core.config import settings
+from src.repositories.document_repo import DocumentRepository
+from src.services.document_service import DocumentService
+from src.core.logging_config import get_logger
+import asyncio
+import re
+
+logger = get_logger(__name__)
+router = APIRouter(prefix="/ingest/uploads", tags=["Ingestion"])
+
+SHA256_PATTERN = re.compile(r"^[0-9a-fA-F]{64}$")
+
+class CreateUploadRequest(BaseModel):
+    filename: str = Field(..., min_length=1, max_length=255, description="Name of the file being uploaded")
+    size: int = Field(..., gt=0, description="File size in bytes")
+    part_size: Optional[int] = Field(None, description="Size of every part except the last (defaults to UPLOAD_PART_SIZE)")
+    sha256: Optional[str] = Field(None, description="Hex SHA-256 of the whole file, checked on completion")
+
+    @validator('size')
+    def validate_size(cls, v):
+        if v > settings.UPLOAD_MAX_FILE_SIZE:
+            raise ValueError(f"File size must be at most {settings.UPLOAD_MAX_FILE_SIZE} bytes")
+        return v
+
+    @validator('sha256')
+    def validate_sha256(cls, v):
+        if v is not None and not SHA256_PATTERN.match(v):
+            raise ValueError("sha256 must be 64 hexadecimal characters")
+        return v
+
+    @validator('part_size')
+    def validate_part_size(cls, v):
+        if v is not None and not settings.UPLOAD_MIN_PART_SIZE <= v <= settings.UPLOAD_MAX_PART_SIZE:
+            raise ValueError(
+                f"Part size must be between {settings.UPLOAD_MIN_PART_SIZE} and {settings.UPLOAD_MAX_PART_SIZE} bytes"
+            )
+        return v
+
+@router.post("/", status_code=status.HTTP_201_CREATED)
+def create_upload(
+    request: CreateUploadRequest,
+    repo: DocumentRepository = Depends(get_document_repo)
+):
+    """
+    Start a resumable upload.
+
+    Flow:
+    1. POST /ingest/uploads with the file name and size.
+    2. PUT each part to /ingest/uploads/{upload_id}/parts/{n} (1-based),
+       with its hex SHA-256 in the X-Part-SHA256 header. Parts may be sent
+       in any order, in parallel, and re-sent.
+    3. After a dropped connection, GET /ingest/uploads/{upload_id} lists
+       the missing parts.
+    4. POST /ingest/uploads/{upload_id}/complete starts ingestion.
+
+    Args:
+        request: File name, size, optional part size and file checksum
+
+    Returns:
+        Upload status with the upload ID and part layout
+    """
+    return repo.create_upload(
+        filename=request.filename,
+        size=request.size,
+        part_size=request.part_size or settings.UPLOAD_PART_SIZE,
+        sha256=request.sha256
+    )
+
+@router.put("/{upload_id}/parts/{part_number}")
+async def upload_part(
+    upload_id: str,
+    part_number: int,
+    request: Request,
+    x_part_sha256: str = Header(..., description="Hex SHA-256 of the part"),
+    repo: DocumentRepository = Depends(get_document_repo)
+):
+    """
+    Upload one part as the raw request body.
+    The body is read with a running size cap (413 as soon as it exceeds
+    settings.UPLOAD_MAX_PART_SIZE, with or without Content-Length), then the
+    part is verified against its checksum and written directly at its
+    position in the file.
+
+    Args:
+        upload_id: Upload ID
+        part_number: 1-based part number
+
+    Returns:
+        Part number, size and checksum
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > settings.UPLOAD_MAX_PART_SIZE:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Part too large")
+    data = bytearray()
+    async for chunk in request.stream():
+        data.extend(chunk)
+        if len(data) > settings.UPLOAD_MAX_PART_SIZE:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Part too large")
+    return await asyncio.to_thread(repo.write_part, upload_id, part_number, data, x_part_sha256)
+
+@router.get("/{upload_id}")
+def get_upload(
+    upload_id: str,
+    repo: DocumentRepository = Depends(get_document_repo)
+):
+    """
+    Status of a resumable upload: received and missing parts.
+
+    Args:
+        upload_id: Upload ID
+
+    Returns:
+        Upload status
+    """
+    return repo.get_upload(upload_id)
+
+@router.post("/{upload_id}/complete", status_code=status.HTTP_202_ACCEPTED)
+async def complete_upload(
+    upload_id: str,
+    repo: DocumentRepository = Depends(get_document_repo),
+    service: DocumentService = Depends(get_document_service)
+):
+    """
+    Finish a resumable upload and ingest the file in the background.
+    Fails with 409 while parts are missing, and with 429 while ingestion is
+    backed up (the upload is kept; retry completing it later).
+
+    Args:
+        upload_id: Upload ID
+
+    Returns:
+        The stored file and the ingestion job status (poll GET /ingest/jobs/{job_id})
+    """
+    admission.admit(INGEST_STAGES)
+    stored = await asyncio.to_thread(repo.complete_upload, upload_id)
+    job = service.start_stored_ingest_job(stored["filename"], stored["path"])
+    logger.info("Upload %s completed, ingestion job %s started", upload_id, job["job_id"])
+    return {"upload_id": upload_id, "filename": stored["filename"], "job": job}
+
+@router.delete("/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+def abort_upload(
+    upload_id: str,
+    repo: DocumentRepository = Depends(get_document_repo)
+):
+    """
+    Discard a resumable upload.
+
+    Args:
+        upload_id: Upload ID
+    """
+    repo.abort_upload(upload_id)
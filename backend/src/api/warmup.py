@@ -0,0 +1,115 @@
+"""
+Background warmup of heavy components at application startup.
+
+The embedder, reranker and vector store are loaded concurrently in worker
+threads and exercised once with a dummy input, so the first user request
+does not pay for model downloads, loads or first-inference allocations.
+"""
+import asyncio
+import gc
+import time
+from typing import Any, Callable, Dict
+from src.api.dependencies import get_embedding_service, get_reranker, get_vector_store_repo
+from src.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+WARMUP_TEXT = "Warmup query about the Penal Code of Bangladesh."
+
+
+class WarmupState:
+    """
+    Progress of the startup warmup, reported by the readiness probe.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.ready = False
+        self.phases: Dict[str, Dict[str, Any]] = {}
+        self.total_seconds = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "started": self.started,
+            "total_seconds": self.total_seconds,
+            "phases": self.phases,
+        }
+
+
+warmup_state = WarmupState()
+
+
+def _warm_embedder():
+    embedder = get_embedding_service()
+    embedder.embed_query(WARMUP_TEXT)
+
+
+def _warm_reranker():
+    reranker = get_reranker()
+    reranker.model.predict([[WARMUP_TEXT, WARMUP_TEXT]])
+
+
+def _warm_vector_store():
+    repo = get_vector_store_repo()
+    repo.collection.count()
+
+
+def preload_models():
+    """
+    Load and warm the models in the current process before worker processes fork.
+    Only fork-safe components are loaded here; the vector store (database
+    connections, file handles) is opened by each worker after the fork.
+    Objects created so far are frozen out of the garbage collector so that
+    collections in the workers do not touch, and thereby copy, shared pages.
+    """
+    started = time.perf_counter()
+    for name, func in (("embedder", _warm_embedder), ("reranker", _warm_reranker)):
+        phase_started = time.perf_counter()
+        func()
+        logger.info("Preloaded %s in %.2fs", name, time.perf_counter() - phase_started)
+    gc.collect()
+    gc.freeze()
+    logger.info("Models preloaded in %.2fs", time.perf_counter() - started)
+
+
+WARMUP_PHASES: Dict[str, Callable[[], None]] = {
+    "embedder": _warm_embedder,
+    "reranker": _warm_reranker,
+    "vector_store": _warm_vector_store,
+}
+
+
+async def _run_phase(name: str, func: Callable[[], None]) -> bool:
+    started = time.perf_counter()
+    warmup_state.phases[name] = {"status": "loading"}
+    try:
+        await asyncio.to_thread(func)
+        elapsed = time.perf_counter() - started
+        warmup_state.phases[name] = {"status": "ok", "seconds": round(elapsed, 3)}
+        logger.info("Warmup phase '%s' completed in %.2fs", name, elapsed)
+        return True
+    except Exception as e:
+        elapsed = time.perf_counter() - started
+        warmup_state.phases[name] = {"status": f"error: {e}", "seconds": round(elapsed, 3)}
+        logger.error("Warmup phase '%s' failed after %.2fs: %s", name, elapsed, e, exc_info=True)
+        return False
+
+
+async def run_warmup():
+    """
+    Load and warm all heavy components concurrently.
+    Marks the application ready once every phase succeeded.
+    """
+    warmup_state.started = True
+    started = time.perf_counter()
+    logger.info("Starting background warmup...")
+
+    results = await asyncio.gather(*(_run_phase(name, func) for name, func in WARMUP_PHASES.items()))
+
+    warmup_state.total_seconds = round(time.perf_counter() - started, 3)
+    warmup_state.ready = all(results)
+    if warmup_state.ready:
+        logger.info("Warmup completed in %.2fs", warmup_state.total_seconds)
+    else:
+        logger.error("Warmup finished with errors after %.2fs", warmup_state.total_seconds)
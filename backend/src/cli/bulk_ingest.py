@@ -0,0 +1,347 @@
+"""
+Bulk ingestion of a server-side directory tree.
+
+Files are parsed and chunked in a pool of worker processes, embedded in
+large batches and written to the vector store in bulk. Progress is saved to
+a checkpoint file after every write, so an interrupted run resumes where it
+stopped; files changed since they were ingested are re-ingested.
+
+Usage (from backend/):
+    python -m src.cli.bulk_ingest /srv/archive
+    python -m src.cli.bulk_ingest /srv/archive --workers 8 --embed-batch-size 128 --report report.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from src.core.logging_config import setup_logging, get_logger
+from src.utils.parsers import IMAGE_EXTENSIONS
+from src.utils.text_normalization import content_hash
+
+logger = get_logger(__name__)
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx') + IMAGE_EXTENSIONS
+DEFAULT_CHECKPOINT = "data/bulk_ingest_checkpoint.json"
+
+
+class Checkpoint:
+    """
+    Persistent record of the files already ingested from one directory tree.
+    Files are identified by relative path; a (size, mtime) signature detects changes.
+    """
+
+    def __init__(self, path: str, root: str):
+        """
+        Load the checkpoint for `root`, or start a new one.
+
+        Args:
+            path: Checkpoint file
+            root: Absolute path of the directory being ingested
+        """
+        self.path = Path(path)
+        self.root = root
+        self.completed: Dict[str, Dict[str, Any]] = {}
+        self.failed: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("root") != root:
+                raise ValueError(f"Checkpoint {self.path} belongs to {data.get('root')}, not {root}")
+            self.completed = data.get("completed", {})
+            self.failed = data.get("failed", {})
+
+    def status(self, relpath: str, signature: List[int]) -> str:
+        """'done', 'failed', 'changed' (ingested before, modified since) or 'new'."""
+        entry = self.completed.get(relpath)
+        if entry is not None:
+            return "done" if entry["signature"] == signature else "changed"
+        entry = self.failed.get(relpath)
+        if entry is not None and entry["signature"] == signature:
+            return "failed"
+        return "new"
+
+    def mark_done(self, relpath: str, signature: List[int], chunks: int):
+        self.failed.pop(relpath, None)
+        self.completed[relpath] = {"signature": signature, "chunks": chunks}
+
+    def mark_failed(self, relpath: str, signature: List[int], error: str):
+        self.failed[relpath] = {"signature": signature, "error": error}
+
+    def save(self):
+        """Write the checkpoint atomically."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"root": self.root, "completed": self.completed, "failed": self.failed}, f)
+        os.replace(tmp_path, self.path)
+
+
+# Per-process parser and chunker of the worker pool
+_parser = None
+_chunker = None
+
+
+def _init_worker():
+    global _parser, _chunker
+    from src.core.chunking import Chunker
+    from src.utils.parsers import FileParser
+    _parser = FileParser()
+    _chunker = Chunker()
+
+
+def _parse_file(path: str, relpath: str) -> Tuple[str, Optional[List[dict]], Optional[str], float]:
+    """
+    Parse and chunk one file in a worker process.
+
+    Returns:
+        Tuple of (relpath, chunks, error, seconds); chunks is None on failure
+    """
+    started = time.perf_counter()
+    try:
+        text = _parser.parse(path)
+        if not text or not text.strip():
+            return relpath, None, "No text extracted", time.perf_counter() - started
+        chunks = _chunker.chunk_text(text, metadata={'filename': os.path.basename(path), 'source': path})
+        return relpath, chunks, None, time.perf_counter() - started
+    except Exception as e:
+        return relpath, None, str(e), time.perf_counter() - started
+
+
+def discover(root: Path) -> Iterator[Tuple[str, str, List[int]]]:
+    """
+    Walk the tree in a stable order and yield supported files.
+
+    Yields:
+        Tuples of (absolute path, relative path, [size, mtime_ns])
+    """
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories.sort()
+        for filename in sorted(filenames):
+            if not filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                continue
+            path = os.path.join(directory, filename)
+            stat = os.stat(path)
+            yield path, os.path.relpath(path, root), [stat.st_size, stat.st_mtime_ns]
+
+
+class BulkIngestor:
+    """
+    Parses with a process pool, embeds in large batches and writes in bulk.
+    """
+
+    def __init__(self, root: str, checkpoint: Checkpoint, vector_store_repo, embedder, workers: int,
+                 embed_batch_size: int, flush_chunks: int, write_batch_size: int,
+                 retry_failed: bool = False, progress_seconds: float = 10.0):
+        """
+        Args:
+            root: Directory tree to ingest
+            checkpoint: Checkpoint of this tree
+            vector_store_repo: VectorStoreRepository instance
+            embedder: EmbeddingService instance
+            workers: Parser processes
+            embed_batch_size: Texts per embedding forward pass
+            flush_chunks: Chunks accumulated (from whole files) before embedding and writing
+            write_batch_size: Chunks per vector store write
+            retry_failed: Retry files that failed in a previous run
+            progress_seconds: Interval between progress reports
+        """
+        self.root = Path(root).resolve()
+        self.checkpoint = checkpoint
+        self.vector_store_repo = vector_store_repo
+        self.embedder = embedder
+        self.workers = workers
+        self.embed_batch_size = embed_batch_size
+        self.flush_chunks = flush_chunks
+        self.write_batch_size = write_batch_size
+        self.retry_failed = retry_failed
+        self.progress_seconds = progress_seconds
+
+        self.pending: List[Tuple[str, List[int], List[dict]]] = []  # Parsed files awaiting a flush
+        self.pending_chunks = 0
+        self.stats = {"files_ingested": 0, "files_failed": 0, "files_skipped": 0, "chunks": 0,
+                      "parse_seconds": 0.0, "embed_seconds": 0.0, "store_seconds": 0.0}
+        self._started = None
+        self._last_progress = 0.0
+
+    def run(self, pool: ProcessPoolExecutor) -> Dict[str, Any]:
+        """
+        Ingest every new or changed file of the tree.
+
+        Args:
+            pool: Process pool whose workers were initialized with _init_worker
+
+        Returns:
+            Dict report with counts, durations and throughput
+        """
+        self._started = time.perf_counter()
+        self._duplicate_stats = dict(self.vector_store_repo.duplicate_stats)
+        signatures: Dict[str, List[int]] = {}
+        in_flight = set()
+        max_in_flight = self.workers * 4  # Bounds memory held by parsed, unflushed files
+
+        for path, relpath, signature in discover(self.root):
+            status = self.checkpoint.status(relpath, signature)
+            if status == "done" or (status == "failed" and not self.retry_failed):
+                self.stats["files_skipped"] += 1
+                continue
+            if status == "changed":
+                self.vector_store_repo.delete_source(path)
+            signatures[relpath] = signature
+            in_flight.add(pool.submit(_parse_file, path, relpath))
+            if len(in_flight) >= max_in_flight:
+                self._collect(wait(in_flight, return_when=FIRST_COMPLETED).done, in_flight, signatures)
+
+        while in_flight:
+            self._collect(wait(in_flight, return_when=FIRST_COMPLETED).done, in_flight, signatures)
+        self._flush()
+        self._report_progress(force=True)
+        return self.report()
+
+    def report(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self._started
+        duplicates = {key: value - self._duplicate_stats[key] for key, value in self.vector_store_repo.duplicate_stats.items()}
+        return dict(
+            self.stats,
+            duplicate_chunks=duplicates["duplicates"],
+            clustered_chunks=duplicates["clustered"],
+            bytes_saved=duplicates["bytes_saved"],
+            root=str(self.root),
+            elapsed_seconds=elapsed,
+            files_per_second=self.stats["files_ingested"] / elapsed if elapsed > 0 else 0.0,
+            chunks_per_second=self.stats["chunks"] / elapsed if elapsed > 0 else 0.0,
+            collection_size=self.vector_store_repo.collection.count(),
+        )
+
+    def _collect(self, done, in_flight, signatures):
+        for future in done:
+            in_flight.discard(future)
+            relpath, chunks, error, seconds = future.result()
+            self.stats["parse_seconds"] += seconds
+            signature = signatures.pop(relpath)
+            if error is not None:
+                logger.warning("Failed to parse %s: %s", relpath, error)
+                self.checkpoint.mark_failed(relpath, signature, error)
+                self.stats["files_failed"] += 1
+                continue
+            self.pending.append((relpath, signature, chunks))
+            self.pending_chunks += len(chunks)
+            if self.pending_chunks >= self.flush_chunks:
+                self._flush()
+        self._report_progress()
+
+    def _flush(self):
+        """Embed and store every pending file, then checkpoint them."""
+        if not self.pending:
+            return
+        texts, metadatas, ids = [], [], []
+        for relpath, _, chunks in self.pending:
+            for chunk in chunks:
+                texts.append(chunk['text'])
+                metadatas.append(chunk['metadata'])
+                # Stable IDs: re-writing a file after a crash replaces its chunks
+                ids.append(content_hash(f"{relpath}:{chunk['metadata']['chunk_index']}"))
+
+        started = time.perf_counter()
+        embeddings = self.embedder.embed_documents(texts, batch_size=self.embed_batch_size)
+        self.stats["embed_seconds"] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        for start in range(0, len(texts), self.write_batch_size):
+            end = start + self.write_batch_size
+            self.vector_store_repo.add_documents(
+                texts[start:end], embeddings[start:end], metadatas[start:end],
+                ids=ids[start:end], update_lexical=False
+            )
+        self.stats["store_seconds"] += time.perf_counter() - started
+
+        for relpath, signature, chunks in self.pending:
+            self.checkpoint.mark_done(relpath, signature, len(chunks))
+        self.checkpoint.save()
+        self.stats["files_ingested"] += len(self.pending)
+        self.stats["chunks"] += len(texts)
+        self.pending = []
+        self.pending_chunks = 0
+
+    def _report_progress(self, force: bool = False):
+        now = time.perf_counter()
+        if not force and now - self._last_progress < self.progress_seconds:
+            return
+        self._last_progress = now
+        elapsed = now - self._started
+        print(f"[{elapsed:7.1f}s] files: {self.stats['files_ingested']} ingested, "
+              f"{self.stats['files_failed']} failed, {self.stats['files_skipped']} skipped | "
+              f"chunks: {self.stats['chunks']} | "
+              f"{self.stats['files_ingested'] / elapsed if elapsed > 0 else 0:.1f} files/s, "
+              f"{self.stats['chunks'] / elapsed if elapsed > 0 else 0:.1f} chunks/s", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest a directory tree of PDF, DOCX and image files")
+    parser.add_argument("directory", help="Root of the tree to ingest")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Checkpoint file used to resume")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry files that failed in an earlier run")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1), help="Parser processes")
+    parser.add_argument("--embed-batch-size", type=int, default=128, help="Texts per embedding forward pass")
+    parser.add_argument("--flush-chunks", type=int, default=2048, help="Chunks accumulated before each embed + write")
+    parser.add_argument("--write-batch-size", type=int, default=2048, help="Chunks per vector store write")
+    parser.add_argument("--progress-seconds", type=float, default=10.0, help="Interval between progress lines")
+    parser.add_argument("--report", default=None, help="Write the final JSON report here")
+    args = parser.parse_args(argv)
+
+    root = Path(args.directory).resolve()
+    if not root.is_dir():
+        parser.error(f"Not a directory: {root}")
+    if args.restart and Path(args.checkpoint).exists():
+        os.remove(args.checkpoint)
+
+    setup_logging()
+    try:
+        checkpoint = Checkpoint(args.checkpoint, str(root))
+    except ValueError as e:
+        parser.error(f"{e} (use --restart or another --checkpoint)")
+    if checkpoint.completed:
+        print(f"Resuming: {len(checkpoint.completed)} file(s) already ingested", flush=True)
+
+    # Spawned rather than forked: parser processes do not inherit the embedder or its threads
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context, initializer=_init_worker) as pool:
+        from src.repositories.vector_store_repo import VectorStoreRepository
+        from src.services.embedding_service import EmbeddingService
+
+        ingestor = BulkIngestor(
+            root=str(root),
+            checkpoint=checkpoint,
+            vector_store_repo=VectorStoreRepository(),
+            embedder=EmbeddingService(),
+            workers=args.workers,
+            embed_batch_size=args.embed_batch_size,
+            flush_chunks=args.flush_chunks,
+            write_batch_size=args.write_batch_size,
+            retry_failed=args.retry_failed,
+            progress_seconds=args.progress_seconds,
+        )
+        try:
+            report = ingestor.run(pool)
+        except KeyboardInterrupt:
+            pool.shutdown(wait=False, cancel_futures=True)
+            print("Interrupted; progress up to the last write is saved in the checkpoint", file=sys.stderr)
+            sys.exit(130)
+
+    print(f"Done: {report['files_ingested']} file(s), {report['chunks']} chunk(s) in {report['elapsed_seconds']:.1f}s "
+          f"({report['files_per_second']:.2f} files/s, {report['chunks_per_second']:.1f} chunks/s); "
+          f"{report['files_failed']} failed, {report['files_skipped']} skipped; "
+          f"{report['duplicate_chunks']} near-duplicate chunk(s) stored as back-references "
+          f"({report['bytes_saved']} bytes saved), {report['clustered_chunks']} clustered")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
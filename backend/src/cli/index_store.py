@@ -0,0 +1,78 @@
+"""
+Snapshot, restore and compaction of the search index.
+
+A snapshot is a point-in-time copy of the vector collection, the lexical
+(BM25) corpus and the document catalog, taken under the store's write lock
+while the API keeps serving. Restoring it lets a new node start serving
+without re-ingesting. Compaction rewrites the store without the space held
+by deleted chunks. Run restore and compact while the API is stopped.
+
+Usage (from backend/):
+    python -m src.cli.index_store snapshot /backups/index-2026-10-19 [--include-documents]
+    python -m src.cli.index_store restore /backups/index-2026-10-19 [--force]
+    python -m src.cli.index_store compact [--report compact.json]
+"""
+import argparse
+import json
+import sys
+from src.core.exceptions import LegalAIException
+from src.core.logging_config import setup_logging
+from src.repositories.index_maintenance import IndexMaintenance
+
+
+def _format_latency(latency) -> str:
+    return f"p50 {latency['p50']:.2f} ms, mean {latency['mean']:.2f} ms" if latency else "n/a"
+
+
+def main(argv=None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--report", default=None, help="Write the JSON report here")
+    parser = argparse.ArgumentParser(description="Snapshot, restore and compact the search index")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    snapshot = commands.add_parser("snapshot", parents=[common], help="Write a consistent snapshot of the index")
+    snapshot.add_argument("destination", help="New directory for the snapshot")
+    snapshot.add_argument("--include-documents", action="store_true", help="Also copy the original uploaded files")
+
+    restore = commands.add_parser("restore", parents=[common], help="Replace the index with a snapshot (API stopped)")
+    restore.add_argument("source", help="Snapshot directory")
+    restore.add_argument("--force", action="store_true", help="Replace an index that already holds data")
+    restore.add_argument("--no-verify", action="store_true", help="Skip checking file checksums against the manifest")
+    restore.add_argument("--keep-backup", action="store_true", help="Keep the replaced index files")
+
+    compact = commands.add_parser("compact", parents=[common], help="Rewrite the index without deleted entries (API stopped)")
+    compact.add_argument("--keep-backup", action="store_true", help="Keep the replaced index files")
+    compact.add_argument("--sample-queries", type=int, default=50, help="Probe queries for the latency comparison")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    maintenance = IndexMaintenance()
+    try:
+        if args.command == "snapshot":
+            report = maintenance.snapshot(args.destination, include_documents=args.include_documents)
+            print(f"Snapshot of {report['chunks']} chunk(s) from {report['documents']} document(s) written to "
+                  f"{report['path']} in {report['seconds']:.1f}s (writes blocked for {report['lock_held_seconds']:.2f}s)")
+        elif args.command == "restore":
+            report = maintenance.restore(args.source, force=args.force, verify=not args.no_verify,
+                                         keep_backup=args.keep_backup)
+            print(f"Restored {report['chunks']} chunk(s) from {report['documents']} document(s) "
+                  f"(snapshot of {report['created_at']}) in {report['seconds']:.1f}s as generation {report['generation']}")
+        else:
+            report = maintenance.compact(keep_backup=args.keep_backup, sample_queries=args.sample_queries)
+            print(f"Compacted {report['chunks']} chunk(s) in {report['seconds']:.1f}s: "
+                  f"{report['bytes_before']} -> {report['bytes_after']} bytes ({report['bytes_reclaimed']} reclaimed); "
+                  f"query latency {_format_latency(report['query_latency_before_ms'])} -> "
+                  f"{_format_latency(report['query_latency_after_ms'])}")
+        if report.get("backup"):
+            print(f"Replaced index files kept in {report['backup']}")
+    except LegalAIException as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
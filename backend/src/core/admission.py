@@ -0,0 +1,317 @@
+"""
+Admission control: per-stage concurrency limits with priority queues.
+
+Every model-bound stage (embedding, re-ranking, OCR, LLM) has a fixed number
+of slots. Callers that find all slots busy wait in a priority queue, where
+interactive work (queries, searches) is always served before bulk work
+(ingestion, batch queries). When too many interactive callers are already
+waiting, new ones are rejected with ServiceOverloadedError (HTTP 429) instead
+of piling up.
+
+Slots can be taken from threads (`slot`) and from coroutines (`aslot`); the
+priority comes from the current request context. Interactive requests run
+their model stages through `AdmissionController.run`, on a thread pool with
+a thread for every slot and allowed waiter, so they queue in the limiters
+(where they are counted and can be rejected) and never wait for a thread.
+"""
+import asyncio
+import contextvars
+import functools
+import heapq
+import itertools
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Dict, Iterable, Optional
+from src.core.config import settings
+from src.core.exceptions import ServiceOverloadedError
+from src.core.request_context import INTERACTIVE, BULK, get_priority
+
+# Smoothing factor of the moving average of slot hold times
+HOLD_TIME_SMOOTHING = 0.2
+
+STAGES = ("embedding", "rerank", "ocr", "llm")
+# Stages taken from threads of AdmissionController.run
+THREAD_STAGES = ("embedding", "rerank")
+
+
+class _Waiter:
+    """A queued acquisition, woken from whichever thread releases a slot."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop = None):
+        self.loop = loop
+        if loop is None:
+            self.event = threading.Event()
+        else:
+            self.future = loop.create_future()
+        self.granted = False
+
+    def wake(self):
+        self.granted = True
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class PriorityLimiter:
+    """
+    Concurrency limit for one stage with a two-level priority queue.
+    """
+
+    def __init__(self, name: str, capacity: int, max_queue: int):
+        """
+        Args:
+            name: Stage name
+            capacity: Concurrent holders allowed
+            max_queue: Interactive callers allowed to wait before new ones are rejected
+        """
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.max_queue = max_queue
+        self.in_use = 0
+        self._heap = []
+        self._sequence = itertools.count()
+        self._queued = {INTERACTIVE: 0, BULK: 0}
+        self._lock = threading.Lock()
+        self.admitted = {INTERACTIVE: 0, BULK: 0}
+        self.rejected = 0
+        self.avg_hold_seconds = 0.0
+
+    def _try_enter(self, priority: int, waiter_factory) -> Any:
+        """Take a free slot (returns None) or enqueue and return the waiter."""
+        with self._lock:
+            if self.in_use < self.capacity and not self._heap:
+                self.in_use += 1
+                self.admitted[priority] += 1
+                return None
+            if priority == INTERACTIVE and self._queued[INTERACTIVE] >= self.max_queue:
+                raise self._reject_locked()
+            # Bulk work already admitted always waits for its turn
+            waiter = waiter_factory()
+            heapq.heappush(self._heap, (priority, next(self._sequence), waiter))
+            self._queued[priority] += 1
+            self.admitted[priority] += 1
+            return waiter
+
+    def _cancel(self, waiter: _Waiter, priority: int):
+        """Remove a waiter that gave up; pass its slot on if it was already granted."""
+        with self._lock:
+            if waiter.granted:
+                self._release_locked()
+                return
+            for position, (_, _, queued) in enumerate(self._heap):
+                if queued is waiter:
+                    self._heap.pop(position)
+                    heapq.heapify(self._heap)
+                    self._queued[priority] -= 1
+                    break
+
+    def _release(self, held_seconds: float):
+        with self._lock:
+            self.avg_hold_seconds += HOLD_TIME_SMOOTHING * (held_seconds - self.avg_hold_seconds)
+            self._release_locked()
+
+    def _release_locked(self):
+        # Hand the slot straight to the highest-priority waiter
+        if self._heap:
+            priority, _, waiter = heapq.heappop(self._heap)
+            self._queued[priority] -= 1
+            waiter.wake()
+        else:
+            self.in_use -= 1
+
+    @contextmanager
+    def slot(self, priority: int = None):
+        """Hold a slot in the calling thread, waiting for one if needed."""
+        priority = get_priority() if priority is None else priority
+        waiter = self._try_enter(priority, _Waiter)
+        if waiter is not None:
+            try:
+                waiter.event.wait()
+            except BaseException:
+                self._cancel(waiter, priority)
+                raise
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - started)
+
+    @asynccontextmanager
+    async def aslot(self, priority: int = None):
+        """Hold a slot in a coroutine, waiting for one without blocking the event loop."""
+        priority = get_priority() if priority is None else priority
+        loop = asyncio.get_running_loop()
+        waiter = self._try_enter(priority, lambda: _Waiter(loop))
+        if waiter is not None:
+            try:
+                await waiter.future
+            except BaseException:
+                self._cancel(waiter, priority)
+                raise
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - started)
+
+    def is_full(self, priority: int = INTERACTIVE) -> bool:
+        """
+        True when new work of this priority should be turned away: interactive
+        work when max_queue interactive callers wait, bulk work when max_queue
+        callers of any priority wait.
+        """
+        with self._lock:
+            queued = self._queued[INTERACTIVE]
+            if priority != INTERACTIVE:
+                queued += self._queued[BULK]
+            return queued >= self.max_queue
+
+    def reject(self) -> ServiceOverloadedError:
+        """Count a rejection and build the error to raise for it."""
+        with self._lock:
+            return self._reject_locked()
+
+    def _reject_locked(self) -> ServiceOverloadedError:
+        self.rejected += 1
+        return ServiceOverloadedError(
+            f"The {self.name} stage is overloaded; retry later",
+            retry_after=self._retry_after_locked(),
+        )
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue is expected to drain."""
+        with self._lock:
+            return self._retry_after_locked()
+
+    def _retry_after_locked(self) -> int:
+        queued = self._queued[INTERACTIVE] + self._queued[BULK]
+        return max(1, math.ceil(queued * self.avg_hold_seconds / self.capacity))
+
+    def stats(self) -> Dict[str, Any]:
+        """Capacity, slots in use, queue depth per priority and counters."""
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "in_use": self.in_use,
+                "queued_interactive": self._queued[INTERACTIVE],
+                "queued_bulk": self._queued[BULK],
+                "max_queue": self.max_queue,
+                "admitted_interactive": self.admitted[INTERACTIVE],
+                "admitted_bulk": self.admitted[BULK],
+                "rejected": self.rejected,
+                "avg_hold_seconds": round(self.avg_hold_seconds, 4),
+            }
+
+
+class AdmissionController:
+    """
+    The stage limiters of this process, built from settings on first use.
+    """
+
+    def __init__(self):
+        self._limiters: Dict[str, PriorityLimiter] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def limiter(self, stage: str) -> PriorityLimiter:
+        """Limiter of a stage ('embedding', 'rerank', 'ocr' or 'llm')."""
+        limiter = self._limiters.get(stage)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.get(stage)
+                if limiter is None:
+                    key = stage.upper()
+                    limiter = PriorityLimiter(
+                        stage,
+                        capacity=getattr(settings, f"ADMISSION_{key}_CONCURRENCY"),
+                        max_queue=getattr(settings, f"ADMISSION_{key}_QUEUE_SIZE"),
+                    )
+                    self._limiters[stage] = limiter
+        return limiter
+
+    @contextmanager
+    def slot(self, stage: str):
+        """Hold a slot of a stage in the calling thread (no-op when admission control is off)."""
+        if not settings.ADMISSION_ENABLED:
+            yield
+            return
+        with self.limiter(stage).slot():
+            yield
+
+    @asynccontextmanager
+    async def aslot(self, stage: str):
+        """Hold a slot of a stage in a coroutine (no-op when admission control is off)."""
+        if not settings.ADMISSION_ENABLED:
+            yield
+            return
+        async with self.limiter(stage).aslot():
+            yield
+
+    def admit(self, stages: Iterable[str]):
+        """
+        Front-door check for a new request at the current priority: reject it
+        up front if any stage it needs is already full, rather than failing
+        it halfway.
+
+        Args:
+            stages: Stages the request will use
+
+        Raises:
+            ServiceOverloadedError: A stage queue is full
+        """
+        if not settings.ADMISSION_ENABLED:
+            return
+        priority = get_priority()
+        for stage in stages:
+            limiter = self.limiter(stage)
+            if limiter.is_full(priority):
+                raise limiter.reject()
+
+    def executor(self) -> ThreadPoolExecutor:
+        """
+        Thread pool for interactive work that takes embedding and re-ranking
+        slots, with one thread per slot and per allowed waiter of those stages.
+        """
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    threads = sum(
+                        getattr(settings, f"ADMISSION_{stage.upper()}_CONCURRENCY")
+                        + getattr(settings, f"ADMISSION_{stage.upper()}_QUEUE_SIZE")
+                        for stage in THREAD_STAGES
+                    )
+                    self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="admission")
+        return self._executor
+
+    async def run(self, func: Callable, *args) -> Any:
+        """
+        Run a blocking call that takes model slots on the admission thread
+        pool, in the current request context.
+
+        Args:
+            func: Blocking callable
+            *args: Its arguments
+
+        Returns:
+            The callable's result
+        """
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor(), functools.partial(context.run, func, *args)
+        )
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Statistics of every stage limiter."""
+        return {stage: self.limiter(stage).stats() for stage in STAGES}
+
+
+admission = AdmissionController()
@@ -15,6 +15,7 @@ class Settings:
     # Paths
     CHROMA_DB_DIR: str = "data/chroma_db"
     UPLOAD_DIR: str = "data/uploads"
+    UPLOAD_SESSION_DIR: str = "data/upload_sessions"  # Resumable uploads in progress
     
     # Models
     EMBEDDING_MODEL_NAME: str = "all-MiniLM-L6-v2"
@@ -22,30 +23,150 @@ class Settings:
     LLM_MODEL: str = "gemini-2.5-flash"
     LLM_TEMPERATURE: float = 0.3
     
+    # LLM Latency Controls
+    GOOGLE_API_ENDPOINT: str = os.getenv("GOOGLE_API_ENDPOINT", "")  # Override Gemini endpoint (e.g. local stub server)
+    LLM_FALLBACK_MODEL: str = os.getenv("LLM_FALLBACK_MODEL", "gemini-2.5-flash-lite")  # Empty disables fallback
+    LLM_TIMEOUT_SECONDS: float = 30.0  # Deadline for a primary LLM call (first token when streaming)
+    LLM_FALLBACK_TIMEOUT_SECONDS: float = 20.0  # Deadline for a fallback LLM call
+    LLM_MAX_RETRIES: int = 1  # Client-level retries per LLM request
+    LLM_HEDGE_ENABLED: bool = True  # Send a second request when the first is slower than p95
+    LLM_HEDGE_DELAY_SECONDS: float = 8.0  # Hedging delay until enough latency samples exist
+    LLM_HEDGE_MIN_DELAY_SECONDS: float = 1.0  # Lower bound for the p95-based hedging delay
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # Samples needed before the p95 latency is used
+    LLM_LATENCY_WINDOW: int = 200  # Recent LLM latencies kept for p95 estimation
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 5  # Consecutive failures before the breaker opens
+    LLM_CIRCUIT_RESET_SECONDS: float = 30.0  # Time the breaker stays open before a trial call
+    
+    # Inference Backend Settings
+    INFERENCE_BACKEND: str = os.getenv("INFERENCE_BACKEND", "torch")  # torch | onnx | onnx-int8
+    MODEL_CACHE_DIR: str = "data/models"  # Exported ONNX models are cached here
+    ONNX_QUANTIZATION_CONFIG: str = "avx2"  # arm64 | avx2 | avx512 | avx512_vnni
+    ONNX_MIN_COSINE_SIMILARITY: float = 0.98  # Embedding equivalence tolerance vs torch
+    ONNX_MAX_SCORE_DEVIATION: float = 0.5  # Cross-encoder score equivalence tolerance vs torch
+    
     # RAG Settings
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
     TOP_K_RESULTS: int = 5
     
+    # Query Budget Settings (graceful degradation)
+    QUERY_BUDGET_MS: int = int(os.getenv("QUERY_BUDGET_MS", "0"))  # Default time budget per query, 0 = none (X-Request-Budget-Ms overrides)
+    QUERY_BUDGET_MAX_MS: int = 120000  # Largest budget a client may request
+    QUERY_DEGRADE_REDUCE_K_BELOW_MS: int = 6000  # Less budget left at search time: fetch TOP_K_RESULTS candidates instead of 2x
+    QUERY_DEGRADE_SKIP_LEXICAL_BELOW_MS: int = 4000  # Less budget left at search time: vector search only
+    QUERY_DEGRADE_SKIP_RERANK_BELOW_MS: int = 3000  # Less budget left after search: keep fusion order, skip the cross-encoder
+    QUERY_DEGRADE_CAP_GENERATION_BELOW_MS: int = 2500  # Less budget left before generation: cap the answer length
+    QUERY_DEGRADED_MAX_OUTPUT_TOKENS: int = 256  # Answer length cap of a degraded generation
+    
+    # Batch Query Settings
+    QUERY_BATCH_MAX_QUESTIONS: int = 500  # Questions accepted per /query/batch request
+    QUERY_BATCH_RETRIEVAL_SIZE: int = 32  # Questions embedded, searched and re-ranked together
+    QUERY_BATCH_CONCURRENCY: int = 8  # Concurrent LLM calls across all running batches
+    
+    # Search Settings (retrieval only, no generation)
+    SEARCH_MAX_RESULTS: int = 50  # Ranked passages computed per search (across all pages)
+    SEARCH_MAX_PAGE_SIZE: int = 50  # Largest page a client may request
+    SEARCH_CACHE_SIZE: int = 1000  # Ranked lists kept for pagination, 0 disables
+    SEARCH_CACHE_TTL_SECONDS: float = 300.0  # Lifetime of a cached ranked list
+    
+    # Conversation Settings
+    CONVERSATION_MAX_SESSIONS: int = 10000  # Chat sessions kept in memory per worker (LRU)
+    CONVERSATION_TTL_SECONDS: float = 1800.0  # Idle time after which a session is forgotten
+    CONVERSATION_MAX_CANDIDATES: int = 20  # Candidates carried over to the next turn
+    CONVERSATION_INCREMENTAL_K: int = 5  # New candidates retrieved for a follow-up
+    CONVERSATION_TOPIC_SHIFT_SIMILARITY: float = 0.15  # Below this question/conversation similarity, retrieve from scratch
+    
+    # Context Assembly Settings
+    CONTEXT_MAX_TOKENS: int = 3000  # Token budget for the context sent to the LLM
+    CONTEXT_CHARS_PER_TOKEN: float = 4.0  # Characters per token used to estimate context size
+    
     # Hybrid Search Settings
     HYBRID_SEARCH_ALPHA: float = 0.7  # 0=BM25 only, 1=vector only
     HYBRID_SEARCH_RRF_K: int = 60  # RRF constant for reciprocal rank fusion
     
+    # Re-ranking Settings
+    RERANKER_CACHE_SIZE: int = 50000  # Max cached (query, chunk) cross-encoder scores, 0 disables
+    
     # Vector Store Settings
     VECTOR_STORE_COLLECTION_NAME: str = "legal_docs"
+    VECTOR_STORE_MAX_BATCH_SIZE: int = 5000  # Chunks per Chroma write call (lowered to Chroma's own limit)
+    VECTOR_WRITE_BUFFER_MAX_CHUNKS: int = 2000  # Flush buffered writes at this many chunks
+    VECTOR_WRITE_BUFFER_MAX_BYTES: int = 32 * 1024 * 1024  # ... or at this estimated payload size
+    VECTOR_WRITE_BUFFER_MAX_AGE_MS: int = 500  # ... or this long after the first buffered chunk
+
+    # Near-Duplicate Detection Settings
+    DEDUP_ENABLED: bool = os.getenv("DEDUP_ENABLED", "false").lower() == "true"  # Store near-duplicate chunks once
+    DEDUP_THRESHOLD: float = 0.97  # Shingle Jaccard similarity at which a chunk is stored as a back-reference (amended provisions differ by a few words)
+    DEDUP_CLUSTER_THRESHOLD: float = 0.7  # Similarity at which a stored chunk joins the other's cluster
+    DEDUP_SHINGLE_SIZE: int = 5  # Words per shingle
+    DEDUP_MINHASH_PERMUTATIONS: int = 128  # MinHash signature length
+    DEDUP_LSH_BANDS: int = 32  # LSH bands (permutations / bands rows each); changing any of these three re-keys the index
+    DEDUP_MAX_CANDIDATES: int = 8  # LSH candidates verified per chunk
+    DEDUP_MAX_BACK_REFERENCES: int = 64  # Back-references kept on one chunk; the next duplicate is stored as a new copy
+    DEDUP_MAX_SOURCE_FILENAMES: int = 3  # Documents listed in a query's sources per retrieved chunk
+
+    # Resumable Upload Settings
+    UPLOAD_PART_SIZE: int = 8 * 1024 * 1024  # Default part size of resumable uploads
+    UPLOAD_MIN_PART_SIZE: int = 256 * 1024  # Smallest part size a client may choose
+    UPLOAD_MAX_PART_SIZE: int = 64 * 1024 * 1024  # Largest part size (a part is held in memory while verified)
+    UPLOAD_MAX_FILE_SIZE: int = 2 * 1024 * 1024 * 1024  # Largest file accepted by a resumable upload
+    UPLOAD_SESSION_TTL_SECONDS: float = 86400.0  # Unfinished uploads are removed after this long without activity
+    
+    # Ingestion Pipeline Settings
+    INGEST_QUEUE_SIZE: int = 4  # Files buffered between two ingestion stages
+    INGEST_PARSE_WORKERS: int = 2  # Concurrent parse/OCR workers
+    INGEST_EMBED_WORKERS: int = 1  # Concurrent embedding workers
+    INGEST_STORE_WORKERS: int = 1  # Concurrent vector store writers
+    INGEST_JOB_DIR: str = "data/ingest_jobs"  # Status files of background ingestion jobs
+    INGEST_JOB_TTL_SECONDS: float = 86400.0  # Status files are removed this long after their last update
+    INGEST_JOB_STATUS_WRITE_INTERVAL_SECONDS: float = 0.5  # Minimum time between intermediate status writes
+    INGEST_JOB_HEARTBEAT_SECONDS: float = 10.0  # Running jobs rewrite their status at least this often
+    INGEST_JOB_STALE_SECONDS: float = 120.0  # Unfinished jobs not updated for this long are reported as interrupted
+    
+    # Admission Control Settings (per worker process)
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"  # Limit and prioritize model stages
+    ADMISSION_EMBEDDING_CONCURRENCY: int = 2  # Concurrent embedding model calls
+    ADMISSION_EMBEDDING_QUEUE_SIZE: int = 64  # Waiting interactive callers before requests get 429
+    ADMISSION_RERANK_CONCURRENCY: int = 2  # Concurrent cross-encoder calls
+    ADMISSION_RERANK_QUEUE_SIZE: int = 64
+    ADMISSION_OCR_CONCURRENCY: int = 2  # Concurrent vision model (OCR) calls
+    ADMISSION_OCR_QUEUE_SIZE: int = 32
+    ADMISSION_LLM_CONCURRENCY: int = 16  # Concurrent answer generations (streams hold a slot until done)
+    ADMISSION_LLM_QUEUE_SIZE: int = 256
     
     # Server
-    HOST: str = "0.0.0.0"
-    PORT: int = 8000
+    HOST: str = os.getenv("HOST", "0.0.0.0")  # Bind address in production mode
+    PORT: int = int(os.getenv("PORT", "8000"))  # Bind port in production mode
+    WORKERS: int = int(os.getenv("WORKERS", "4"))  # Worker processes in production mode
+    WORKER_TIMEOUT: int = int(os.getenv("WORKER_TIMEOUT", "120"))  # Seconds before a silent worker is restarted
+    WORKER_TORCH_THREADS: int = int(os.getenv("WORKER_TORCH_THREADS", "0"))  # Intra-op threads per worker, 0 = library default
+    METRICS_MULTIPROC_DIR: str = os.getenv("METRICS_MULTIPROC_DIR", "")  # Per-worker metric snapshots merged by /metrics (set by --prod)
+    METRICS_SNAPSHOT_INTERVAL_SECONDS: float = 5.0  # How often each worker refreshes its snapshot
     DEBUG: bool = os.getenv("DEBUG", "false").lower() == "true"
+    WARMUP_ON_STARTUP: bool = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"  # Load models in background at startup
     
     # Logging
-    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")  # Console level
+    LOG_FILE_LEVEL: str = os.getenv("LOG_FILE_LEVEL", "INFO")  # logs/app.log level
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text")  # text | json
+    LOG_FILE_MAX_BYTES: int = 10 * 1024 * 1024  # Rotate logs/app.log at this size
+    LOG_FILE_BACKUP_COUNT: int = 5  # Rotated files kept
+    LOG_QUEUE_SIZE: int = 10000  # Records buffered for the writer thread; overflow is dropped
+    LOG_DEBUG_SAMPLE_RATE: float = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))  # Fraction of DEBUG records kept
+    
+    # Query Log Settings (capture for replay)
+    QUERY_LOG_ENABLED: bool = os.getenv("QUERY_LOG_ENABLED", "false").lower() == "true"  # Record served queries
+    QUERY_LOG_DIR: str = os.getenv("QUERY_LOG_DIR", "data/query_log")  # One append-only JSONL file per process and period
+    QUERY_LOG_SAMPLE_RATE: float = float(os.getenv("QUERY_LOG_SAMPLE_RATE", "1.0"))  # Fraction of queries recorded
+    QUERY_LOG_SCRUB_PII: bool = True  # Replace e-mail addresses, phone, card and ID numbers in recorded queries
+    QUERY_LOG_MAX_FILE_BYTES: int = 64 * 1024 * 1024  # Start a new file at this size (and every UTC day)
+    QUERY_LOG_QUEUE_SIZE: int = 10000  # Records buffered for the writer thread; overflow is dropped
     
     def __init__(self):
         """Ensure required directories exist."""
         Path(self.CHROMA_DB_DIR).mkdir(parents=True, exist_ok=True)
         Path(self.UPLOAD_DIR).mkdir(parents=True, exist_ok=True)
+        Path(self.UPLOAD_SESSION_DIR).mkdir(parents=True, exist_ok=True)
         Path("logs").mkdir(exist_ok=True)
     
     def validate(self):
@@ -0,0 +1,130 @@
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Tuple
+from src.core.config import settings
+
+# Overlaps shorter than this are treated as coincidental and kept
+MIN_OVERLAP_CHARS = 20
+
+@dataclass
+class ContextBlock:
+    """
+    A contiguous span of one source document assembled from one or more chunks.
+    """
+    source: str
+    text: str
+    score: float
+    chunk_indices: List[int] = field(default_factory=list)
+
+    @property
+    def label(self) -> str:
+        """Human readable source label, e.g. 'act.pdf, chunks 3-4'."""
+        if not self.chunk_indices:
+            return self.source
+        first, last = min(self.chunk_indices), max(self.chunk_indices)
+        span = f"chunk {first}" if first == last else f"chunks {first}-{last}"
+        return f"{self.source}, {span}"
+
+class ContextBuilder:
+    """
+    Assembles the LLM context from re-ranked chunks.
+    Merges adjacent chunks of the same source, removes their shared overlap
+    and packs the resulting blocks by score into a token budget.
+    """
+
+    def __init__(self, max_tokens: int = None, chars_per_token: float = None, chunk_overlap: int = None):
+        """
+        Initialize builder with configurable parameters.
+
+        Args:
+            max_tokens: Token budget for the assembled context (defaults to settings.CONTEXT_MAX_TOKENS)
+            chars_per_token: Characters per token used for estimation (defaults to settings.CONTEXT_CHARS_PER_TOKEN)
+            chunk_overlap: Maximum overlap searched between adjacent chunks (defaults to settings.CHUNK_OVERLAP)
+        """
+        self.max_tokens = max_tokens or settings.CONTEXT_MAX_TOKENS
+        self.chars_per_token = chars_per_token or settings.CONTEXT_CHARS_PER_TOKEN
+        self.chunk_overlap = chunk_overlap or settings.CHUNK_OVERLAP
+
+    def estimate_tokens(self, text: str) -> int:
+        """
+        Estimate the number of tokens in a text.
+
+        Args:
+            text: Text to measure
+
+        Returns:
+            int: Estimated token count
+        """
+        return int(len(text) / self.chars_per_token) + 1
+
+    def build(self, chunks: List[Tuple[str, float, Dict[str, Any]]]) -> Tuple[str, List[ContextBlock]]:
+        """
+        Build the context string from scored chunks.
+
+        Args:
+            chunks: List of (text, score, metadata) tuples
+
+        Returns:
+            Tuple of (context string, blocks included in the context)
+        """
+        blocks = self._merge_adjacent(chunks)
+        packed = self._pack(blocks)
+        context = "\n\n".join(f"[Source: {block.label}]\n{block.text}" for block in packed)
+        return context, packed
+
+    def _merge_adjacent(self, chunks: List[Tuple[str, float, Dict[str, Any]]]) -> List[ContextBlock]:
+        """Merge chunks with consecutive chunk indices from the same source."""
+        by_source = {}
+        unordered = []
+        for text, score, metadata in chunks:
+            metadata = metadata or {}
+            source = metadata.get("filename") or metadata.get("source") or "Unknown"
+            chunk_index = metadata.get("chunk_index")
+            if chunk_index is None:
+                unordered.append(ContextBlock(source=source, text=text, score=score))
+            else:
+                by_source.setdefault(source, []).append((int(chunk_index), text, score))
+
+        blocks = []
+        for source, items in by_source.items():
+            items.sort(key=lambda item: item[0])
+            current = None
+            for chunk_index, text, score in items:
+                if current is not None and chunk_index == current.chunk_indices[-1] + 1:
+                    current.text += self._strip_overlap(current.text, text)
+                    current.score = max(current.score, score)
+                    current.chunk_indices.append(chunk_index)
+                elif current is not None and chunk_index == current.chunk_indices[-1]:
+                    # Same chunk retrieved twice
+                    current.score = max(current.score, score)
+                else:
+                    current = ContextBlock(source=source, text=text, score=score, chunk_indices=[chunk_index])
+                    blocks.append(current)
+
+        return blocks + unordered
+
+    def _strip_overlap(self, previous: str, following: str) -> str:
+        """Return `following` without the prefix it shares with the end of `previous`."""
+        max_len = min(len(previous), len(following), self.chunk_overlap)
+        for length in range(max_len, MIN_OVERLAP_CHARS - 1, -1):
+            if previous.endswith(following[:length]):
+                return following[length:]
+        separator = "" if previous.endswith(("\n", " ")) or following.startswith(("\n", " ")) else "\n"
+        return separator + following
+
+    def _pack(self, blocks: List[ContextBlock]) -> List[ContextBlock]:
+        """Select blocks by descending score until the token budget is spent."""
+        packed = []
+        remaining = self.max_tokens
+        for block in sorted(blocks, key=lambda b: b.score, reverse=True):
+            tokens = self.estimate_tokens(block.text)
+            if tokens <= remaining:
+                packed.append(block)
+                remaining -= tokens
+            elif not packed:
+                # Always include (a truncated part of) the best block
+                block.text = block.text[:int(remaining * self.chars_per_token)]
+                packed.append(block)
+                remaining = 0
+            if remaining <= 0:
+                break
+        return packed
@@ -23,6 +23,22 @@ class QueryError(LegalAIException):
     """Raised when query processing fails."""
     pass
 
+class LLMTimeoutError(QueryError):
+    """Raised when the LLM does not answer within its deadline."""
+    pass
+
+class LLMUnavailableError(QueryError):
+    """Raised when the LLM cannot be called (e.g. circuit breaker open, no fallback)."""
+    pass
+
+class InvalidCursorError(QueryError):
+    """Raised when a pagination cursor is malformed, belongs to another search or its results changed."""
+    pass
+
+class IndexSnapshotError(VectorStoreError):
+    """Raised when an index snapshot cannot be taken, verified or restored, or compaction fails."""
+    pass
+
 class ConfigurationError(LegalAIException):
     """Raised when configuration is invalid or missing."""
     pass
@@ -31,6 +47,25 @@ class FileStorageError(LegalAIException):
     """Raised when file storage operations fail."""
     pass
 
+class UploadNotFoundError(FileStorageError):
+    """Raised when a resumable upload is unknown, expired or already completed."""
+    pass
+
+class UploadPartError(FileStorageError):
+    """Raised when an upload part is out of range, has the wrong size or fails its checksum."""
+    pass
+
+class UploadIncompleteError(FileStorageError):
+    """Raised when completing an upload that still misses parts or fails its file checksum."""
+    pass
+
+class ServiceOverloadedError(LegalAIException):
+    """Raised when a model stage's queue is full; retry_after is the suggested wait in seconds."""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
 class UnsupportedFileTypeError(LegalAIException):
     """Raised when an unsupported file type is uploaded."""
     pass
@@ -1,68 +1,237 @@
+import atexit
+import copy
+import itertools
+import json
 import logging
+import logging.handlers
+import os
+import queue
 import sys
+from datetime import datetime, timezone
 from pathlib import Path
 from src.core.config import settings
+from src.core.request_context import get_request_id
+
+# Attributes every LogRecord has; anything else was passed via `extra=`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+_queue_handler = None
+_listener = None
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Attach the current request ID (or '-') to every log record.
+    """
+    def filter(self, record):
+        record.request_id = get_request_id() or "-"
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    """
+    Let through one in every `every` DEBUG records; other levels always pass.
+    """
+    def __init__(self, rate: float):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self._counter = itertools.count()
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        if not self.every:
+            return False
+        return next(self._counter) % self.every == 0
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line with timestamp, level, logger, request ID,
+    message, source location, exception and any `extra=` fields.
+    """
+    def format(self, record):
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+            "location": f"{record.filename}:{record.lineno}",
+            "process": record.process,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that drops records instead of blocking when the queue is full.
+    """
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Merge the arguments now (they may change later) but leave the
+        # formatting and traceback rendering to the writer thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _level(name: str, default: int) -> int:
+    return getattr(logging, name.upper(), default)
+
+
+def _build_handlers(log_dir: Path):
+    if settings.LOG_FORMAT == "json":
+        detailed_formatter = simple_formatter = JsonFormatter()
+    else:
+        detailed_formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] - %(filename)s:%(lineno)d - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        simple_formatter = logging.Formatter(
+            '%(asctime)s - %(levelname)s - [%(request_id)s] - %(message)s',
+            datefmt='%H:%M:%S'
+        )
+
+    file_handler = _build_file_handler(log_dir / "app.log", detailed_formatter)
+
+    # Console handler (simpler logs)
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setLevel(_level(settings.LOG_LEVEL, logging.INFO))
+    console_handler.setFormatter(simple_formatter)
+
+    return file_handler, console_handler
+
+
+def _build_file_handler(path: Path, formatter: logging.Formatter) -> logging.Handler:
+    # File handler (detailed logs), rotated by size
+    file_handler = logging.handlers.RotatingFileHandler(
+        path,
+        maxBytes=settings.LOG_FILE_MAX_BYTES,
+        backupCount=settings.LOG_FILE_BACKUP_COUNT,
+        encoding='utf-8'
+    )
+    file_handler.setLevel(_level(settings.LOG_FILE_LEVEL, logging.INFO))
+    file_handler.setFormatter(formatter)
+    return file_handler
+
+
+def _start_listener(handlers):
+    global _listener
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def _restart_listener_in_child():
+    """
+    The writer thread does not survive fork(): give a forked worker its own
+    queue and writer so records are not left in a queue nobody drains.
+
+    The worker also gets its own log file (logs/app.<pid>.log): processes
+    rotating one shared file would rename it from under each other.
+    """
+    if _queue_handler is None or _listener is None:
+        return
+    _queue_handler.queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    handlers = []
+    for handler in _listener.handlers:
+        if isinstance(handler, logging.handlers.RotatingFileHandler):
+            path = Path(handler.baseFilename)
+            handler.close()  # Only the inherited descriptor; the parent keeps writing
+            handler = _build_file_handler(path.with_name(f"{path.stem}.{os.getpid()}{path.suffix}"), handler.formatter)
+        handlers.append(handler)
+    _start_listener(handlers)
+
 
 def setup_logging():
     """
     Configure application-wide logging.
-    Creates logs directory and sets up both file and console handlers.
+
+    Records are put on a bounded queue by the logging call and written to the
+    rotating file and the console by a background thread, so request handlers
+    never block on disk or terminal I/O. The root level is the lowest of the
+    handler levels, so disabled levels are rejected before any formatting.
     """
+    global _queue_handler
+
     # Ensure logs directory exists
     log_dir = Path("logs")
     log_dir.mkdir(exist_ok=True)
-    
-    # Configure root logger
-    log_level = getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO)
-    
-    # Create formatters
-    detailed_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    
-    simple_formatter = logging.Formatter(
-        '%(asctime)s - %(levelname)s - %(message)s',
-        datefmt='%H:%M:%S'
-    )
-    
-    # File handler (detailed logs)
-    file_handler = logging.FileHandler(log_dir / "app.log", encoding='utf-8')
-    file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(detailed_formatter)
-    
-    # Console handler (simpler logs)
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(log_level)
-    console_handler.setFormatter(simple_formatter)
-    
-    # Configure root logger
+
     root_logger = logging.getLogger()
-    root_logger.setLevel(logging.DEBUG)
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(console_handler)
-    
+    if _queue_handler is not None:
+        return logging.getLogger(__name__)
+
+    handlers = _build_handlers(log_dir)
+
+    # The request ID lives in the caller's context, so it is read before the record is queued
+    _queue_handler = _NonBlockingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+    _queue_handler.addFilter(RequestIdFilter())
+    if settings.LOG_DEBUG_SAMPLE_RATE < 1:
+        _queue_handler.addFilter(DebugSamplingFilter(settings.LOG_DEBUG_SAMPLE_RATE))
+
+    # Configure root logger
+    root_logger.setLevel(min(handler.level for handler in handlers))
+    root_logger.addHandler(_queue_handler)
+    _start_listener(handlers)
+    atexit.register(_stop_listener)
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_restart_listener_in_child)
+
     # Reduce noise from third-party libraries
     logging.getLogger("urllib3").setLevel(logging.WARNING)
     logging.getLogger("chromadb").setLevel(logging.WARNING)
     logging.getLogger("sentence_transformers").setLevel(logging.WARNING)
-    
+
     # Log initialization
     logger = logging.getLogger(__name__)
-    logger.info(f"Logging initialized. Log level: {settings.LOG_LEVEL}")
-    logger.info(f"Logs directory: {log_dir.absolute()}")
-    
+    logger.info("Logging initialized. Console level: %s, file level: %s, format: %s",
+                settings.LOG_LEVEL, settings.LOG_FILE_LEVEL, settings.LOG_FORMAT)
+    logger.info("Logs directory: %s", log_dir.absolute())
+
     return logger
 
+
+def logging_stats() -> dict:
+    """
+    Statistics of the asynchronous log writer.
+
+    Returns:
+        Dict with queued and dropped record counts
+    """
+    if _queue_handler is None:
+        return {"queued": 0, "dropped": 0}
+    return {"queued": _queue_handler.queue.qsize(), "dropped": _queue_handler.dropped}
+
+
 def get_logger(name: str) -> logging.Logger:
     """
     Get a logger instance for a specific module.
-    
+
     Args:
         name: Name of the module (typically __name__)
-    
+
     Returns:
         Logger instance
     """
     return logging.getLogger(name)
-
@@ -0,0 +1,452 @@
+"""
+Lightweight in-process metrics with Prometheus text exposition.
+
+Recording is a dict lookup, a bisect and a few integer additions, so stage
+timers can stay on the hot path. Values that already live elsewhere (cache
+statistics, collection size, ...) are read through callbacks at scrape time.
+
+With several worker processes (settings.METRICS_MULTIPROC_DIR set, as in
+--prod mode) every worker periodically writes a snapshot of its samples to
+that directory and a scrape merges the snapshots of all workers: counters and
+histograms are summed (keeping the last values of exited workers, so totals
+never go backwards), gauges are reported per live worker with a 'worker' label.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from src.core.config import settings
+from src.core.logging_config import get_logger
+from src.core.request_context import record_stage
+
+logger = get_logger(__name__)
+
+# Latency buckets in seconds, from fast in-memory stages to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Samples = Iterable[Tuple[Dict[str, str], float]]
+
+# (sample name, labels, value) of one exposition line
+Sample = Tuple[str, Dict[str, str], float]
+
+# Metric types whose samples add up across worker processes
+SUMMED_TYPES = ("counter", "histogram")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _render_family(name: str, documentation: str, type_name: str, samples: Iterable[Sample]) -> List[str]:
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {type_name}"]
+    for sample_name, labels, value in samples:
+        lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+    return lines
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = Lock()
+
+    def labels(self, **labels):
+        """Return the child metric for the given label values."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        return self.labels() if not self.labelnames else None
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self) -> List[Sample]:
+        samples = []
+        for key, child in sorted(self._children.items()):
+            labels = dict(zip(self.labelnames, key))
+            samples.extend(child.samples(self.name, labels))
+        return samples
+
+    def render(self) -> List[str]:
+        return _render_family(self.name, self.documentation, self.type_name, self.samples())
+
+    def reset(self):
+        """Zero every child in place (callers may hold references to them)."""
+        for child in list(self._children.values()):
+            child.reset()
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def reset(self):
+        self.value = 0.0
+
+    def samples(self, name, labels):
+        return [(f"{name}_total", labels, self.value)]
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+
+class _GaugeChild:
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def reset(self):
+        self.value = 0.0
+
+    def samples(self, name, labels):
+        return [(name, labels, self.value)]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default().set(value)
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.sum = 0.0
+
+    def samples(self, name, labels):
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            bucket_labels = dict(labels, le=_format_value(bound) if bound != float("inf") else "+Inf")
+            samples.append((f"{name}_bucket", bucket_labels, cumulative))
+        samples.append((f"{name}_sum", labels, self.sum))
+        samples.append((f"{name}_count", labels, cumulative))
+        return samples
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets."""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+
+class CallbackMetric:
+    """
+    Metric whose samples are produced by a callback at scrape time.
+    The callback returns (labels, value) pairs.
+    """
+
+    def __init__(self, name: str, documentation: str, type_name: str, callback: Callable[[], Samples]):
+        self.name = name
+        self.documentation = documentation
+        self.type_name = type_name
+        self.callback = callback
+
+    def samples(self) -> List[Sample]:
+        sample_name = f"{self.name}_total" if self.type_name == "counter" else self.name
+        try:
+            samples = list(self.callback())
+        except Exception:
+            samples = []
+        return [(sample_name, labels, value) for labels, value in samples if value is not None]
+
+    def render(self) -> List[str]:
+        return _render_family(self.name, self.documentation, self.type_name, self.samples())
+
+    def reset(self):
+        pass
+
+
+class MetricsRegistry:
+    """
+    Collection of metrics rendered together in Prometheus text format.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, type_name: str, callback: Callable[[], Samples]) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, type_name, callback))
+
+    def render(self) -> str:
+        """
+        Render all metrics in Prometheus text exposition format (version 0.0.4).
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def collect(self) -> List[Dict[str, Any]]:
+        """
+        Current samples of all metrics.
+
+        Returns:
+            List of dicts with 'name', 'documentation', 'type' and 'samples'
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return [
+            {"name": metric.name, "documentation": metric.documentation,
+             "type": metric.type_name, "samples": metric.samples()}
+            for metric in metrics
+        ]
+
+    def reset(self):
+        """Zero all recorded values (a forked worker must not report its parent's)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class WorkerSnapshots:
+    """
+    Metric snapshots of all worker processes, merged at scrape time.
+    Each worker writes its own file (<pid>.json) in the snapshot directory.
+    """
+
+    def __init__(self, registry: MetricsRegistry, directory: str, interval_seconds: float = None):
+        """
+        Args:
+            registry: Registry of this process
+            directory: Directory shared by the workers
+            interval_seconds: Time between snapshots (defaults to settings.METRICS_SNAPSHOT_INTERVAL_SECONDS)
+        """
+        self.registry = registry
+        self.directory = Path(directory)
+        self.interval_seconds = interval_seconds or settings.METRICS_SNAPSHOT_INTERVAL_SECONDS
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def clear(self):
+        """Remove the snapshots of a previous run (called once, before the workers start)."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for path in self.directory.glob("*.json"):
+            path.unlink(missing_ok=True)
+
+    def start(self):
+        """Write snapshots of this worker in a background thread until stop()."""
+        if self._thread is not None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-snapshots", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the snapshot thread and write a final snapshot."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.write()
+
+    def write(self):
+        """Atomically replace this worker's snapshot file."""
+        payload = json.dumps(self.registry.collect())
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as tmp:
+                tmp.write(payload)
+            os.replace(tmp_path, self.directory / f"{os.getpid()}.json")
+        except OSError as e:
+            logger.warning("Could not write metrics snapshot to %s: %s", self.directory, e)
+
+    def render(self) -> str:
+        """
+        Render the merged metrics of all workers in Prometheus text format.
+        This worker's snapshot is refreshed first, so its own values are current.
+        """
+        self.write()
+        families: Dict[str, Dict[str, Any]] = {}
+        for path in sorted(self.directory.glob("*.json")):
+            try:
+                pid = int(path.stem)
+                snapshot = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            alive = pid == os.getpid() or _process_alive(pid)
+            for family in snapshot:
+                merged = families.setdefault(family["name"], {**family, "values": {}})
+                summed = family["type"] in SUMMED_TYPES
+                if not summed and not alive:
+                    continue
+                for sample_name, labels, value in family["samples"]:
+                    if not summed:
+                        labels = dict(labels, worker=str(pid))
+                    key = (sample_name, tuple(labels.items()))
+                    merged["values"][key] = merged["values"].get(key, 0) + value if summed else value
+        lines = []
+        for family in families.values():
+            samples = [(sample_name, dict(labels), value) for (sample_name, labels), value in family["values"].items()]
+            lines.extend(_render_family(family["name"], family["documentation"], family["type"], samples))
+        return "\n".join(lines) + "\n"
+
+    def _run(self):
+        while not self._stopped.wait(self.interval_seconds):
+            self.write()
+
+
+registry = MetricsRegistry()
+
+# Snapshot exchange between worker processes (None with a single process)
+worker_snapshots: Optional[WorkerSnapshots] = (
+    WorkerSnapshots(registry, settings.METRICS_MULTIPROC_DIR) if settings.METRICS_MULTIPROC_DIR else None
+)
+if worker_snapshots is not None and hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=registry.reset)
+
+# Pipeline stage latencies
+QUERY_STAGE_SECONDS = registry.histogram(
+    "legalai_query_stage_seconds",
+    "Duration of query pipeline stages in seconds.",
+    ["stage"],
+)
+INGEST_STAGE_SECONDS = registry.histogram(
+    "legalai_ingest_stage_seconds",
+    "Duration of ingestion pipeline stages in seconds.",
+    ["stage"],
+)
+
+# Errors by component
+ERRORS = registry.counter(
+    "legalai_errors",
+    "Errors by pipeline component.",
+    ["component"],
+)
+
+# Query degradations applied to stay within a time budget
+QUERY_DEGRADATIONS = registry.counter(
+    "legalai_query_degradations",
+    "Query pipeline degradations applied to meet the request time budget.",
+    ["step"],
+)
+
+
+def observe_stage(histogram: Histogram, stage: str, seconds: float):
+    """
+    Record a stage duration in the histogram and on the current request's timings.
+
+    Args:
+        histogram: Stage histogram with a 'stage' label
+        stage: Stage name
+        seconds: Stage duration
+    """
+    histogram.labels(stage=stage).observe(seconds)
+    record_stage(stage, seconds)
+
+
+@contextmanager
+def timed(histogram: Histogram, stage: str):
+    """
+    Time a pipeline stage and record it in the histogram and request timings.
+
+    Args:
+        histogram: Stage histogram with a 'stage' label
+        stage: Stage name
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(histogram, stage, time.perf_counter() - started)
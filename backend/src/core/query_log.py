@@ -0,0 +1,194 @@
+"""
+Opt-in capture of served queries for replay (settings.QUERY_LOG_ENABLED).
+
+Each answered /query, /query/stream and first-page /search request becomes
+one JSON line: when it arrived, the (PII-scrubbed) text, its parameters,
+the retrieved chunk IDs and source documents, and how long it took.
+Records are handed to a background writer thread through a bounded queue,
+so a slow disk never delays a response; records that do not fit are
+dropped and counted.
+
+Latency is measured from the moment the request middleware received the
+request: until the response was ready (recorded by the middleware from the
+entry a route leaves in request.state.query_log), or until the last event
+of a stream was sent.
+
+Every process appends to its own file in settings.QUERY_LOG_DIR, named
+queries-<UTC start time>-<pid>.jsonl, and starts a new one every UTC day
+or at settings.QUERY_LOG_MAX_FILE_BYTES. Replay them with
+`python -m loadtest.replay`.
+"""
+import hashlib
+import json
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from src.core.config import settings
+from src.core.logging_config import get_logger
+from src.core.request_context import get_timings
+from src.utils.pii import scrub_pii
+
+logger = get_logger(__name__)
+
+# Records written per flush of the file
+WRITE_BATCH_SIZE = 256
+
+_STOP = object()
+
+
+class QueryLogWriter:
+    """
+    Appends query records to this process's log file from a background thread.
+    """
+
+    def __init__(self):
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._file = None
+        self._file_day = None
+        self._file_bytes = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def record(self, endpoint: str, query: str, started_at: float, latency_ms: float, status: int,
+               chunk_ids: List[str] = None, sources: List[str] = None, session_id: str = None,
+               params: Dict[str, Any] = None, first_token_ms: float = None):
+        """
+        Queue one served query (no-op unless settings.QUERY_LOG_ENABLED).
+
+        Args:
+            endpoint: 'query', 'query_stream' or 'search'
+            query: Query text as received (scrubbed before it is queued)
+            started_at: Wall-clock arrival time (epoch seconds)
+            latency_ms: Time to the complete response
+            status: HTTP status of the response
+            chunk_ids: Retrieved chunk IDs in rank order
+            sources: Source documents of the retrieved chunks
+            session_id: Chat session ID (stored hashed)
+            params: Request parameters needed to replay it (e.g. search limit)
+            first_token_ms: Time to the first answer token of a stream
+        """
+        if not settings.QUERY_LOG_ENABLED:
+            return
+        if settings.QUERY_LOG_SAMPLE_RATE < 1.0 and random.random() >= settings.QUERY_LOG_SAMPLE_RATE:
+            return
+        entry = {
+            "ts": round(started_at, 3),
+            "endpoint": endpoint,
+            "query": scrub_pii(query) if settings.QUERY_LOG_SCRUB_PII else query,
+            "status": status,
+            "latency_ms": round(latency_ms, 1),
+            "chunk_ids": list(chunk_ids or []),
+            "sources": sorted(sources or []),
+        }
+        if first_token_ms is not None:
+            entry["first_token_ms"] = round(first_token_ms, 1)
+        if session_id:
+            # Replay only needs to tell sessions apart
+            entry["session"] = hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:16]
+        if params:
+            entry["params"] = params
+        try:
+            self._ensure_started().put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Records queued, written, dropped on overflow and lost to write errors."""
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    def close(self, timeout: float = 5.0):
+        """Write what is queued and stop the writer thread."""
+        with self._lock:
+            thread, log_queue = self._thread, self._queue
+            if thread is None or self._pid != os.getpid():
+                return
+            self._thread = None
+        try:
+            log_queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        thread.join(timeout)
+
+    def _ensure_started(self) -> queue.Queue:
+        # Started lazily, and again in forked worker processes
+        if self._thread is not None and self._pid == os.getpid():
+            return self._queue
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = queue.Queue(maxsize=settings.QUERY_LOG_QUEUE_SIZE)
+                self._file = None
+                self._thread = threading.Thread(target=self._run, args=(self._queue,),
+                                                name="query-log-writer", daemon=True)
+                self._thread.start()
+            return self._queue
+
+    def _run(self, log_queue: queue.Queue):
+        while True:
+            batch = [log_queue.get()]
+            while len(batch) < WRITE_BATCH_SIZE:
+                try:
+                    batch.append(log_queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(entry is _STOP for entry in batch)
+            entries = [entry for entry in batch if entry is not _STOP]
+            try:
+                if entries:
+                    self._write(entries)
+            except Exception as e:
+                self.failed += len(entries)
+                self._file = None
+                logger.warning("Query log write failed: %s", e)
+            if stop:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                return
+
+    def _write(self, entries: List[Dict[str, Any]]):
+        lines = "".join(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n" for entry in entries)
+        data = lines.encode("utf-8")
+        self._open_file(len(data)).write(data)
+        self._file.flush()
+        self._file_bytes += len(data)
+        self.written += len(entries)
+
+    def _open_file(self, incoming_bytes: int):
+        """Current file, rotated by UTC day and size."""
+        now = datetime.now(timezone.utc)
+        if (self._file is None or self._file_day != now.date()
+                or self._file_bytes + incoming_bytes > settings.QUERY_LOG_MAX_FILE_BYTES):
+            if self._file is not None:
+                self._file.close()
+            directory = Path(settings.QUERY_LOG_DIR)
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f"queries-{now.strftime('%Y%m%dT%H%M%S%f')}-{os.getpid()}.jsonl"
+            self._file = open(path, "ab")
+            self._file_day = now.date()
+            self._file_bytes = 0
+            logger.info("Query log file: %s", path)
+        return self._file
+
+
+def request_elapsed_ms() -> float:
+    """Milliseconds since the request middleware received the current request."""
+    timings = get_timings()
+    return (time.monotonic() - timings.started) * 1000 if timings is not None else 0.0
+
+
+query_log = QueryLogWriter()
@@ -0,0 +1,150 @@
+"""
+Per-request context: request ID, stage timings, scheduling priority and time budget.
+
+Values live in context variables, so they follow the request through
+awaits, threadpool calls and tasks spawned while handling it.
+"""
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_timings: ContextVar[Optional["RequestTimings"]] = ContextVar("request_timings", default=None)
+
+# Scheduling priorities of the admission control queues (lower is served first)
+INTERACTIVE = 0
+BULK = 1
+_priority: ContextVar[int] = ContextVar("priority", default=INTERACTIVE)
+_budget: ContextVar[Optional["RequestBudget"]] = ContextVar("request_budget", default=None)
+
+
+class RequestTimings:
+    """
+    Stage durations recorded while serving one request.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.stages: List[Tuple[str, float]] = []
+        # Request whose pipeline run this one shared (request coalescing)
+        self.coalesced_with: Optional[str] = None
+
+    def record(self, stage: str, seconds: float):
+        self.stages.append((stage, seconds))
+
+    def share(self, leader: "RequestTimings", leader_request_id: Optional[str]):
+        """Take over the stage timings of the request whose pipeline run this one shared."""
+        self.stages.extend(leader.stages)
+        self.coalesced_with = leader_request_id or "unknown"
+
+    def totals(self) -> Dict[str, float]:
+        """Total seconds per stage, in order of first occurrence."""
+        totals: Dict[str, float] = {}
+        for stage, seconds in self.stages:
+            totals[stage] = totals.get(stage, 0.0) + seconds
+        return totals
+
+    def server_timing(self, total_seconds: float = None) -> str:
+        """
+        Format the timings as a Server-Timing header value (durations in ms).
+        """
+        entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.totals().items()]
+        if self.coalesced_with is not None:
+            entries.append('coalesced;desc="%s"' % self.coalesced_with.replace('"', "").replace("\\", ""))
+        if total_seconds is not None:
+            entries.append(f"total;dur={total_seconds * 1000:.1f}")
+        return ", ".join(entries)
+
+
+class RequestBudget:
+    """
+    Time budget of one request and the degradations applied to stay within it.
+    """
+
+    def __init__(self, seconds: float, started: float = None):
+        """
+        Args:
+            seconds: Time allowed for the request
+            started: Monotonic start time of the request (defaults to now)
+        """
+        self.seconds = seconds
+        self.deadline = (started if started is not None else time.monotonic()) + seconds
+        self.degradations: List[str] = []
+
+    def remaining_ms(self) -> float:
+        """Milliseconds left until the deadline (negative once it passed)."""
+        return (self.deadline - time.monotonic()) * 1000
+
+    def degrade(self, step: str) -> bool:
+        """Record a degradation step; returns False if it was already applied."""
+        if step in self.degradations:
+            return False
+        self.degradations.append(step)
+        return True
+
+
+def start_request(request_id: str = None) -> str:
+    """
+    Begin a request context with a fresh timing recorder.
+
+    Args:
+        request_id: Incoming request ID (a new one is generated if missing)
+
+    Returns:
+        str: The request ID in use
+    """
+    request_id = request_id or uuid.uuid4().hex
+    _request_id.set(request_id)
+    _timings.set(RequestTimings())
+    return request_id
+
+
+def get_request_id() -> Optional[str]:
+    """Request ID of the current context, if any."""
+    return _request_id.get()
+
+
+def get_timings() -> Optional[RequestTimings]:
+    """Timing recorder of the current request, if any."""
+    return _timings.get()
+
+
+def record_stage(stage: str, seconds: float):
+    """Record a stage duration on the current request (no-op outside a request)."""
+    timings = _timings.get()
+    if timings is not None:
+        timings.record(stage, seconds)
+
+
+def set_priority(priority: int):
+    """Set the scheduling priority of the current request (INTERACTIVE or BULK)."""
+    _priority.set(priority)
+
+
+def get_priority() -> int:
+    """Scheduling priority of the current context (INTERACTIVE outside a request)."""
+    return _priority.get()
+
+
+def start_budget(budget_ms: float = None) -> Optional[RequestBudget]:
+    """
+    Give the current request a time budget, counted from the start of the request.
+
+    Args:
+        budget_ms: Budget in milliseconds (None or 0 means no budget)
+
+    Returns:
+        RequestBudget, or None without a budget
+    """
+    if not budget_ms or budget_ms <= 0:
+        return None
+    timings = _timings.get()
+    budget = RequestBudget(budget_ms / 1000, started=timings.started if timings is not None else None)
+    _budget.set(budget)
+    return budget
+
+
+def get_budget() -> Optional[RequestBudget]:
+    """Time budget of the current request, if any."""
+    return _budget.get()
@@ -1,22 +1,37 @@
+import hashlib
+import json
 import os
+import re
+import time
+import uuid
 from pathlib import Path
 import shutil
+import tempfile
+from typing import Any, Dict
 from src.core.config import settings
 from src.core.logging_config import get_logger
-from src.core.exceptions import FileStorageError
+from src.core.exceptions import FileStorageError, UploadNotFoundError, UploadPartError, UploadIncompleteError
 
 logger = get_logger(__name__)
 
+UPLOAD_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+MANIFEST_FILE = "manifest.json"
+DATA_FILE = "data"
+PARTS_DIR = "parts"
+HASH_READ_SIZE = 1024 * 1024
+
 class DocumentRepository:
     """
     Abstracts file storage operations.
     """
     
-    def __init__(self, storage_dir=None):
+    def __init__(self, storage_dir=None, upload_session_dir=None):
         self.storage_dir = Path(storage_dir or settings.UPLOAD_DIR)
-        # Create directory if it doesn't exist
+        self.upload_session_dir = Path(upload_session_dir or settings.UPLOAD_SESSION_DIR)
+        # Create directories if they don't exist
         self.storage_dir.mkdir(parents=True, exist_ok=True)
-        logger.debug(f"Document repository initialized. Storage dir: {self.storage_dir}")
+        self.upload_session_dir.mkdir(parents=True, exist_ok=True)
+        logger.debug("Document repository initialized. Storage dir: %s", self.storage_dir)
 
     async def save_file(self, file) -> str:
         """
@@ -30,17 +45,17 @@ class DocumentRepository:
         """
         try:
             file_path = self.storage_dir / file.filename
-            logger.debug(f"Saving file: {file.filename}")
+            logger.debug("Saving file: %s", file.filename)
             
             # Save file
             with open(file_path, "wb") as buffer:
                 shutil.copyfileobj(file.file, buffer)
             
-            logger.info(f"File saved successfully: {file_path}")
+            logger.info("File saved successfully: %s", file_path)
             return str(file_path)
         
         except Exception as e:
-            logger.error(f"Failed to save file {file.filename}: {e}")
+            logger.error("Failed to save file %s: %s", file.filename, e)
             raise FileStorageError(f"Failed to save file: {e}")
 
     def get_file_path(self, filename: str) -> str:
@@ -54,3 +69,211 @@ class DocumentRepository:
             str: Absolute path to the file
         """
         return str(self.storage_dir / filename)
+
+    # Resumable uploads
+    #
+    # Each upload lives in its own directory: the manifest, a data file
+    # pre-sized to the final file size, and one marker per verified part.
+    # Parts are written straight to their offset in the data file, so
+    # completing an upload is a rename, and the markers (not a shared
+    # manifest) record progress, so parts can arrive at any worker process.
+
+    def create_upload(self, filename: str, size: int, part_size: int, sha256: str = None) -> Dict[str, Any]:
+        """
+        Start a resumable upload.
+        
+        Args:
+            filename: Name of the file being uploaded
+            size: File size in bytes
+            part_size: Size of every part except the last
+            sha256: Optional hex SHA-256 of the whole file, checked on completion
+            
+        Returns:
+            dict: Upload status (see get_upload)
+        """
+        self.cleanup_uploads()
+        upload_id = uuid.uuid4().hex
+        upload_dir = self.upload_session_dir / upload_id
+        try:
+            (upload_dir / PARTS_DIR).mkdir(parents=True)
+            with open(upload_dir / DATA_FILE, "wb") as data:
+                data.truncate(size)
+            manifest = {
+                "upload_id": upload_id,
+                "filename": Path(filename).name,
+                "size": size,
+                "part_size": part_size,
+                "part_count": max(1, -(-size // part_size)),
+                "sha256": sha256.lower() if sha256 else None,
+                "created_at": time.time(),
+            }
+            _write_json(upload_dir / MANIFEST_FILE, manifest)
+        except OSError as e:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+            logger.error("Failed to create upload for %s: %s", filename, e)
+            raise FileStorageError(f"Failed to create upload: {e}")
+        
+        logger.info("Upload %s created for %s (%s bytes, %s part(s))",
+                    upload_id, manifest["filename"], size, manifest["part_count"])
+        return self.get_upload(upload_id)
+
+    def write_part(self, upload_id: str, part_number: int, data: bytes, sha256: str) -> Dict[str, Any]:
+        """
+        Verify a part and write it at its position in the upload's data file.
+        Re-sending a part overwrites it, so a client can retry any part.
+        
+        Args:
+            upload_id: Upload ID
+            part_number: 1-based part number
+            data: Part content
+            sha256: Hex SHA-256 of the part as computed by the client
+            
+        Returns:
+            dict: Part number, size and checksum
+        """
+        manifest = self._load_manifest(upload_id)
+        if not 1 <= part_number <= manifest["part_count"]:
+            raise UploadPartError(f"Part number must be between 1 and {manifest['part_count']}")
+        offset = (part_number - 1) * manifest["part_size"]
+        expected_size = min(manifest["part_size"], manifest["size"] - offset)
+        if len(data) != expected_size:
+            raise UploadPartError(f"Part {part_number} must be {expected_size} bytes, got {len(data)}")
+        digest = hashlib.sha256(data).hexdigest()
+        if digest != (sha256 or "").lower():
+            raise UploadPartError(f"Checksum mismatch for part {part_number}")
+        
+        upload_dir = self.upload_session_dir / upload_id
+        try:
+            with open(upload_dir / DATA_FILE, "r+b") as target:
+                target.seek(offset)
+                target.write(data)
+                target.flush()
+                os.fsync(target.fileno())
+            # The marker is written only once the part is on disk
+            _write_json(upload_dir / PARTS_DIR / f"{part_number}.json", {"size": len(data), "sha256": digest})
+            os.utime(upload_dir)
+        except OSError as e:
+            logger.error("Failed to write part %s of upload %s: %s", part_number, upload_id, e)
+            raise FileStorageError(f"Failed to write upload part: {e}")
+        
+        logger.debug("Upload %s: part %s written (%s bytes)", upload_id, part_number, len(data))
+        return {"part_number": part_number, "size": len(data), "sha256": digest}
+
+    def get_upload(self, upload_id: str) -> Dict[str, Any]:
+        """
+        Status of a resumable upload, listing the parts still missing so a
+        client can resume after a dropped connection.
+        
+        Args:
+            upload_id: Upload ID
+            
+        Returns:
+            dict: Manifest plus 'received_parts', 'missing_parts' and 'bytes_received'
+        """
+        manifest = self._load_manifest(upload_id)
+        received = self._received_parts(upload_id)
+        bytes_received = sum(
+            min(manifest["part_size"], manifest["size"] - (number - 1) * manifest["part_size"])
+            for number in received
+        )
+        return {
+            **manifest,
+            "received_parts": sorted(received),
+            "missing_parts": [n for n in range(1, manifest["part_count"] + 1) if n not in received],
+            "bytes_received": bytes_received,
+        }
+
+    def complete_upload(self, upload_id: str) -> Dict[str, str]:
+        """
+        Check that every part arrived (and the file checksum, if given), then
+        move the file into the upload directory.
+        
+        Args:
+            upload_id: Upload ID
+            
+        Returns:
+            dict: 'filename' and 'path' of the stored file
+        """
+        manifest = self._load_manifest(upload_id)
+        received = self._received_parts(upload_id)
+        missing = manifest["part_count"] - len(received)
+        if missing:
+            raise UploadIncompleteError(f"Upload {upload_id} is missing {missing} part(s)")
+        
+        upload_dir = self.upload_session_dir / upload_id
+        data_path = upload_dir / DATA_FILE
+        if manifest["sha256"]:
+            digest = hashlib.sha256()
+            with open(data_path, "rb") as data:
+                for block in iter(lambda: data.read(HASH_READ_SIZE), b""):
+                    digest.update(block)
+            if digest.hexdigest() != manifest["sha256"]:
+                raise UploadIncompleteError(f"Checksum mismatch for the completed file of upload {upload_id}")
+        
+        file_path = self.storage_dir / manifest["filename"]
+        try:
+            os.replace(data_path, file_path)
+        except FileNotFoundError:
+            raise UploadNotFoundError(f"Upload {upload_id} was already completed")
+        except OSError as e:
+            logger.error("Failed to complete upload %s: %s", upload_id, e)
+            raise FileStorageError(f"Failed to complete upload: {e}")
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        logger.info("Upload %s completed: %s", upload_id, file_path)
+        return {"filename": manifest["filename"], "path": str(file_path)}
+
+    def abort_upload(self, upload_id: str):
+        """
+        Discard a resumable upload and its parts.
+        
+        Args:
+            upload_id: Upload ID
+        """
+        self._load_manifest(upload_id)
+        shutil.rmtree(self.upload_session_dir / upload_id, ignore_errors=True)
+        logger.info("Upload %s aborted", upload_id)
+
+    def cleanup_uploads(self) -> int:
+        """
+        Remove uploads with no activity for settings.UPLOAD_SESSION_TTL_SECONDS.
+        
+        Returns:
+            int: Number of uploads removed
+        """
+        cutoff = time.time() - settings.UPLOAD_SESSION_TTL_SECONDS
+        removed = 0
+        for upload_dir in self.upload_session_dir.iterdir():
+            try:
+                if upload_dir.is_dir() and upload_dir.stat().st_mtime < cutoff:
+                    shutil.rmtree(upload_dir)
+                    removed += 1
+            except OSError:
+                continue
+        if removed:
+            logger.info("Removed %s expired upload(s)", removed)
+        return removed
+
+    def _load_manifest(self, upload_id: str) -> Dict[str, Any]:
+        if not UPLOAD_ID_PATTERN.match(upload_id):
+            raise UploadNotFoundError(f"Unknown upload: {upload_id}")
+        try:
+            with open(self.upload_session_dir / upload_id / MANIFEST_FILE, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, NotADirectoryError):
+            raise UploadNotFoundError(f"Unknown or expired upload: {upload_id}")
+
+    def _received_parts(self, upload_id: str) -> set:
+        parts_dir = self.upload_session_dir / upload_id / PARTS_DIR
+        return {int(marker.stem) for marker in parts_dir.glob("*.json") if marker.stem.isdigit()}
+
+
+def _write_json(path: Path, payload: Dict[str, Any]):
+    """Write a JSON file atomically (concurrent writers each use their own temporary file)."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
@@ -0,0 +1,489 @@
+"""
+Point-in-time snapshots, restore and compaction of the search index.
+
+A snapshot holds everything a node needs to serve queries without
+re-ingesting: a copy of the Chroma store, the lexical (BM25) corpus and a
+catalog of the ingested documents, optionally with the original files. The
+store is copied under the inter-process write lock, so a snapshot never
+contains half of a write, and every file is listed with its SHA-256 in the
+snapshot's manifest.
+
+Restore and compaction replace the files of the store. Run them while the
+API is stopped: a running worker would keep using the replaced files.
+"""
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from src.core.config import settings
+from src.core.exceptions import IndexSnapshotError
+from src.core.logging_config import get_logger
+from src.repositories.index_sync import (
+    IndexGeneration, LEXICAL_FILE, STORE_FILES, read_lexical_corpus, write_lexical_corpus,
+)
+from src.repositories.vector_store_repo import source_filenames
+
+logger = get_logger(__name__)
+
+SNAPSHOT_FORMAT = 1
+MANIFEST_FILE = "manifest.json"
+CATALOG_FILE = "catalog.json"
+SNAPSHOT_LEXICAL_FILE = "lexical.json.gz"
+SNAPSHOT_STORE_DIR = "chroma"
+SNAPSHOT_DOCUMENTS_DIR = "documents"
+CHROMA_SQLITE_FILE = "chroma.sqlite3"
+
+# Chunks read (and written) per collection page when exporting or compacting
+PAGE_SIZE = 2000
+
+
+class IndexMaintenance:
+    """
+    Snapshot, restore and compaction of one Chroma store and its lexical corpus.
+    """
+
+    def __init__(self, chroma_dir: str = None, collection_name: str = None, upload_dir: str = None):
+        """
+        Args:
+            chroma_dir: Store directory (defaults to settings.CHROMA_DB_DIR)
+            collection_name: Collection name (defaults to settings.VECTOR_STORE_COLLECTION_NAME)
+            upload_dir: Directory of the ingested original files (defaults to settings.UPLOAD_DIR)
+        """
+        self.chroma_dir = Path(chroma_dir or settings.CHROMA_DB_DIR)
+        self.collection_name = collection_name or settings.VECTOR_STORE_COLLECTION_NAME
+        self.upload_dir = Path(upload_dir or settings.UPLOAD_DIR)
+        self.index_generation = IndexGeneration(str(self.chroma_dir))
+
+    def snapshot(self, destination: str, include_documents: bool = False) -> Dict[str, Any]:
+        """
+        Take a consistent snapshot of the store.
+        Writers are blocked only while the store files are copied; the
+        lexical corpus and catalog are then exported from the copy.
+
+        Args:
+            destination: New directory for the snapshot
+            include_documents: Also copy the original files listed in the catalog
+
+        Returns:
+            dict: The snapshot manifest (without the file list)
+        """
+        destination = Path(destination)
+        if destination.exists() and any(destination.iterdir()):
+            raise IndexSnapshotError(f"Snapshot destination {destination} is not empty")
+        if not self._has_data(self.chroma_dir):
+            raise IndexSnapshotError(f"No index found in {self.chroma_dir}")
+        partial = destination.with_name(destination.name + ".partial")
+        shutil.rmtree(partial, ignore_errors=True)
+        partial.mkdir(parents=True)
+        started = time.monotonic()
+
+        try:
+            with self.index_generation.write_lock():
+                generation = self.index_generation.current()
+                _copy_store(self.chroma_dir, partial / SNAPSHOT_STORE_DIR)
+            lock_seconds = time.monotonic() - started
+            logger.info("Store copied in %.2fs (generation %s)", lock_seconds, generation)
+
+            client = _open_client(partial / SNAPSHOT_STORE_DIR)
+            try:
+                collection = self._get_collection(client)
+                collection_metadata = dict(collection.metadata or {})
+                ids, documents, metadatas = _read_corpus(collection)
+            finally:
+                _close_client(client)
+            write_lexical_corpus(partial / SNAPSHOT_LEXICAL_FILE, generation, ids, documents, metadatas)
+
+            catalog = self._catalog(metadatas)
+            _write_json(partial / CATALOG_FILE, catalog)
+            if include_documents:
+                (partial / SNAPSHOT_DOCUMENTS_DIR).mkdir()
+                for entry in catalog["documents"]:
+                    if entry["stored"]:
+                        shutil.copy2(self.upload_dir / entry["filename"], partial / SNAPSHOT_DOCUMENTS_DIR / entry["filename"])
+
+            manifest = {
+                "format": SNAPSHOT_FORMAT,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "generation": generation,
+                "collection": self.collection_name,
+                "collection_metadata": collection_metadata,
+                "chunks": len(ids),
+                "documents": len(catalog["documents"]),
+                "includes_documents": include_documents,
+                "lock_held_seconds": round(lock_seconds, 3),
+                "files": _checksums(partial),
+            }
+            _write_json(partial / MANIFEST_FILE, manifest)
+            if destination.exists():
+                destination.rmdir()
+            os.replace(partial, destination)
+        except IndexSnapshotError:
+            shutil.rmtree(partial, ignore_errors=True)
+            raise
+        except Exception as e:
+            shutil.rmtree(partial, ignore_errors=True)
+            logger.error("Snapshot failed: %s", e)
+            raise IndexSnapshotError(f"Snapshot failed: {e}")
+
+        logger.info("Snapshot of %s chunk(s) written to %s", manifest["chunks"], destination)
+        return dict(_summary(manifest), path=str(destination), seconds=round(time.monotonic() - started, 3))
+
+    def restore(self, source: str, force: bool = False, verify: bool = True, keep_backup: bool = False) -> Dict[str, Any]:
+        """
+        Replace the store with a snapshot. The lexical corpus is installed
+        next to it, so the first start reads it instead of rebuilding from
+        the collection.
+
+        Args:
+            source: Snapshot directory
+            force: Replace a store that already holds data
+            verify: Check every file against the manifest checksums first
+            keep_backup: Keep the replaced store files in a backup directory
+
+        Returns:
+            dict: Summary of the restored snapshot and the new store generation
+        """
+        source = Path(source)
+        started = time.monotonic()
+        manifest = self.read_manifest(source)
+        if manifest["collection"] != self.collection_name:
+            raise IndexSnapshotError(
+                f"Snapshot holds collection '{manifest['collection']}', this store uses '{self.collection_name}'"
+            )
+        if verify:
+            self.verify(source, manifest)
+        if not force and self._has_data(self.chroma_dir):
+            raise IndexSnapshotError(f"{self.chroma_dir} already holds an index (use force to replace it)")
+
+        corpus = read_lexical_corpus(source / SNAPSHOT_LEXICAL_FILE)
+        if corpus is None:
+            raise IndexSnapshotError(f"Snapshot {source} has no readable lexical corpus")
+        # Stage the copy on the store's filesystem, so the swap itself is a few renames
+        staging = self._staging_dir("restore")
+        try:
+            shutil.copytree(source / SNAPSHOT_STORE_DIR, staging)
+            with self.index_generation.write_lock():
+                backup = self._swap_in(staging)
+                generation = self.index_generation.bump(minimum=manifest["generation"] + 1)
+                write_lexical_corpus(self.chroma_dir / LEXICAL_FILE, generation, *corpus)
+        except IndexSnapshotError:
+            raise
+        except Exception as e:
+            logger.error("Restore failed: %s", e)
+            raise IndexSnapshotError(f"Restore failed: {e}")
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        documents_restored = 0
+        if manifest["includes_documents"]:
+            self.upload_dir.mkdir(parents=True, exist_ok=True)
+            for path in (source / SNAPSHOT_DOCUMENTS_DIR).iterdir():
+                shutil.copy2(path, self.upload_dir / path.name)
+                documents_restored += 1
+        if backup is not None and not keep_backup:
+            shutil.rmtree(backup, ignore_errors=True)
+            backup = None
+
+        logger.info("Restored snapshot %s (%s chunk(s)) as generation %s", source, manifest["chunks"], generation)
+        return dict(
+            _summary(manifest),
+            generation=generation,
+            documents_restored=documents_restored,
+            backup=str(backup) if backup else None,
+            seconds=round(time.monotonic() - started, 3),
+        )
+
+    def compact(self, keep_backup: bool = False, sample_queries: int = 50) -> Dict[str, Any]:
+        """
+        Rewrite the store with only its live chunks, dropping the space held
+        by deleted ones in the SQLite file and the HNSW index. Query latency
+        is measured before and after on the same sample of stored embeddings.
+
+        Args:
+            keep_backup: Keep the replaced store files in a backup directory
+            sample_queries: Stored embeddings used as latency probe queries
+
+        Returns:
+            dict: Chunks copied, bytes before/after/reclaimed and probe query latency before/after
+        """
+        if not self._has_data(self.chroma_dir):
+            raise IndexSnapshotError(f"No index found in {self.chroma_dir}")
+        started = time.monotonic()
+        staging = self._staging_dir("compact")
+        k = settings.TOP_K_RESULTS * 2
+        try:
+            with self.index_generation.write_lock():
+                bytes_before = _directory_size(self.chroma_dir)
+                old_client = _open_client(self.chroma_dir)
+                new_client = _open_client(staging)
+                try:
+                    old = self._get_collection(old_client)
+                    probes = old.get(limit=sample_queries, include=["embeddings"])["embeddings"]
+                    probes = list(probes) if probes is not None else []
+                    latency_before = _probe_latency(old, probes, k)
+
+                    new = new_client.create_collection(name=self.collection_name, metadata=old.metadata)
+                    corpus = _copy_collection(old, new, _max_batch_size(new_client))
+                    latency_after = _probe_latency(new, probes, k)
+                finally:
+                    _close_client(old_client)
+                    _close_client(new_client)
+                bytes_after = _directory_size(staging)
+
+                backup = self._swap_in(staging)
+                generation = self.index_generation.bump()
+                write_lexical_corpus(self.chroma_dir / LEXICAL_FILE, generation, *corpus)
+        except IndexSnapshotError:
+            raise
+        except Exception as e:
+            logger.error("Compaction failed: %s", e)
+            raise IndexSnapshotError(f"Compaction failed: {e}")
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        if backup is not None and not keep_backup:
+            shutil.rmtree(backup, ignore_errors=True)
+            backup = None
+
+        report = {
+            "chunks": len(corpus[0]),
+            "generation": generation,
+            "bytes_before": bytes_before,
+            "bytes_after": bytes_after,
+            "bytes_reclaimed": bytes_before - bytes_after,
+            "probe_queries": len(probes),
+            "query_latency_before_ms": latency_before,
+            "query_latency_after_ms": latency_after,
+            "backup": str(backup) if backup else None,
+            "seconds": round(time.monotonic() - started, 3),
+        }
+        logger.info("Compacted %s chunk(s): %s -> %s bytes", report["chunks"], bytes_before, bytes_after)
+        return report
+
+    @staticmethod
+    def read_manifest(source: Path) -> Dict[str, Any]:
+        """
+        Read and check the manifest of a snapshot.
+
+        Args:
+            source: Snapshot directory
+
+        Returns:
+            dict: The manifest
+        """
+        try:
+            manifest = json.loads((Path(source) / MANIFEST_FILE).read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            raise IndexSnapshotError(f"No readable snapshot manifest in {source}: {e}")
+        if manifest.get("format") != SNAPSHOT_FORMAT:
+            raise IndexSnapshotError(f"Unsupported snapshot format {manifest.get('format')}")
+        return manifest
+
+    @staticmethod
+    def verify(source: Path, manifest: Dict[str, Any]):
+        """
+        Check that a snapshot's files match its manifest.
+
+        Args:
+            source: Snapshot directory
+            manifest: The snapshot's manifest
+        """
+        if _checksums(Path(source), exclude=(MANIFEST_FILE,)) != manifest["files"]:
+            raise IndexSnapshotError(f"Snapshot {source} does not match its manifest (incomplete or corrupted)")
+
+    def _get_collection(self, client):
+        try:
+            return client.get_collection(name=self.collection_name)
+        except Exception as e:
+            raise IndexSnapshotError(f"Collection '{self.collection_name}' not found: {e}")
+
+    def _catalog(self, metadatas: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Ingested documents with their chunk counts and, when stored, size and
+        SHA-256. Chunks stored once for several documents count for each.
+        """
+        chunks: Dict[str, int] = {}
+        for metadata in metadatas:
+            for filename in source_filenames(metadata or {}):
+                chunks[filename] = chunks.get(filename, 0) + 1
+        documents = []
+        for filename, count in sorted(chunks.items()):
+            path = self.upload_dir / filename
+            stored = path.is_file() and path.parent == self.upload_dir
+            documents.append({
+                "filename": filename,
+                "chunks": count,
+                "stored": stored,
+                "size": path.stat().st_size if stored else None,
+                "sha256": _sha256(path) if stored else None,
+            })
+        return {"documents": documents, "total_chunks": len(metadatas)}
+
+    def _staging_dir(self, purpose: str) -> Path:
+        staging = self.chroma_dir.parent / f".{self.chroma_dir.name}.{purpose}-{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        return staging
+
+    def _swap_in(self, staging: Path) -> Optional[Path]:
+        """
+        Replace the store's data files with those in `staging`. Must be
+        called while holding the write lock. The lock and generation files
+        stay in place, so processes keep locking the same file.
+
+        Returns:
+            Backup directory holding the replaced files (None if there were none)
+        """
+        backup = None
+        current = [entry for entry in self.chroma_dir.iterdir() if entry.name not in STORE_FILES]
+        if current:
+            stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+            backup = self.chroma_dir.parent / f"{self.chroma_dir.name}.backup-{stamp}"
+            backup.mkdir(parents=True)
+            for entry in current:
+                os.replace(entry, backup / entry.name)
+        (self.chroma_dir / LEXICAL_FILE).unlink(missing_ok=True)
+        for entry in staging.iterdir():
+            os.replace(entry, self.chroma_dir / entry.name)
+        if backup is not None:
+            logger.info("Replaced store files moved to %s", backup)
+        return backup
+
+    @staticmethod
+    def _has_data(directory: Path) -> bool:
+        return directory.is_dir() and any(entry.name not in STORE_FILES for entry in directory.iterdir())
+
+
+def _open_client(path: Path):
+    import chromadb
+    return chromadb.PersistentClient(path=str(path))
+
+
+def _close_client(client):
+    """Drop Chroma's cached system for a client, releasing its files."""
+    clear = getattr(client, "clear_system_cache", None)
+    if clear is not None:
+        clear()
+
+
+def _max_batch_size(client) -> int:
+    get_max_batch_size = getattr(client, "get_max_batch_size", None)
+    try:
+        limit = get_max_batch_size() if get_max_batch_size else None
+    except Exception:
+        limit = None
+    return min(PAGE_SIZE, int(limit)) if limit else PAGE_SIZE
+
+
+def _copy_store(source: Path, destination: Path):
+    """
+    Copy the Chroma files of a store. The SQLite database goes through the
+    online backup API, which yields a consistent copy even while other
+    processes hold it open; segment directories are copied as files.
+    """
+    destination.mkdir(parents=True)
+    for entry in source.iterdir():
+        if entry.name in STORE_FILES or entry.name.startswith(CHROMA_SQLITE_FILE + "-"):
+            continue
+        if entry.name == CHROMA_SQLITE_FILE:
+            with sqlite3.connect(str(entry)) as src, sqlite3.connect(str(destination / entry.name)) as dst:
+                src.backup(dst)
+        elif entry.is_dir():
+            shutil.copytree(entry, destination / entry.name)
+        else:
+            shutil.copy2(entry, destination / entry.name)
+
+
+def _read_corpus(collection) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+    """IDs, texts and metadata of every chunk of a collection."""
+    ids, documents, metadatas = [], [], []
+    offset = 0
+    while True:
+        page = collection.get(include=["documents", "metadatas"], limit=PAGE_SIZE, offset=offset)
+        if not page["ids"]:
+            break
+        ids.extend(page["ids"])
+        documents.extend(page["documents"])
+        metadatas.extend(m or {} for m in (page["metadatas"] or [None] * len(page["ids"])))
+        offset += len(page["ids"])
+    return ids, documents, metadatas
+
+
+def _copy_collection(source, destination, batch_size: int) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+    """
+    Copy every chunk (with its embedding) from one collection to another.
+
+    Returns:
+        The copied corpus as (ids, documents, metadatas)
+    """
+    ids, documents, metadatas = [], [], []
+    offset = 0
+    while True:
+        page = source.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+        if not page["ids"]:
+            break
+        page_metadatas = [m or {} for m in (page["metadatas"] or [None] * len(page["ids"]))]
+        destination.add(
+            ids=page["ids"],
+            embeddings=page["embeddings"],
+            documents=page["documents"],
+            metadatas=page_metadatas,
+        )
+        ids.extend(page["ids"])
+        documents.extend(page["documents"])
+        metadatas.extend(page_metadatas)
+        offset += len(page["ids"])
+    return ids, documents, metadatas
+
+
+def _probe_latency(collection, probes: List[Any], k: int) -> Optional[Dict[str, float]]:
+    """Median and mean latency (ms) of nearest-neighbour queries for the probe embeddings."""
+    if not probes:
+        return None
+    collection.query(query_embeddings=[probes[0]], n_results=k)  # Load the index first
+    samples = []
+    for embedding in probes:
+        started = time.perf_counter()
+        collection.query(query_embeddings=[embedding], n_results=k)
+        samples.append((time.perf_counter() - started) * 1000)
+    return {"p50": round(statistics.median(samples), 3), "mean": round(statistics.fmean(samples), 3)}
+
+
+def _summary(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in manifest.items() if key != "files"}
+
+
+def _directory_size(directory: Path) -> int:
+    return sum(
+        path.stat().st_size
+        for path in directory.rglob("*")
+        if path.is_file() and path.name not in STORE_FILES
+    )
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _checksums(directory: Path, exclude: Tuple[str, ...] = ()) -> Dict[str, Dict[str, Any]]:
+    """Size and SHA-256 of every file below a directory, by relative path."""
+    return {
+        path.relative_to(directory).as_posix(): {"size": path.stat().st_size, "sha256": _sha256(path)}
+        for path in sorted(directory.rglob("*"))
+        if path.is_file() and path.relative_to(directory).as_posix() not in exclude
+    }
+
+
+def _write_json(path: Path, payload: Dict[str, Any]):
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    tmp_path.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, path)
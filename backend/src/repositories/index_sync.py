@@ -0,0 +1,140 @@
+"""
+Cross-process synchronization of the in-memory lexical (BM25) index.
+
+Every worker process keeps its own BM25 index next to the shared Chroma
+store. Writers bump a generation counter stored beside the store while
+holding an inter-process file lock; readers compare the counter with the
+generation their index was built from and reload when it moved.
+
+Snapshot restore and compaction also leave the lexical corpus in a file
+tagged with the generation it belongs to, so the first load after them
+reads that file instead of paging through the whole collection.
+"""
+import gzip
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from threading import RLock
+from typing import Any, Dict, List, Optional, Tuple
+from src.core.logging_config import get_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process serving only
+    fcntl = None
+
+logger = get_logger(__name__)
+
+GENERATION_FILE = ".index_generation"
+LOCK_FILE = ".index_lock"
+LEXICAL_FILE = ".lexical_index.json.gz"
+
+# Store bookkeeping files that are not part of the Chroma data
+STORE_FILES = (GENERATION_FILE, LOCK_FILE, LEXICAL_FILE)
+
+
+class IndexGeneration:
+    """
+    Monotonic write generation shared by all processes using one store directory.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory: Store directory holding the generation and lock files
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / GENERATION_FILE
+        self.lock_path = self.directory / LOCK_FILE
+        self._thread_lock = RLock()
+
+    def current(self) -> int:
+        """
+        Read the current generation (0 if nothing was written yet).
+        """
+        try:
+            return int(self.path.read_text(encoding="utf-8").strip() or 0)
+        except FileNotFoundError:
+            return 0
+        except ValueError:
+            logger.warning("Corrupt index generation file %s; treating as 0", self.path)
+            return 0
+
+    @contextmanager
+    def write_lock(self):
+        """
+        Exclusive lock serializing store writes across threads and processes.
+        """
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, "a+") as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def bump(self, minimum: int = 0) -> int:
+        """
+        Increment the generation. Must be called while holding write_lock().
+
+        Args:
+            minimum: Lowest acceptable new generation (e.g. past a restored snapshot's)
+
+        Returns:
+            int: The new generation
+        """
+        generation = max(self.current() + 1, minimum)
+        tmp_path = self.path.with_suffix(f".tmp{os.getpid()}")
+        tmp_path.write_text(str(generation), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+        return generation
+
+
+def write_lexical_corpus(path: Path, generation: int, ids: List[str], documents: List[str],
+                         metadatas: List[Dict[str, Any]]):
+    """
+    Atomically write a lexical corpus file.
+
+    Args:
+        path: Destination file
+        generation: Store generation the corpus belongs to
+        ids: Chunk IDs
+        documents: Chunk texts
+        metadatas: Chunk metadata
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.tmp{os.getpid()}")
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump({"generation": generation, "ids": ids, "documents": documents, "metadatas": metadatas},
+                  f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def read_lexical_corpus(path: Path, generation: int = None) -> Optional[Tuple[List[str], List[str], List[Dict[str, Any]]]]:
+    """
+    Read a lexical corpus file.
+
+    Args:
+        path: Corpus file
+        generation: Required generation (None accepts any)
+
+    Returns:
+        Tuple of (ids, documents, metadatas), or None if the file is missing,
+        unreadable or belongs to another generation
+    """
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Unreadable lexical corpus file %s: %s", path, e)
+        return None
+    if generation is not None and data.get("generation") != generation:
+        return None
+    return data["ids"], data["documents"], data["metadatas"]
@@ -1,15 +1,28 @@
-import chromadb
-from chromadb.config import Settings
-from typing import List, Dict, Any
+from concurrent.futures import Future
+from typing import List, Dict, Any, Callable, Optional, Set
+from threading import RLock
+import json
 import uuid
 import numpy as np
-from rank_bm25 import BM25Okapi
 from src.core.config import settings as app_settings
 from src.core.logging_config import get_logger
 from src.core.exceptions import VectorStoreError
+from src.core.metrics import QUERY_STAGE_SECONDS, INGEST_STAGE_SECONDS, ERRORS, timed
+from src.repositories.index_sync import IndexGeneration, LEXICAL_FILE, read_lexical_corpus
+from src.repositories.write_buffer import WriteBuffer, EMBEDDING_VALUE_BYTES
+from src.utils.near_duplicates import MinHasher, NearDuplicateIndex, jaccard
 
 logger = get_logger(__name__)
 
+# Page size used when loading the lexical corpus from the collection
+LEXICAL_LOAD_BATCH_SIZE = 5000
+
+# Chunk metadata written by near-duplicate detection
+CLUSTER_KEY = "cluster_id"  # ID of the cluster's first chunk (the chunk's own ID if it has no near-duplicates)
+BANDS_KEY = "minhash_bands"  # LSH band keys, rebuilt into the in-memory index on load
+DUPLICATES_KEY = "duplicates"  # JSON list of back-references to chunks stored as this one
+DUPLICATE_COUNT_KEY = "duplicate_count"
+
 class VectorStoreRepository:
     """
     Abstracts interactions with the Vector Database (ChromaDB).
@@ -26,8 +39,9 @@ class VectorStoreRepository:
         try:
             persist_directory = persist_directory or app_settings.CHROMA_DB_DIR
             collection_name = collection_name or app_settings.VECTOR_STORE_COLLECTION_NAME
-            logger.info(f"Initializing ChromaDB client at: {persist_directory}")
+            logger.info("Initializing ChromaDB client at: %s", persist_directory)
             
+            import chromadb
             self.client = chromadb.PersistentClient(path=persist_directory)
             self.collection = self.client.get_or_create_collection(
                 name=collection_name,
@@ -36,15 +50,47 @@ class VectorStoreRepository:
             
             # Initialize BM25 for hybrid search
             self.bm25_index = None
+            self.bm25_ids = []
             self.bm25_docs = []
             self.bm25_metadatas = []
             
-            logger.info(f"ChromaDB initialized. Collection: {collection_name}")
+            # Callbacks notified with the texts of deleted chunks (e.g. cache invalidation)
+            self._delete_listeners: List[Callable[[List[str]], Any]] = []
+
+            # Near-duplicate detection: LSH index of the stored chunks, and the
+            # chunks holding back-references to each source document
+            self.min_hasher = MinHasher(
+                shingle_size=app_settings.DEDUP_SHINGLE_SIZE,
+                num_perm=app_settings.DEDUP_MINHASH_PERMUTATIONS,
+                bands=app_settings.DEDUP_LSH_BANDS
+            ) if app_settings.DEDUP_ENABLED else None
+            self.duplicate_index = NearDuplicateIndex()
+            self._duplicate_referrers: Dict[str, Set[str]] = {}
+            self._duplicate_generation = None
+            self.duplicate_stats = {"checked": 0, "duplicates": 0, "clustered": 0, "bytes_saved": 0, "promoted": 0}
+
+            # Write generation shared by all worker processes using this store
+            self.index_generation = IndexGeneration(persist_directory)
+            self._lexical_generation = None
+            self._lexical_lock = RLock()
+            self.sync_lexical_index()
+            
+            # Cross-file write batching
+            self.max_batch_size = self._resolve_max_batch_size()
+            self.write_buffer = WriteBuffer(
+                self._flush_buffer,
+                max_chunks=min(app_settings.VECTOR_WRITE_BUFFER_MAX_CHUNKS, self.max_batch_size),
+                max_bytes=app_settings.VECTOR_WRITE_BUFFER_MAX_BYTES,
+                max_age_seconds=app_settings.VECTOR_WRITE_BUFFER_MAX_AGE_MS / 1000.0
+            )
+            
+            logger.info("ChromaDB initialized. Collection: %s", collection_name)
         except Exception as e:
-            logger.error(f"Failed to initialize ChromaDB: {e}")
+            logger.error("Failed to initialize ChromaDB: %s", e)
             raise VectorStoreError(f"Failed to initialize vector store: {e}")
 
-    def add_documents(self, texts: List[str], embeddings: List[List[float]], metadatas: List[Dict[str, Any]] = None):
+    def add_documents(self, texts: List[str], embeddings: List[List[float]], metadatas: List[Dict[str, Any]] = None,
+                      ids: List[str] = None, update_lexical: bool = True):
         """
         Add documents and their embeddings to the vector store.
         Also builds BM25 index for hybrid search.
@@ -53,30 +99,575 @@ class VectorStoreRepository:
             texts: List of text chunks
             embeddings: List of embedding vectors
             metadatas: Optional list of metadata dicts
+            ids: Optional chunk IDs; existing chunks with these IDs are replaced
+            update_lexical: Update this process's BM25 index now. Bulk loaders
+                pass False and leave the index to be reloaded on the next search
+            
+        Returns:
+            List of chunk IDs
         """
         try:
-            ids = [str(uuid.uuid4()) for _ in texts]
-            logger.debug(f"Adding {len(texts)} document(s) to vector store")
-            
-            self.collection.add(
-                ids=ids,
-                documents=texts,
-                embeddings=embeddings,
-                metadatas=metadatas if metadatas else [{}] * len(texts)
-            )
+            logger.debug("Adding %s document(s) to vector store", len(texts))
+            replace = ids is not None
+            ids = ids if replace else [str(uuid.uuid4()) for _ in texts]
+            self._write(ids, texts, embeddings, metadatas if metadatas else [{}] * len(texts), replace, update_lexical)
+            logger.info("Successfully added %s document(s) to vector store and BM25 index", len(texts))
+            return ids
+        except Exception as e:
+            logger.error("Failed to add documents to vector store: %s", e)
+            raise VectorStoreError(f"Failed to add documents: {e}")
+
+    def buffer_documents(self, texts: List[str], embeddings: List[List[float]], metadatas: List[Dict[str, Any]] = None,
+                         ids: List[str] = None) -> Future:
+        """
+        Queue documents in the write buffer instead of writing them now.
+        
+        Chunks from many calls are written together once the buffer reaches
+        settings.VECTOR_WRITE_BUFFER_MAX_CHUNKS or VECTOR_WRITE_BUFFER_MAX_BYTES,
+        or VECTOR_WRITE_BUFFER_MAX_AGE_MS after the first pending chunk. The
+        BM25 index is updated once per flush.
+        
+        Args:
+            texts: List of text chunks
+            embeddings: List of embedding vectors
+            metadatas: Optional list of metadata dicts
+            ids: Optional chunk IDs; existing chunks with these IDs are replaced
+            
+        Returns:
+            Future resolving to {'ids', 'durable_at', 'flush_chunks', 'duplicates',
+            'clustered', 'bytes_saved'} once the chunks are committed (raises
+            VectorStoreError if the flush failed)
+        """
+        replace = ids is not None
+        ids = ids if replace else [str(uuid.uuid4()) for _ in texts]
+        return self.write_buffer.submit(ids, texts, embeddings, metadatas if metadatas else [{}] * len(texts), replace)
+
+    def flush_writes(self) -> int:
+        """
+        Write all buffered documents now.
+        
+        Returns:
+            int: Number of chunks written
+        """
+        return self.write_buffer.flush()
+
+    def write_buffer_stats(self) -> Dict[str, Any]:
+        """
+        Write buffer statistics (pending chunks/bytes, flush counters, last flush time).
+        """
+        return self.write_buffer.stats()
+
+    def _flush_buffer(self, ids, texts, embeddings, metadatas, replace):
+        """Write callback of the write buffer."""
+        try:
+            return self._write(ids, texts, embeddings, metadatas, replace)
+        except Exception as e:
+            raise VectorStoreError(f"Failed to flush buffered documents: {e}")
+
+    def _write(self, ids: List[str], texts: List[str], embeddings: List[List[float]], metadatas: List[Dict[str, Any]],
+               replace: bool, update_lexical: bool = True) -> Dict[str, Any]:
+        """
+        Write chunks in slices of at most max_batch_size, then bump the
+        generation and update the BM25 index once for the whole write.
+        Near-duplicates of stored chunks, or of earlier chunks of the same
+        write, are not written but recorded as back-references on the chunk
+        they duplicate.
+        
+        Returns:
+            Dict with 'duplicates' ({chunk ID: ID of the chunk stored in its
+            place}) and 'clustered' ({chunk ID: cluster ID} of written chunks
+            that joined the cluster of a similar chunk)
+        """
+        with self.index_generation.write_lock(), self._lexical_lock:
+            report = {"duplicates": {}, "clustered": {}}
+            updated = {}
+            written = []
+            try:
+                if self.min_hasher is not None:
+                    ids, texts, embeddings, metadatas, updated, report = self._deduplicate(
+                        ids, texts, embeddings, metadatas, replace
+                    )
+                # Caller-chosen IDs make re-running an interrupted load idempotent
+                write = self.collection.upsert if replace else self.collection.add
+                with timed(INGEST_STAGE_SECONDS, "vector_write"):
+                    for start in range(0, len(ids), self.max_batch_size):
+                        end = start + self.max_batch_size
+                        write(
+                            ids=ids[start:end],
+                            documents=texts[start:end],
+                            embeddings=embeddings[start:end],
+                            metadatas=metadatas[start:end]
+                        )
+                        written.extend(ids[start:end])
+                    if updated:
+                        self.collection.update(ids=list(updated), metadatas=list(updated.values()))
+                    if replace and report["duplicates"]:
+                        # Earlier versions of chunks that are now back-references
+                        self.collection.delete(ids=list(report["duplicates"]))
+            except Exception:
+                # The LSH index may already hold chunks that were not written
+                self._duplicate_generation = None
+                if written:
+                    self._recover_partial_write(written, replace)
+                raise
+            
+            # Add to BM25 index (reload instead if another worker wrote in between,
+            # or if the IDs may have replaced existing chunks)
+            previous_generation = self._lexical_generation
+            generation = self.index_generation.bump()
+            if self.min_hasher is not None:
+                self._duplicate_generation = generation
+            if update_lexical:
+                if previous_generation == generation - 1 and not replace:
+                    self._patch_lexical_metadatas(updated)
+                    self.bm25_ids.extend(ids)
+                    self.bm25_docs.extend(texts)
+                    self.bm25_metadatas.extend(metadatas)
+                    self._rebuild_bm25()
+                    self._lexical_generation = generation
+                else:
+                    self._load_lexical_index(generation)
+            # Otherwise the index is left stale on purpose; the next sync_lexical_index() reloads it
+            return report
+
+    def _recover_partial_write(self, written_ids: List[str], replace: bool):
+        """
+        Deal with the slices of a failed write that were already committed.
+        Must be called while holding the write lock.
+        
+        New chunks are deleted again, so the store is unchanged and a retry
+        with add() does not collide with their IDs. Replaced chunks cannot be
+        restored (nor new ones whose deletion failed): the generation is bumped
+        instead, so every process, this one included, reloads its lexical
+        index and finds them.
+        """
+        if not replace:
+            try:
+                self.collection.delete(ids=written_ids)
+                logger.warning("Rolled back %s chunk(s) of a failed write", len(written_ids))
+                return
+            except Exception as e:
+                logger.error("Rolling back %s chunk(s) of a failed write failed: %s", len(written_ids), e)
+        self.index_generation.bump()
+        logger.warning("Failed write left %s chunk(s) committed; lexical indexes will reload", len(written_ids))
+
+    def _deduplicate(self, ids: List[str], texts: List[str], embeddings: List[List[float]],
+                     metadatas: List[Dict[str, Any]], replace: bool) -> tuple:
+        """
+        Split a write into the chunks to store and the near-duplicates to keep
+        as back-references only. Must be called while holding the write lock.
+        
+        A chunk whose shingle similarity to a stored chunk (or an earlier chunk
+        of this write) reaches settings.DEDUP_THRESHOLD is dropped and listed in
+        that chunk's 'duplicates' metadata. A chunk reaching
+        settings.DEDUP_CLUSTER_THRESHOLD is stored with that chunk's cluster_id,
+        so search returns only the best-ranked chunk of the cluster.
+        
+        A chunk holding settings.DEDUP_MAX_BACK_REFERENCES back-references
+        takes no more: its next duplicate is stored as a new copy in the same
+        cluster, which takes the following ones.
+        
+        Returns:
+            Tuple of (ids, texts, embeddings, metadatas) to write, {chunk ID:
+            metadata} of stored chunks that gained back-references, and the
+            write report
+        """
+        self._sync_duplicate_index()
+        limit = app_settings.DEDUP_MAX_CANDIDATES
+        fingerprints = [self.min_hasher.fingerprint(text) for text in texts]
+        
+        # Fetch every stored candidate of the write at once
+        batch_ids = set(ids)
+        stored_ids = {
+            candidate
+            for doc_id, (_, keys) in zip(ids, fingerprints)
+            for candidate in self.duplicate_index.candidates(keys, limit, exclude=doc_id)
+            if candidate not in batch_ids
+        }
+        stored = {}
+        if stored_ids:
+            found = self.collection.get(ids=list(stored_ids), include=["documents", "metadatas"])
+            for doc_id, document, metadata in zip(found["ids"], found["documents"], found["metadatas"]):
+                stored[doc_id] = (self.min_hasher.shingles(document or ""), dict(metadata or {}))
+        # Back-references held by earlier versions of replaced chunks are carried over
+        previous_references = {}
+        if replace:
+            found = self.collection.get(ids=list(ids), include=["metadatas"])
+            for doc_id, metadata in zip(found["ids"], found["metadatas"]):
+                references = _back_references(metadata or {})
+                if references:
+                    previous_references[doc_id] = references
+        
+        written = {}
+        updated = {}
+        report = {"duplicates": {}, "clustered": {}}
+        keep_ids, keep_texts, keep_embeddings, keep_metadatas = [], [], [], []
+        for doc_id, text, embedding, metadata, (shingles, keys) in zip(ids, texts, embeddings, metadatas, fingerprints):
+            best_id, best_similarity = None, 0.0
+            # Most similar candidate that can still take a back-reference
+            open_id, open_similarity = None, 0.0
+            for candidate in self.duplicate_index.candidates(keys, limit, exclude=doc_id):
+                entry = written.get(candidate) or stored.get(candidate)
+                if entry is None:
+                    continue
+                similarity = jaccard(shingles, entry[0])
+                if similarity > best_similarity:
+                    best_id, best_similarity = candidate, similarity
+                if similarity > open_similarity and \
+                        entry[1].get(DUPLICATE_COUNT_KEY, 0) < app_settings.DEDUP_MAX_BACK_REFERENCES:
+                    open_id, open_similarity = candidate, similarity
+            
+            metadata = dict(metadata)
+            references = previous_references.get(doc_id, [])
+            if open_id is not None and open_similarity >= app_settings.DEDUP_THRESHOLD:
+                if open_id in written:
+                    canonical = written[open_id][1]
+                else:
+                    canonical = updated.setdefault(open_id, stored[open_id][1])
+                self._add_back_references(open_id, canonical, [_back_reference(doc_id, metadata)] + references)
+                self.duplicate_index.remove(doc_id)
+                report["duplicates"][doc_id] = open_id
+                self.duplicate_stats["bytes_saved"] += len(text.encode("utf-8")) + len(embedding) * EMBEDDING_VALUE_BYTES
+                continue
             
-            # Add to BM25 index
-            self.bm25_docs.extend(texts)
-            self.bm25_metadatas.extend(metadatas if metadatas else [{}] * len(texts))
+            metadata[CLUSTER_KEY] = doc_id
+            if best_id is not None and best_similarity >= app_settings.DEDUP_CLUSTER_THRESHOLD:
+                similar = written[best_id][1] if best_id in written else stored[best_id][1]
+                metadata[CLUSTER_KEY] = similar.get(CLUSTER_KEY) or best_id
+                report["clustered"][doc_id] = metadata[CLUSTER_KEY]
+            metadata[BANDS_KEY] = self.min_hasher.encode(keys)
+            _set_back_references(metadata, [])
+            if references:
+                self._add_back_references(doc_id, metadata, references)
+            written[doc_id] = (shingles, metadata)
+            self.duplicate_index.add(doc_id, keys)
+            keep_ids.append(doc_id)
+            keep_texts.append(text)
+            keep_embeddings.append(embedding)
+            keep_metadatas.append(metadata)
+        
+        self.duplicate_stats["checked"] += len(ids)
+        self.duplicate_stats["duplicates"] += len(report["duplicates"])
+        self.duplicate_stats["clustered"] += len(report["clustered"])
+        if report["duplicates"]:
+            logger.info("Near-duplicate detection: %s of %s chunk(s) stored as back-references, %s clustered",
+                        len(report["duplicates"]), len(ids), len(report["clustered"]))
+        return keep_ids, keep_texts, keep_embeddings, keep_metadatas, updated, report
+
+    def _add_back_references(self, chunk_id: str, metadata: Dict[str, Any], references: List[Dict[str, Any]]):
+        """Append back-references to a stored chunk's metadata (once per referenced chunk ID)."""
+        current = _back_references(metadata)
+        known = {reference.get("id") for reference in current}
+        for reference in references:
+            if reference.get("id") not in known:
+                current.append(reference)
+                known.add(reference.get("id"))
+                self._duplicate_referrers.setdefault(reference.get("source"), set()).add(chunk_id)
+        _set_back_references(metadata, current)
+
+    def _sync_duplicate_index(self):
+        """Rebuild the LSH index if the store changed since it was built. Requires the write lock."""
+        generation = self.index_generation.current()
+        if generation == self._duplicate_generation:
+            return
+        if generation == self._lexical_generation:
+            self._rebuild_duplicate_index(self.bm25_ids, self.bm25_metadatas, generation)
+            return
+        ids, metadatas = [], []
+        offset = 0
+        while True:
+            page = self.collection.get(include=["metadatas"], limit=LEXICAL_LOAD_BATCH_SIZE, offset=offset)
+            if not page["ids"]:
+                break
+            ids.extend(page["ids"])
+            metadatas.extend(page["metadatas"] or [{}] * len(page["ids"]))
+            offset += len(page["ids"])
+        self._rebuild_duplicate_index(ids, metadatas, generation)
+
+    def _rebuild_duplicate_index(self, ids: List[str], metadatas: List[Dict[str, Any]], generation: int):
+        """Rebuild the LSH index and back-reference map from chunk metadata."""
+        self.duplicate_index.clear()
+        self._duplicate_referrers = {}
+        for doc_id, metadata in zip(ids, metadatas):
+            metadata = metadata or {}
+            keys = self.min_hasher.decode(metadata.get(BANDS_KEY))
+            if keys:
+                self.duplicate_index.add(doc_id, keys)
+            for reference in _back_references(metadata):
+                self._duplicate_referrers.setdefault(reference.get("source"), set()).add(doc_id)
+        self._duplicate_generation = generation
+        logger.debug("Near-duplicate index rebuilt: %s chunk(s), generation %s", len(self.duplicate_index), generation)
+
+    def _patch_lexical_metadatas(self, updated: Dict[str, Dict[str, Any]]):
+        """Apply metadata updates of stored chunks to the in-memory lexical corpus."""
+        if not updated:
+            return
+        for position, doc_id in enumerate(self.bm25_ids):
+            if doc_id in updated:
+                self.bm25_metadatas[position] = updated[doc_id]
+
+    def _resolve_max_batch_size(self) -> int:
+        """Largest write Chroma accepts, capped by settings.VECTOR_STORE_MAX_BATCH_SIZE."""
+        limit = app_settings.VECTOR_STORE_MAX_BATCH_SIZE
+        get_max_batch_size = getattr(self.client, "get_max_batch_size", None)
+        try:
+            client_limit = get_max_batch_size() if get_max_batch_size else getattr(self.client, "max_batch_size", None)
+        except Exception as e:
+            logger.warning("Could not read Chroma's max batch size: %s", e)
+            client_limit = None
+        if client_limit:
+            limit = min(limit, int(client_limit))
+        return max(1, limit)
+
+    def delete_documents(self, ids: List[str]) -> int:
+        """
+        Delete chunks from the vector store and the BM25 index.
+        A deleted chunk that stood in for near-duplicates of other documents is
+        taken over by the first of them, so their content stays searchable.
+        Registered delete listeners are notified with the deleted texts.
+        
+        Args:
+            ids: IDs of the chunks to delete
             
-            # Rebuild BM25 index
-            tokenized_corpus = [doc.lower().split() for doc in self.bm25_docs]
-            self.bm25_index = BM25Okapi(tokenized_corpus)
+        Returns:
+            int: Number of chunks deleted
+        """
+        if not ids:
+            return 0
+        try:
+            with self.index_generation.write_lock(), self._lexical_lock:
+                if self.min_hasher is not None:
+                    self._sync_duplicate_index()
+                deleted_texts = self._delete(ids, {})
+            self._notify_delete(deleted_texts)
+            logger.info("Deleted %s document(s) from vector store and BM25 index", len(deleted_texts))
+            return len(deleted_texts)
+        except Exception as e:
+            logger.error("Failed to delete documents from vector store: %s", e)
+            raise VectorStoreError(f"Failed to delete documents: {e}")
+
+    def delete_source(self, source: str) -> int:
+        """
+        Delete every chunk of a source document, and its back-references on
+        chunks stored in place of its near-duplicates.
+        
+        Args:
+            source: Source path recorded in the chunk metadata
             
-            logger.info(f"Successfully added {len(texts)} document(s) to vector store and BM25 index")
+        Returns:
+            int: Number of chunks deleted
+        """
+        try:
+            with self.index_generation.write_lock(), self._lexical_lock:
+                updated, changed_texts = {}, []
+                if self.min_hasher is not None:
+                    self._sync_duplicate_index()
+                    updated, changed_texts = self._drop_back_references(source)
+                ids = self.collection.get(where={"source": source}, include=[])["ids"]
+                if not ids and not updated:
+                    return 0
+                deleted_texts = self._delete(ids, updated)
+            self._notify_delete(deleted_texts + changed_texts)
+            logger.info("Deleted %s chunk(s) of %s", len(deleted_texts), source)
+            return len(deleted_texts)
         except Exception as e:
-            logger.error(f"Failed to add documents to vector store: {e}")
-            raise VectorStoreError(f"Failed to add documents: {e}")
+            logger.error("Failed to delete chunks of %s: %s", source, e)
+            raise VectorStoreError(f"Failed to delete chunks of {source}: {e}")
+
+    def _delete(self, ids: List[str], updated: Dict[str, Dict[str, Any]]) -> List[str]:
+        """
+        Delete chunks, promote near-duplicates they stood in for and write
+        metadata updates, all as one generation. Requires the write lock.
+        
+        Returns:
+            Texts of the deleted chunks
+        """
+        deleted_texts, promoted = [], None
+        if ids:
+            existing = self.collection.get(ids=ids, include=["documents", "metadatas"])
+            deleted_texts = existing["documents"] or []
+            if self.min_hasher is not None:
+                metadatas = [updated.pop(doc_id, metadata) for doc_id, metadata in zip(existing["ids"], existing["metadatas"])]
+                promoted = self._promote_duplicates(existing["ids"], deleted_texts, metadatas, set(ids))
+            self.collection.delete(ids=ids)
+        try:
+            if promoted:
+                self.collection.add(**promoted)
+            if updated:
+                self.collection.update(ids=list(updated), metadatas=list(updated.values()))
+        except Exception:
+            self._duplicate_generation = None
+            raise
+        
+        # Remove from BM25 index (reload instead if another worker wrote in between)
+        previous_generation = self._lexical_generation
+        generation = self.index_generation.bump()
+        if self.min_hasher is not None:
+            self._duplicate_generation = generation
+        if previous_generation == generation - 1:
+            id_set = set(ids)
+            keep = [i for i, doc_id in enumerate(self.bm25_ids) if doc_id not in id_set]
+            self.bm25_ids = [self.bm25_ids[i] for i in keep]
+            self.bm25_docs = [self.bm25_docs[i] for i in keep]
+            self.bm25_metadatas = [self.bm25_metadatas[i] for i in keep]
+            self._patch_lexical_metadatas(updated)
+            if promoted:
+                self.bm25_ids.extend(promoted["ids"])
+                self.bm25_docs.extend(promoted["documents"])
+                self.bm25_metadatas.extend(promoted["metadatas"])
+            self._rebuild_bm25()
+            self._lexical_generation = generation
+        else:
+            self._load_lexical_index(generation)
+        return deleted_texts
+
+    def _promote_duplicates(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]],
+                            deleted: Set[str]) -> Optional[Dict[str, List[Any]]]:
+        """
+        For each chunk about to be deleted that holds back-references, build a
+        replacement chunk owned by its first remaining back-reference, with the
+        same text and embedding and the other back-references.
+        
+        Returns:
+            Keyword arguments of collection.add for the replacements, or None
+        """
+        holders = []
+        for doc_id, document, metadata in zip(ids, documents, metadatas):
+            metadata = metadata or {}
+            keys = self.duplicate_index.keys(doc_id)
+            self.duplicate_index.remove(doc_id)
+            references = _back_references(metadata)
+            for reference in references:
+                self._duplicate_referrers.get(reference.get("source"), set()).discard(doc_id)
+            references = [reference for reference in references if reference.get("id") not in deleted]
+            if references:
+                holders.append((doc_id, document, metadata, keys, references))
+        if not holders:
+            return None
+        
+        found = self.collection.get(ids=[holder[0] for holder in holders], include=["embeddings"])
+        embeddings = dict(zip(found["ids"], found["embeddings"]))
+        promoted = {"ids": [], "documents": [], "embeddings": [], "metadatas": []}
+        for doc_id, document, metadata, keys, references in holders:
+            heir, others = references[0], references[1:]
+            metadata = dict(metadata)
+            for key in ("filename", "source", "chunk_index"):
+                if heir.get(key) is not None:
+                    metadata[key] = heir[key]
+            _set_back_references(metadata, [])
+            self._add_back_references(heir["id"], metadata, others)
+            if keys:
+                self.duplicate_index.add(heir["id"], keys)
+            promoted["ids"].append(heir["id"])
+            promoted["documents"].append(document)
+            promoted["embeddings"].append(embeddings[doc_id])
+            promoted["metadatas"].append(metadata)
+        self.duplicate_stats["promoted"] += len(promoted["ids"])
+        logger.info("Promoted %s near-duplicate chunk(s) in place of deleted chunks", len(promoted["ids"]))
+        return promoted
+
+    def _drop_back_references(self, source: str) -> tuple:
+        """
+        Remove a source's back-references from the chunks holding them.
+        
+        Returns:
+            Tuple of ({chunk ID: updated metadata}, texts of those chunks)
+        """
+        holders = self._duplicate_referrers.pop(source, set())
+        if not holders:
+            return {}, []
+        found = self.collection.get(ids=list(holders), include=["documents", "metadatas"])
+        updated = {}
+        for doc_id, metadata in zip(found["ids"], found["metadatas"]):
+            metadata = dict(metadata or {})
+            _set_back_references(metadata, [r for r in _back_references(metadata) if r.get("source") != source])
+            updated[doc_id] = metadata
+        return updated, list(found["documents"] or [])
+
+    def _notify_delete(self, texts: List[str]):
+        for listener in self._delete_listeners:
+            try:
+                listener(texts)
+            except Exception as e:
+                logger.warning("Delete listener failed: %s", e)
+
+    def add_delete_listener(self, listener: Callable[[List[str]], Any]):
+        """
+        Register a callback invoked with the texts of deleted chunks.
+        
+        Args:
+            listener: Callable receiving a list of deleted chunk texts
+        """
+        self._delete_listeners.append(listener)
+
+    def sync_lexical_index(self, force: bool = False) -> bool:
+        """
+        Reload the BM25 index if another process changed the store.
+        Cheap when nothing changed: a single read of the generation file.
+        
+        Args:
+            force: Reload even if the generation did not change
+            
+        Returns:
+            bool: True if the index was reloaded
+        """
+        generation = self.index_generation.current()
+        if not force and generation == self._lexical_generation:
+            return False
+        with self._lexical_lock:
+            generation = self.index_generation.current()
+            if not force and generation == self._lexical_generation:
+                return False
+            self._load_lexical_index(generation)
+            return True
+
+    def _load_lexical_index(self, generation: int):
+        """
+        Rebuild the BM25 corpus from the persisted collection, or from the
+        corpus file left by a snapshot restore or compaction of this generation.
+        """
+        corpus = read_lexical_corpus(self.index_generation.directory / LEXICAL_FILE, generation)
+        if corpus is not None:
+            self.bm25_ids, self.bm25_docs, metadatas = corpus
+            self.bm25_metadatas = [m or {} for m in metadatas]
+            self._rebuild_bm25()
+            self._lexical_generation = generation
+            if self.min_hasher is not None:
+                self._rebuild_duplicate_index(self.bm25_ids, self.bm25_metadatas, generation)
+            logger.info("Lexical index loaded from corpus file: %s document(s), generation %s", len(self.bm25_docs), generation)
+            return
+        ids, docs, metadatas = [], [], []
+        offset = 0
+        while True:
+            page = self.collection.get(
+                include=["documents", "metadatas"],
+                limit=LEXICAL_LOAD_BATCH_SIZE,
+                offset=offset
+            )
+            if not page["ids"]:
+                break
+            ids.extend(page["ids"])
+            docs.extend(page["documents"])
+            metadatas.extend(page["metadatas"] or [{}] * len(page["ids"]))
+            offset += len(page["ids"])
+        
+        self.bm25_ids = ids
+        self.bm25_docs = docs
+        self.bm25_metadatas = [m or {} for m in metadatas]
+        self._rebuild_bm25()
+        self._lexical_generation = generation
+        if self.min_hasher is not None:
+            self._rebuild_duplicate_index(ids, self.bm25_metadatas, generation)
+        logger.info("Lexical index loaded: %s document(s), generation %s", len(docs), generation)
+
+    def _rebuild_bm25(self):
+        """Rebuild the BM25 index from the current lexical corpus."""
+        if not self.bm25_docs:
+            self.bm25_index = None
+            return
+        from rank_bm25 import BM25Okapi
+        tokenized_corpus = [doc.lower().split() for doc in self.bm25_docs]
+        self.bm25_index = BM25Okapi(tokenized_corpus)
 
     def search(self, query_embedding: List[float], k: int = 5) -> Dict[str, Any]:
         """
@@ -87,26 +678,29 @@ class VectorStoreRepository:
             k: Number of results to return
             
         Returns:
-            Dict with 'documents', 'metadatas', and 'distances'
+            Dict with 'ids', 'documents', 'metadatas', and 'distances'
         """
         try:
-            logger.debug(f"Searching vector store (k={k})")
+            logger.debug("Searching vector store (k=%s)", k)
             
+            # Over-fetch so k results remain once near-duplicate clusters are collapsed
             results = self.collection.query(
                 query_embeddings=[query_embedding],
-                n_results=k
+                n_results=k * 2 if self.min_hasher is not None else k
             )
             
-            num_results = len(results['documents'][0]) if results['documents'] else 0
-            logger.debug(f"Found {num_results} result(s)")
+            hits = list(zip(results['ids'][0], results['documents'][0], results['metadatas'][0], results['distances'][0]))
+            hits = _first_per_cluster(hits, lambda hit: (hit[2] or {}).get(CLUSTER_KEY))[:k]
+            logger.debug("Found %s result(s)", len(hits))
             
             return {
-                'documents': results['documents'][0],
-                'metadatas': results['metadatas'][0],
-                'distances': results['distances'][0]
+                'ids': [hit[0] for hit in hits],
+                'documents': [hit[1] for hit in hits],
+                'metadatas': [hit[2] for hit in hits],
+                'distances': [hit[3] for hit in hits]
             }
         except Exception as e:
-            logger.error(f"Failed to search vector store: {e}")
+            logger.error("Failed to search vector store: %s", e)
             raise VectorStoreError(f"Failed to search vector store: {e}")
 
     def hybrid_search(self, query_embedding: List[float], query_text: str, k: int = 5, alpha: float = None) -> Dict[str, Any]:
@@ -120,62 +714,171 @@ class VectorStoreRepository:
             alpha: Weight for combining scores (0=BM25 only, 1=vector only, defaults to settings.HYBRID_SEARCH_ALPHA)
             
         Returns:
-            Dict with 'documents', 'metadatas', and 'scores'
+            Dict with 'ids', 'documents', 'metadatas', 'scores' (fused),
+            'stage_scores' (vector rank/distance and BM25 rank/score per
+            result) and the 'vector_candidates' / 'lexical_candidates'
+            counts that were fused
+        """
+        return self.hybrid_search_batch([query_embedding], [query_text], k=k, alpha=alpha)[0]
+
+    def hybrid_search_batch(self, query_embeddings: List[List[float]], query_texts: List[str], k: int = 5, alpha: float = None,
+                            lexical: bool = True) -> List[Dict[str, Any]]:
+        """
+        Hybrid search for several queries at once.
+        The vector search for all queries is a single collection query, and
+        every query is scored against the same lexical index snapshot.
+        
+        Args:
+            query_embeddings: One embedding per query
+            query_texts: Original query texts for BM25
+            k: Number of results to return per query
+            alpha: Weight for combining scores (0=BM25 only, 1=vector only, defaults to settings.HYBRID_SEARCH_ALPHA)
+            lexical: Run the BM25 leg (False runs vector search only)
+            
+        Returns:
+            List with one hybrid_search result dict per query, in input order
         """
         alpha = alpha if alpha is not None else app_settings.HYBRID_SEARCH_ALPHA
+        if not query_texts:
+            return []
+        if not lexical:
+            return [self.search(query_embedding, k) for query_embedding in query_embeddings]
         try:
-            logger.debug(f"Performing hybrid search (k={k}, alpha={alpha})")
+            logger.debug("Performing hybrid search for %s query(s) (k=%s, alpha=%s)", len(query_texts), k, alpha)
             
-            # 1. Vector search (get top 2k for better coverage)
-            vector_results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=min(k * 2, max(len(self.bm25_docs), 1))
-            )
+            # Pick up writes made by other worker processes, then use a consistent snapshot
+            self.sync_lexical_index()
+            bm25_index, bm25_ids, bm25_docs, bm25_metadatas = self.bm25_index, self.bm25_ids, self.bm25_docs, self.bm25_metadatas
             
-            # 2. BM25 search
-            if self.bm25_index and self.bm25_docs:
-                tokenized_query = query_text.lower().split()
-                bm25_scores = self.bm25_index.get_scores(tokenized_query)
-            else:
+            if not (bm25_index and bm25_docs):
                 logger.warning("BM25 index not initialized, falling back to vector search only")
-                return self.search(query_embedding, k)
-            
-            # 3. Reciprocal Rank Fusion (RRF)
-            doc_scores = {}
-            rrf_k = app_settings.HYBRID_SEARCH_RRF_K
+                return [self.search(query_embedding, k) for query_embedding in query_embeddings]
             
-            # Add vector search scores (using RRF: 1/(rank + k))
-            for rank, (doc, metadata) in enumerate(zip(vector_results['documents'][0], vector_results['metadatas'][0])):
-                rrf_score = 1.0 / (rank + rrf_k)
-                doc_scores[doc] = {
-                    'score': alpha * rrf_score,
-                    'metadata': metadata
-                }
+            # 1. Vector search (get top 2k for better coverage)
+            with timed(QUERY_STAGE_SECONDS, "vector_search"):
+                vector_results = self.collection.query(
+                    query_embeddings=list(query_embeddings),
+                    n_results=min(k * 2, max(len(bm25_docs), 1))
+                )
             
-            # Add BM25 scores (using RRF)
-            bm25_ranked = sorted(enumerate(bm25_scores), key=lambda x: -x[1])
-            for rank, (idx, score) in enumerate(bm25_ranked[:k * 2]):
-                doc = self.bm25_docs[idx]
-                rrf_score = 1.0 / (rank + rrf_k)
+            results = []
+            for i, query_text in enumerate(query_texts):
+                # 2. BM25 search
+                tokenized_query = query_text.lower().split()
+                with timed(QUERY_STAGE_SECONDS, "lexical_search"):
+                    bm25_scores = bm25_index.get_scores(tokenized_query)
                 
-                if doc in doc_scores:
-                    doc_scores[doc]['score'] += (1 - alpha) * rrf_score
-                else:
-                    doc_scores[doc] = {
-                        'score': (1 - alpha) * rrf_score,
-                        'metadata': self.bm25_metadatas[idx]
-                    }
+                vector_hits = list(zip(vector_results['ids'][i], vector_results['documents'][i],
+                                       vector_results['metadatas'][i], vector_results['distances'][i]))
+                results.append(self._fuse(vector_hits, bm25_scores, bm25_ids, bm25_docs, bm25_metadatas, k, alpha))
             
-            # 4. Sort by combined score and return top k
-            sorted_docs = sorted(doc_scores.items(), key=lambda x: -x[1]['score'])[:k]
-            
-            logger.debug(f"Hybrid search found {len(sorted_docs)} result(s)")
-            
-            return {
-                'documents': [doc for doc, _ in sorted_docs],
-                'metadatas': [data['metadata'] for _, data in sorted_docs],
-                'scores': [data['score'] for _, data in sorted_docs]
-            }
+            return results
         except Exception as e:
-            logger.error(f"Hybrid search failed: {e}")
+            ERRORS.labels(component="vector_store").inc()
+            logger.error("Hybrid search failed: %s", e)
             raise VectorStoreError(f"Hybrid search failed: {e}")
+
+    @staticmethod
+    def _fuse(vector_hits, bm25_scores, bm25_ids, bm25_docs, bm25_metadatas, k: int, alpha: float) -> Dict[str, Any]:
+        """
+        Combine vector hits and BM25 scores with Reciprocal Rank Fusion (RRF).
+        """
+        doc_scores = {}
+        rrf_k = app_settings.HYBRID_SEARCH_RRF_K
+        
+        # Add vector search scores (using RRF: 1/(rank + k))
+        for rank, (doc_id, doc, metadata, distance) in enumerate(vector_hits):
+            rrf_score = 1.0 / (rank + rrf_k)
+            doc_scores[doc] = {
+                'id': doc_id,
+                'score': alpha * rrf_score,
+                'metadata': metadata,
+                'stages': {'vector_rank': rank + 1, 'vector_distance': float(distance)}
+            }
+        
+        # Add BM25 scores (using RRF)
+        bm25_ranked = sorted(enumerate(bm25_scores), key=lambda x: -x[1])[:k * 2]
+        for rank, (idx, score) in enumerate(bm25_ranked):
+            doc = bm25_docs[idx]
+            rrf_score = 1.0 / (rank + rrf_k)
+            
+            if doc in doc_scores:
+                doc_scores[doc]['score'] += (1 - alpha) * rrf_score
+            else:
+                doc_scores[doc] = {
+                    'id': bm25_ids[idx],
+                    'score': (1 - alpha) * rrf_score,
+                    'metadata': bm25_metadatas[idx],
+                    'stages': {}
+                }
+            doc_scores[doc]['stages'].update(lexical_rank=rank + 1, bm25_score=float(score))
+        
+        # Sort by combined score and return the top k, one chunk per near-duplicate cluster
+        sorted_docs = sorted(doc_scores.items(), key=lambda x: -x[1]['score'])
+        sorted_docs = _first_per_cluster(sorted_docs, lambda item: (item[1]['metadata'] or {}).get(CLUSTER_KEY))[:k]
+        
+        logger.debug("Hybrid search found %s result(s)", len(sorted_docs))
+        
+        return {
+            'ids': [data['id'] for _, data in sorted_docs],
+            'documents': [doc for doc, _ in sorted_docs],
+            'metadatas': [data['metadata'] for _, data in sorted_docs],
+            'scores': [data['score'] for _, data in sorted_docs],
+            'stage_scores': [data['stages'] for _, data in sorted_docs],
+            'vector_candidates': len(vector_hits),
+            'lexical_candidates': len(bm25_ranked)
+        }
+
+
+def _back_reference(chunk_id: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Back-reference to a chunk that was not stored because it duplicates another."""
+    return {
+        "id": chunk_id,
+        "filename": metadata.get("filename"),
+        "source": metadata.get("source"),
+        "chunk_index": metadata.get("chunk_index"),
+    }
+
+
+def _back_references(metadata: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Back-references listed in a chunk's metadata."""
+    value = metadata.get(DUPLICATES_KEY)
+    return json.loads(value) if value else []
+
+
+def _set_back_references(metadata: Dict[str, Any], references: List[Dict[str, Any]]):
+    # Chroma metadata values are scalars, so the list is stored as JSON
+    metadata[DUPLICATES_KEY] = json.dumps(references)
+    metadata[DUPLICATE_COUNT_KEY] = len(references)
+
+
+def source_filenames(metadata: Dict[str, Any], limit: int = None) -> List[str]:
+    """
+    Filenames a chunk stands for: its own and those of the near-duplicates
+    stored as back-references on it.
+    
+    Args:
+        metadata: Chunk metadata
+        limit: Return at most this many filenames, the chunk's own first (None for all)
+    """
+    filenames = [metadata.get("filename", "Unknown")]
+    for reference in _back_references(metadata):
+        if limit is not None and len(filenames) >= limit:
+            break
+        if reference.get("filename") and reference["filename"] not in filenames:
+            filenames.append(reference["filename"])
+    return filenames
+
+
+def _first_per_cluster(entries: List[Any], cluster_of: Callable[[Any], Optional[str]]) -> List[Any]:
+    """Keep the first (best-ranked) entry of every near-duplicate cluster."""
+    seen = set()
+    kept = []
+    for entry in entries:
+        cluster = cluster_of(entry)
+        if cluster is not None:
+            if cluster in seen:
+                continue
+            seen.add(cluster)
+        kept.append(entry)
+    return kept
@@ -0,0 +1,206 @@
+"""
+Cross-file write buffer for the vector store.
+
+Chunks from many files (and many requests) are accumulated and written in
+one flush once the buffer holds enough chunks or bytes, or once its oldest
+entry has waited long enough. Each submission gets a Future that resolves
+when its chunks are committed to the store. When a flush fails, its
+submissions are retried one by one, so a bad submission only fails its own
+Future.
+"""
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from threading import Lock, Timer
+from typing import Any, Callable, Dict, List, Optional
+from src.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Bytes per embedding value when estimating the size of a pending write
+EMBEDDING_VALUE_BYTES = 4
+
+
+def _chunk_bytes(text: str, embedding: List[float]) -> int:
+    """Estimated stored size of a chunk: its UTF-8 text plus its embedding."""
+    return len(text.encode("utf-8")) + len(embedding) * EMBEDDING_VALUE_BYTES
+
+
+@dataclass
+class PendingWrite:
+    """Chunks of one submission waiting for the next flush."""
+    ids: List[str]
+    texts: List[str]
+    embeddings: List[List[float]]
+    metadatas: List[Dict[str, Any]]
+    replace: bool
+    size_bytes: int
+    future: Future
+
+
+class WriteBuffer:
+    """
+    Accumulates vector store writes and flushes them together.
+    """
+
+    def __init__(self, flush_fn: Callable[..., Any], max_chunks: int, max_bytes: int, max_age_seconds: float):
+        """
+        Args:
+            flush_fn: Called as flush_fn(ids, texts, embeddings, metadatas, replace)
+                with the concatenated pending writes. May return a dict with
+                'duplicates' ({chunk ID: ID stored in its place}) and
+                'clustered' ({chunk ID: cluster ID}) for the written chunks
+            max_chunks: Flush once this many chunks are pending
+            max_bytes: Flush once the pending payload reaches this estimated size
+            max_age_seconds: Flush once the oldest pending chunk waited this long
+        """
+        self.flush_fn = flush_fn
+        self.max_chunks = max_chunks
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._pending: List[PendingWrite] = []
+        self._pending_chunks = 0
+        self._pending_bytes = 0
+        self._timer: Optional[Timer] = None
+        self._lock = Lock()
+        self._flush_lock = Lock()
+        self.flushes = 0
+        self.flushed_chunks = 0
+        self.failed_flushes = 0
+        self.last_flush_at: Optional[float] = None
+        self.last_flush_chunks = 0
+
+    def submit(self, ids: List[str], texts: List[str], embeddings: List[List[float]],
+               metadatas: List[Dict[str, Any]], replace: bool = False) -> Future:
+        """
+        Queue chunks for the next flush. Flushes in the calling thread when
+        the buffer is full.
+
+        Args:
+            ids: Chunk IDs
+            texts: Chunk texts
+            embeddings: Chunk embeddings
+            metadatas: Chunk metadata dicts
+            replace: The IDs may already exist and must be replaced (upsert)
+
+        Returns:
+            Future resolving to {'ids', 'durable_at', 'flush_chunks',
+            'duplicates', 'clustered', 'bytes_saved'} once the chunks are
+            committed, or raising the flush error
+        """
+        future = Future()
+        if not texts:
+            future.set_result({"ids": [], "durable_at": time.time(), "flush_chunks": 0,
+                               "duplicates": {}, "clustered": {}, "bytes_saved": 0})
+            return future
+
+        size_bytes = sum(_chunk_bytes(text, embedding) for text, embedding in zip(texts, embeddings))
+        entry = PendingWrite(list(ids), list(texts), list(embeddings), list(metadatas), replace, size_bytes, future)
+
+        with self._lock:
+            self._pending.append(entry)
+            self._pending_chunks += len(texts)
+            self._pending_bytes += size_bytes
+            full = self._pending_chunks >= self.max_chunks or self._pending_bytes >= self.max_bytes
+            if not full and self._timer is None:
+                self._timer = Timer(self.max_age_seconds, self._flush_on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if full:
+            self.flush()
+        return future
+
+    def flush(self) -> int:
+        """
+        Write everything pending in one flush.
+
+        Returns:
+            int: Number of chunks written
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._pending_chunks = 0
+                self._pending_bytes = 0
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not batch:
+                return 0
+
+            chunk_count = sum(len(entry.texts) for entry in batch)
+            try:
+                self._write(batch)
+            except Exception as e:
+                self.failed_flushes += 1
+                if len(batch) == 1:
+                    logger.error("Write buffer flush of %s chunk(s) failed: %s", chunk_count, e)
+                    batch[0].future.set_exception(e)
+                    return 0
+                # One bad submission (e.g. an invalid metadata value) must not fail the others
+                logger.warning("Write buffer flush of %s chunk(s) from %s submission(s) failed, "
+                               "retrying each on its own: %s", chunk_count, len(batch), e)
+                written = 0
+                for entry in batch:
+                    try:
+                        self._write([entry])
+                    except Exception as entry_error:
+                        logger.error("Write of %s buffered chunk(s) failed: %s", len(entry.texts), entry_error)
+                        entry.future.set_exception(entry_error)
+                        continue
+                    written += len(entry.texts)
+                return written
+
+            logger.debug("Write buffer flushed %s chunk(s) from %s submission(s)", chunk_count, len(batch))
+            return chunk_count
+
+    def _write(self, batch: List[PendingWrite]):
+        """Write submissions in one call to flush_fn and resolve their futures."""
+        chunk_count = sum(len(entry.texts) for entry in batch)
+        report = self.flush_fn(
+            [doc_id for entry in batch for doc_id in entry.ids],
+            [text for entry in batch for text in entry.texts],
+            [embedding for entry in batch for embedding in entry.embeddings],
+            [metadata for entry in batch for metadata in entry.metadatas],
+            any(entry.replace for entry in batch),
+        )
+
+        durable_at = time.time()
+        self.flushes += 1
+        self.flushed_chunks += chunk_count
+        self.last_flush_at = durable_at
+        self.last_flush_chunks = chunk_count
+        report = report or {}
+        duplicates = report.get("duplicates", {})
+        clustered = report.get("clustered", {})
+        for entry in batch:
+            chunks = list(zip(entry.ids, entry.texts, entry.embeddings))
+            entry.future.set_result({
+                "ids": entry.ids,
+                "durable_at": durable_at,
+                "flush_chunks": chunk_count,
+                "duplicates": {doc_id: duplicates[doc_id] for doc_id in entry.ids if doc_id in duplicates},
+                "clustered": {doc_id: clustered[doc_id] for doc_id in entry.ids if doc_id in clustered},
+                "bytes_saved": sum(_chunk_bytes(text, embedding) for doc_id, text, embedding in chunks
+                                   if doc_id in duplicates),
+            })
+
+    def _flush_on_timer(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error("Timed write buffer flush failed: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pending size and flush counters."""
+        with self._lock:
+            return {
+                "pending_chunks": self._pending_chunks,
+                "pending_bytes": self._pending_bytes,
+                "flushes": self.flushes,
+                "flushed_chunks": self.flushed_chunks,
+                "failed_flushes": self.failed_flushes,
+                "last_flush_at": self.last_flush_at,
+                "last_flush_chunks": self.last_flush_chunks,
+            }
@@ -0,0 +1,90 @@
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Dict, List, Optional
+from src.core.config import settings
+
+
+@dataclass
+class ConversationState:
+    """
+    Retrieval state kept between the turns of one chat session.
+    """
+    question: str  # Last question as asked
+    query_text: str  # Last question with its conversational context (used for retrieval)
+    query_embedding: List[float]
+    candidate_ids: List[str] = field(default_factory=list)
+    candidate_documents: List[str] = field(default_factory=list)
+    candidate_metadatas: List[Dict[str, Any]] = field(default_factory=list)
+    generation: int = 0  # Index generation the candidates were retrieved at
+    turns: int = 1
+
+
+class ConversationStore:
+    """
+    Bounded LRU store of conversation states with a time-to-live.
+    """
+
+    def __init__(self, max_sessions: int = None, ttl_seconds: float = None):
+        """
+        Initialize an empty store.
+
+        Args:
+            max_sessions: Maximum number of sessions kept (defaults to settings.CONVERSATION_MAX_SESSIONS)
+            ttl_seconds: Idle time after which a session expires (defaults to settings.CONVERSATION_TTL_SECONDS)
+        """
+        self.max_sessions = max_sessions if max_sessions is not None else settings.CONVERSATION_MAX_SESSIONS
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.CONVERSATION_TTL_SECONDS
+        self._sessions = OrderedDict()
+        self._lock = Lock()
+        self.expired = 0
+        self.evicted = 0
+
+    def get(self, session_id: str) -> Optional[ConversationState]:
+        """Return the state of a session (or None if unknown or expired)."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._sessions[session_id]
+                self.expired += 1
+                return None
+            self._sessions.move_to_end(session_id)
+            return entry[1]
+
+    def put(self, session_id: str, state: ConversationState):
+        """Store a session's state, evicting the least recently used sessions beyond max_sessions."""
+        if self.max_sessions <= 0:
+            return
+        with self._lock:
+            self._sessions[session_id] = (time.monotonic() + self.ttl_seconds, state)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+
+    def delete(self, session_id: str) -> bool:
+        """Forget a session. Returns True if it existed."""
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        """Number of sessions, capacity and removal counters."""
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl_seconds,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
+
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    """Cosine similarity of two vectors (0.0 if either is zero)."""
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
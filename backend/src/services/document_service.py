@@ -1,15 +1,41 @@
-from typing import List
+import asyncio
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+from src.core.config import settings
 from src.core.logging_config import get_logger
 from src.core.exceptions import DocumentProcessingError, FileStorageError
+from src.core.metrics import INGEST_STAGE_SECONDS, ERRORS, timed
 
 logger = get_logger(__name__)
 
+# on_progress(file index, stage, error=None)
+ProgressCallback = Optional[Callable[..., None]]
+
+
+@dataclass
+class IngestJob:
+    """
+    One file moving through the ingestion pipeline.
+    Each stage fills in its output and drops what later stages no longer need.
+    """
+    index: int
+    file: Any
+    filename: str
+    file_path: Optional[str] = None
+    text: Optional[str] = None
+    chunks: List[dict] = field(default_factory=list)
+    embeddings: Optional[List[List[float]]] = None
+    write: Optional[Future] = None
+
+
 class DocumentService:
     """
     Orchestrates the document ingestion pipeline.
     """
     
-    def __init__(self, document_repo, vector_store_repo, parser, chunker, embedder):
+    def __init__(self, document_repo, vector_store_repo, parser, chunker, embedder, job_store=None):
         """
         Initialize with necessary repositories and utilities.
         
@@ -19,77 +45,318 @@ class DocumentService:
             parser: FileParser instance
             chunker: Chunker instance
             embedder: EmbeddingService instance
+            job_store: IngestJobStore tracking background ingestion jobs
         """
         self.document_repo = document_repo
         self.vector_store_repo = vector_store_repo
         self.parser = parser
         self.chunker = chunker
         self.embedder = embedder
+        self.job_store = job_store
 
-    async def ingest(self, files: List) -> dict:
+    async def ingest(self, files: List, on_progress: ProgressCallback = None) -> dict:
         """
-        Main logic for ingesting files:
+        Main logic for ingesting files, run as a pipeline of concurrent stages:
         1. Save file to disk (DocumentRepo).
         2. Parse text (Parser).
         3. Chunk text (Chunker).
         4. Generate embeddings (Embedder).
         5. Store vectors (VectorStoreRepo).
         
+        Stages are connected by bounded queues (settings.INGEST_QUEUE_SIZE), so
+        parsing file N+1 overlaps embedding file N and storing file N-1, while a
+        slow stage holds back the stages before it instead of letting parsed
+        files pile up in memory.
+        
+        The store stage only queues chunks in the vector store's write buffer,
+        which writes chunks of many files (and concurrent requests) together.
+        Once all files went through, the buffer is flushed and a file counts
+        as ingested when its chunks are committed; 'durable_at' in the result
+        is the time the last of them was. 'deduplication' counts the chunks
+        stored only as back-references to a near-duplicate and the estimated
+        bytes this saved.
+
         Args:
             files: List of UploadFile objects
+            on_progress: Called with (file index, stage, error) after each
+                stage of a file, with stage 'failed' or finally 'ingested'
             
         Returns:
             dict: Status message with ingestion results
         """
-        logger.info(f"Starting document ingestion for {len(files)} file(s)")
-        ingested_files = []
-        failed_files = []
+        logger.info("Starting document ingestion for %s file(s)", len(files))
+        jobs = [IngestJob(index=index, file=file, filename=file.filename) for index, file in enumerate(files)]
+        return await self._run_pipeline(jobs, len(files), on_progress)
+
+    async def start_ingest_job(self, files: List) -> dict:
+        """
+        Save uploads and ingest them in the background.
+        
+        The files are saved before returning, since uploads are only readable
+        during the request; parsing, chunking, embedding and storage continue
+        after the response. Progress is recorded in the job store.
         
-        for file in files:
+        Args:
+            files: List of UploadFile objects
+            
+        Returns:
+            dict: Initial job status (see IngestJobStore)
+        """
+        tracker = self.job_store.create([file.filename for file in files])
+        jobs, failed = [], []
+        for index, file in enumerate(files):
+            job = IngestJob(index=index, file=file, filename=file.filename)
             try:
-                logger.info(f"Processing file: {file.filename}")
-                
-                # 1. Save file
-                file_path = await self.document_repo.save_file(file)
-                logger.debug(f"File saved to: {file_path}")
-                
-                # 2. Parse text
-                text = self.parser.parse(file_path)
-                logger.debug(f"Text extracted. Length: {len(text)} characters")
-                
-                if not text or len(text.strip()) == 0:
-                    raise DocumentProcessingError(f"No text extracted from {file.filename}")
-                
-                # 3. Chunk text
-                chunks = self.chunker.chunk_text(
-                    text, 
-                    metadata={'filename': file.filename, 'source': file_path}
-                )
-                logger.debug(f"Text chunked into {len(chunks)} chunk(s)")
-                
-                # 4. Generate embeddings
-                chunk_texts = [chunk['text'] for chunk in chunks]
-                embeddings = self.embedder.embed_documents(chunk_texts)
-                logger.debug(f"Generated {len(embeddings)} embedding(s)")
-                
-                # 5. Store in vector database
-                metadatas = [chunk['metadata'] for chunk in chunks]
-                self.vector_store_repo.add_documents(chunk_texts, embeddings, metadatas)
-                logger.info(f"Successfully ingested: {file.filename}")
-                
-                ingested_files.append(file.filename)
-                
+                await self._save(job)
             except Exception as e:
-                logger.error(f"Failed to ingest {file.filename}: {str(e)}", exc_info=True)
-                failed_files.append({'filename': file.filename, 'error': str(e)})
+                ERRORS.labels(component="ingest").inc()
+                logger.error("Failed to save %s: %s", job.filename, e)
+                tracker.progress(index, "failed", str(e))
+                failed.append((index, {'filename': job.filename, 'error': str(e)}))
+                continue
+            job.file = None  # The upload is closed after the response
+            tracker.progress(index, "save")
+            jobs.append(job)
         
-        logger.info(f"Ingestion complete. Success: {len(ingested_files)}, Failed: {len(failed_files)}")
+        return self._launch_job(tracker, jobs, len(files), failed)
+
+    def start_stored_ingest_job(self, filename: str, file_path: str) -> dict:
+        """
+        Ingest a file already stored on disk (e.g. a completed resumable
+        upload) in the background.
+        
+        Args:
+            filename: Original file name
+            file_path: Path of the stored file
+            
+        Returns:
+            dict: Initial job status (see IngestJobStore)
+        """
+        tracker = self.job_store.create([filename])
+        tracker.progress(0, "save")
+        job = IngestJob(index=0, file=None, filename=filename, file_path=file_path)
+        return self._launch_job(tracker, [job], 1, [])
+
+    def _launch_job(self, tracker, jobs: List[IngestJob], total_files: int, failed: List[tuple]) -> dict:
+        """Start the background pipeline task of a job and return its initial status."""
+        logger.info("Ingestion job %s started for %s file(s)", tracker.job_id, total_files)
+        self.job_store.track(asyncio.create_task(self._run_job(tracker, jobs, total_files, failed)))
+        return tracker.snapshot()
+
+    async def _run_job(self, tracker, jobs: List[IngestJob], total_files: int, failed: List[tuple]):
+        """Run the pipeline of a background job and record its outcome."""
+        tracker.start()
+        heartbeat = asyncio.create_task(self._heartbeat(tracker))
+        try:
+            result = await self._run_pipeline(jobs, total_files, tracker.progress, failed)
+        except Exception as e:
+            ERRORS.labels(component="ingest").inc()
+            logger.error("Ingestion job %s failed: %s", tracker.job_id, e, exc_info=True)
+            tracker.fail(str(e))
+            return
+        finally:
+            heartbeat.cancel()
+        tracker.finish(result)
+
+    @staticmethod
+    async def _heartbeat(tracker):
+        """Rewrite a running job's status periodically, so pollers can tell it is alive."""
+        while True:
+            await asyncio.sleep(settings.INGEST_JOB_HEARTBEAT_SECONDS)
+            tracker.heartbeat()
+
+    async def _run_pipeline(self, jobs: List[IngestJob], total_files: int, on_progress: ProgressCallback = None,
+                            failed: List[tuple] = None) -> dict:
+        """
+        Run jobs through the stage pipeline and build the ingestion result.
+        Jobs that already have a file_path skip the save stage.
+        """
+        ingested: List[IngestJob] = []
+        failed = list(failed or [])
+        on_progress = on_progress or (lambda index, stage, error=None: None)
+
+        stages = [
+            ("save", self._save, 1),
+            ("parse", self._parse, settings.INGEST_PARSE_WORKERS),
+            ("chunk", self._chunk, 1),
+            ("embed", self._embed, settings.INGEST_EMBED_WORKERS),
+            ("store", self._store, settings.INGEST_STORE_WORKERS),
+        ]
+        stages = [(name, func, max(1, workers)) for name, func, workers in stages]
+        queues = [asyncio.Queue(maxsize=max(1, settings.INGEST_QUEUE_SIZE)) for _ in stages]
+
+        async def feed():
+            for job in jobs:
+                await queues[0].put(job)
+            for _ in range(stages[0][2]):
+                await queues[0].put(None)
+
+        def on_failure(job: IngestJob, error: Exception):
+            ERRORS.labels(component="ingest").inc()
+            logger.error("Failed to ingest %s: %s", job.filename, str(error), exc_info=True)
+            failed.append((job.index, {'filename': job.filename, 'error': str(error)}))
+            on_progress(job.index, "failed", str(error))
+
+        tasks = [asyncio.create_task(feed())]
+        for position, (name, func, workers) in enumerate(stages):
+            last = position == len(stages) - 1
+            tasks.append(asyncio.create_task(self._run_stage(
+                name,
+                func,
+                inbox=queues[position],
+                outbox=None if last else queues[position + 1],
+                workers=workers,
+                next_workers=0 if last else stages[position + 1][2],
+                on_failure=on_failure,
+                on_progress=on_progress,
+                on_done=ingested.append if last else None,
+            )))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        ingested, durable_at, deduplication = await self._wait_durable(ingested, on_failure)
+        for job in ingested:
+            on_progress(job.index, "ingested")
+        ingested_files = [job.filename for job in sorted(ingested, key=lambda job: job.index)]
+        failed_files = [entry for _, entry in sorted(failed, key=lambda item: item[0])]
+        logger.info("Ingestion complete. Success: %s, Failed: %s", len(ingested_files), len(failed_files))
         
         return {
             'status': 'success' if len(ingested_files) > 0 else 'failed',
             'files_ingested': ingested_files,
             'files_failed': failed_files,
-            'total_files': len(files),
+            'total_files': total_files,
             'success_count': len(ingested_files),
-            'failure_count': len(failed_files)
+            'failure_count': len(failed_files),
+            'durable_at': durable_at,
+            'deduplication': deduplication
         }
+
+    @staticmethod
+    async def _run_stage(name: str, func: Callable[[IngestJob], Awaitable[None]], inbox: asyncio.Queue,
+                         outbox: Optional[asyncio.Queue], workers: int, next_workers: int,
+                         on_failure: Callable[[IngestJob, Exception], None],
+                         on_progress: ProgressCallback,
+                         on_done: Callable[[IngestJob], None] = None):
+        """
+        Run one pipeline stage with `workers` concurrent workers.
+        
+        A failed job is reported and dropped while the others carry on. When
+        the inbox is closed (one None per worker) the stage closes its outbox
+        with one None per worker of the next stage.
+        
+        Args:
+            name: Stage name reported to on_progress
+            func: Coroutine processing a single job in place
+            inbox: Queue feeding this stage
+            outbox: Queue feeding the next stage (None for the last stage)
+            workers: Number of concurrent workers
+            next_workers: Number of workers of the next stage
+            on_failure: Called with (job, error) when func raises
+            on_progress: Called with (file index, stage name) when func succeeded
+            on_done: Called with each job leaving the last stage
+        """
+        async def worker():
+            while True:
+                job = await inbox.get()
+                if job is None:
+                    return
+                try:
+                    await func(job)
+                except Exception as e:
+                    on_failure(job, e)
+                    continue
+                on_progress(job.index, name)
+                if outbox is not None:
+                    # Blocks while the next stage is behind (backpressure)
+                    await outbox.put(job)
+                elif on_done is not None:
+                    on_done(job)
+
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        if outbox is not None:
+            for _ in range(next_workers):
+                await outbox.put(None)
+
+    async def _wait_durable(self, jobs: List[IngestJob], on_failure) -> Tuple[List[IngestJob], Optional[str], dict]:
+        """
+        Flush the write buffer and wait until every job's chunks are committed.
+        Jobs whose flush failed are reported through on_failure.
+        
+        Returns:
+            Tuple of (committed jobs, ISO timestamp of the last commit or None,
+            near-duplicate summary of the committed chunks)
+        """
+        deduplication = {'chunks': 0, 'stored_chunks': 0, 'duplicate_chunks': 0, 'clustered_chunks': 0, 'bytes_saved': 0}
+        if not jobs:
+            return [], None, deduplication
+        await asyncio.to_thread(self.vector_store_repo.flush_writes)
+        committed, durable_at = [], None
+        for job in jobs:
+            try:
+                receipt = await asyncio.wrap_future(job.write)
+            except Exception as e:
+                on_failure(job, e)
+                continue
+            committed.append(job)
+            durable_at = max(durable_at or 0.0, receipt['durable_at'])
+            deduplication['chunks'] += len(receipt['ids'])
+            deduplication['duplicate_chunks'] += len(receipt['duplicates'])
+            deduplication['clustered_chunks'] += len(receipt['clustered'])
+            deduplication['bytes_saved'] += receipt['bytes_saved']
+        deduplication['stored_chunks'] = deduplication['chunks'] - deduplication['duplicate_chunks']
+        if durable_at is None:
+            return committed, None, deduplication
+        return committed, datetime.fromtimestamp(durable_at, tz=timezone.utc).isoformat(), deduplication
+
+    async def _save(self, job: IngestJob):
+        """Stage 1: save the upload to disk (skipped for files saved earlier)."""
+        if job.file_path is not None:
+            return
+        logger.info("Processing file: %s", job.filename)
+        with timed(INGEST_STAGE_SECONDS, "save"):
+            job.file_path = await self.document_repo.save_file(job.file)
+        logger.debug("File saved to: %s", job.file_path)
+
+    async def _parse(self, job: IngestJob):
+        """Stage 2: extract text (images go through OCR)."""
+        parse_stage = "ocr" if self.parser.requires_ocr(job.file_path) else "parse"
+        with timed(INGEST_STAGE_SECONDS, parse_stage):
+            job.text = await asyncio.to_thread(self.parser.parse, job.file_path)
+        logger.debug("Text extracted. Length: %s characters", len(job.text or ""))
+        
+        if not job.text or len(job.text.strip()) == 0:
+            raise DocumentProcessingError(f"No text extracted from {job.filename}")
+
+    async def _chunk(self, job: IngestJob):
+        """Stage 3: split the text into chunks."""
+        with timed(INGEST_STAGE_SECONDS, "chunk"):
+            job.chunks = await asyncio.to_thread(
+                self.chunker.chunk_text,
+                job.text,
+                {'filename': job.filename, 'source': job.file_path}
+            )
+        job.text = None
+        logger.debug("Text chunked into %s chunk(s)", len(job.chunks))
+
+    async def _embed(self, job: IngestJob):
+        """Stage 4: embed the chunks."""
+        chunk_texts = [chunk['text'] for chunk in job.chunks]
+        with timed(INGEST_STAGE_SECONDS, "embed"):
+            job.embeddings = await asyncio.to_thread(self.embedder.embed_documents, chunk_texts)
+        logger.debug("Generated %s embedding(s)", len(job.embeddings))
+
+    async def _store(self, job: IngestJob):
+        """Stage 5: queue chunks and embeddings in the vector store's write buffer."""
+        chunk_texts = [chunk['text'] for chunk in job.chunks]
+        metadatas = [chunk['metadata'] for chunk in job.chunks]
+        with timed(INGEST_STAGE_SECONDS, "store"):
+            # Flushes in this thread when the buffer is full
+            job.write = await asyncio.to_thread(
+                self.vector_store_repo.buffer_documents, chunk_texts, job.embeddings, metadatas
+            )
+        job.chunks, job.embeddings = [], None
+        logger.info("Queued for storage: %s", job.filename)
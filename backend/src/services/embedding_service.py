@@ -1,8 +1,9 @@
-from sentence_transformers import SentenceTransformer
 from typing import List
 from src.core.config import settings
 from src.core.logging_config import get_logger
-from src.core.exceptions import EmbeddingError
+from src.core.exceptions import EmbeddingError, ConfigurationError, ServiceOverloadedError
+from src.core.admission import admission
+from src.utils.model_backends import load_sentence_transformer
 
 logger = get_logger(__name__)
 
@@ -11,38 +12,46 @@ class EmbeddingService:
     Handles generation of embeddings for text.
     """
     
-    def __init__(self, model_name=None):
+    def __init__(self, model_name=None, backend=None):
         """
         Initialize the embedding model.
         
         Args:
             model_name: Name of the HuggingFace model to use (defaults to settings)
+            backend: Inference backend - 'torch', 'onnx' or 'onnx-int8' (defaults to settings.INFERENCE_BACKEND)
         """
         model_name = model_name or settings.EMBEDDING_MODEL_NAME
-        logger.info(f"Loading embedding model: {model_name}")
+        logger.info("Loading embedding model: %s", model_name)
         try:
-            self.model = SentenceTransformer(model_name)
-            logger.info("Embedding model loaded successfully")
+            self.model_name = model_name
+            self.model, self.backend = load_sentence_transformer(model_name, backend)
+            logger.info("Embedding model loaded successfully (backend=%s)", self.backend)
+        except ConfigurationError:
+            raise
         except Exception as e:
-            logger.error(f"Failed to load embedding model: {e}")
+            logger.error("Failed to load embedding model: %s", e)
             raise EmbeddingError(f"Failed to load embedding model: {e}")
 
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+    def embed_documents(self, texts: List[str], batch_size: int = 32) -> List[List[float]]:
         """
         Generate embeddings for a list of texts.
         
         Args:
             texts: List of text strings
+            batch_size: Texts per forward pass (larger is faster for bulk loads)
             
         Returns:
             List of embedding vectors
         """
         try:
-            logger.debug(f"Generating embeddings for {len(texts)} text(s)")
-            embeddings = self.model.encode(texts, convert_to_numpy=True)
+            logger.debug("Generating embeddings for %s text(s)", len(texts))
+            with admission.slot("embedding"):
+                embeddings = self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
             return embeddings.tolist()
+        except ServiceOverloadedError:
+            raise
         except Exception as e:
-            logger.error(f"Failed to generate embeddings: {e}")
+            logger.error("Failed to generate embeddings: %s", e)
             raise EmbeddingError(f"Failed to generate embeddings: {e}")
 
     def embed_query(self, text: str) -> List[float]:
@@ -57,8 +66,32 @@ class EmbeddingService:
         """
         try:
             logger.debug("Generating query embedding")
-            embedding = self.model.encode(text, convert_to_numpy=True)
+            with admission.slot("embedding"):
+                embedding = self.model.encode(text, convert_to_numpy=True)
             return embedding.tolist()
+        except ServiceOverloadedError:
+            raise
         except Exception as e:
-            logger.error(f"Failed to generate query embedding: {e}")
+            logger.error("Failed to generate query embedding: %s", e)
             raise EmbeddingError(f"Failed to generate query embedding: {e}")
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for several query strings in one encode call.
+        
+        Args:
+            texts: Query texts
+            
+        Returns:
+            List of embedding vectors, in input order
+        """
+        try:
+            logger.debug("Generating %s query embedding(s)", len(texts))
+            with admission.slot("embedding"):
+                embeddings = self.model.encode(texts, convert_to_numpy=True)
+            return embeddings.tolist()
+        except ServiceOverloadedError:
+            raise
+        except Exception as e:
+            logger.error("Failed to generate query embeddings: %s", e)
+            raise EmbeddingError(f"Failed to generate query embeddings: {e}")
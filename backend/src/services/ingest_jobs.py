@@ -0,0 +1,211 @@
+"""
+Status of background ingestion jobs.
+
+A job runs in the worker process that accepted it, but its status is
+written to one JSON file per job, so a poll reaching any worker process can
+answer it. While the job runs its status is rewritten at least every
+settings.INGEST_JOB_HEARTBEAT_SECONDS; an unfinished job whose file has not
+been updated for settings.INGEST_JOB_STALE_SECONDS (e.g. because its worker
+process was restarted) is reported as interrupted.
+"""
+import json
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, List, Optional
+from src.core.config import settings
+from src.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# Job states that are only ever left by the process running the job
+UNFINISHED_STATES = ("queued", "running")
+
+
+class IngestJobTracker:
+    """
+    Live status of one ingestion job, owned by the process running it.
+
+    Each file's 'stage' is the last stage it finished: pending, save, parse,
+    chunk, embed, store, then ingested once its chunks are committed. Its
+    'status' is pending, processing, ingested or failed.
+    """
+
+    def __init__(self, store: "IngestJobStore", job_id: str, filenames: List[str]):
+        self.store = store
+        self.job_id = job_id
+        now = time.time()
+        self._status = {
+            "job_id": job_id,
+            "status": "queued",
+            "created_at": now,
+            "updated_at": now,
+            "total_files": len(filenames),
+            "completed_files": 0,
+            "files": [
+                {"filename": filename, "status": "pending", "stage": "pending", "error": None}
+                for filename in filenames
+            ],
+            "result": None,
+            "error": None,
+        }
+        self._lock = Lock()
+        self._last_write = 0.0
+        self._write(force=True)
+
+    def progress(self, index: int, stage: str, error: str = None):
+        """
+        Record that file `index` finished `stage` ('failed' with an error, or 'ingested').
+        """
+        with self._lock:
+            entry = self._status["files"][index]
+            if stage == "failed":
+                entry["status"] = "failed"
+                entry["error"] = error
+                self._status["completed_files"] += 1
+            elif stage == "ingested":
+                entry["status"] = "ingested"
+                entry["stage"] = stage
+                self._status["completed_files"] += 1
+            else:
+                entry["status"] = "processing"
+                entry["stage"] = stage
+        self._write(force=stage in ("failed", "ingested"))
+
+    def start(self):
+        with self._lock:
+            self._status["status"] = "running"
+        self._write(force=True)
+
+    def finish(self, result: Dict[str, Any]):
+        with self._lock:
+            self._status["status"] = "completed"
+            self._status["result"] = result
+        self._write(force=True)
+        logger.info("Ingestion job %s completed: %s ingested, %s failed",
+                    self.job_id, result["success_count"], result["failure_count"])
+
+    def fail(self, error: str):
+        with self._lock:
+            self._status["status"] = "failed"
+            self._status["error"] = error
+        self._write(force=True)
+
+    def heartbeat(self):
+        """Rewrite the status (with pending stage updates) to show the job is alive."""
+        self._write(force=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Copy of the current status."""
+        with self._lock:
+            return json.loads(json.dumps(self._status))
+
+    def _write(self, force: bool = False):
+        # Intermediate stage updates are throttled; final states are always written
+        now = time.monotonic()
+        if not force and now - self._last_write < settings.INGEST_JOB_STATUS_WRITE_INTERVAL_SECONDS:
+            return
+        self._last_write = now
+        with self._lock:
+            self._status["updated_at"] = time.time()
+            payload = json.dumps(self._status, ensure_ascii=False)
+        try:
+            self.store.write(self.job_id, payload)
+        except OSError as e:
+            logger.warning("Could not write status of ingestion job %s: %s", self.job_id, e)
+
+
+class IngestJobStore:
+    """
+    Creates job trackers and reads job status from disk.
+    """
+
+    def __init__(self, directory: str = None, ttl_seconds: float = None, stale_seconds: float = None):
+        """
+        Args:
+            directory: Directory of the job status files (defaults to settings.INGEST_JOB_DIR)
+            ttl_seconds: Age after which finished job files are removed (defaults to settings.INGEST_JOB_TTL_SECONDS)
+            stale_seconds: Age after which unfinished jobs count as interrupted (defaults to settings.INGEST_JOB_STALE_SECONDS)
+        """
+        self.directory = Path(directory or settings.INGEST_JOB_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.INGEST_JOB_TTL_SECONDS
+        self.stale_seconds = stale_seconds if stale_seconds is not None else settings.INGEST_JOB_STALE_SECONDS
+        # Strong references to running job tasks (the event loop only keeps weak ones)
+        self._tasks = set()
+
+    def create(self, filenames: List[str]) -> IngestJobTracker:
+        """
+        Start tracking a new job.
+
+        Args:
+            filenames: Names of the files in the job
+
+        Returns:
+            IngestJobTracker for the job
+        """
+        self.cleanup()
+        return IngestJobTracker(self, uuid.uuid4().hex, filenames)
+
+    def track(self, task):
+        """Keep a running job task alive until it finishes."""
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Read the status of a job.
+
+        Args:
+            job_id: Job ID
+
+        Returns:
+            dict: Job status, or None if the job is unknown or expired
+        """
+        if not JOB_ID_PATTERN.match(job_id):
+            return None
+        try:
+            job = json.loads(self._path(job_id).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            logger.warning("Unreadable status file for ingestion job %s", job_id)
+            return None
+        if job["status"] in UNFINISHED_STATES and time.time() - job["updated_at"] > self.stale_seconds:
+            # The process running the job stopped writing its heartbeat
+            job["status"] = "interrupted"
+            job["error"] = f"No progress reported for {self.stale_seconds:g}s; the worker running the job stopped"
+        return job
+
+    def write(self, job_id: str, payload: str):
+        """Atomically replace the status file of a job."""
+        path = self._path(job_id)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(payload, encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def cleanup(self) -> int:
+        """
+        Remove status files not updated for ttl_seconds.
+
+        Returns:
+            int: Number of files removed
+        """
+        cutoff = time.time() - self.ttl_seconds
+        removed = 0
+        for path in self.directory.glob("*.json"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+    def _path(self, job_id: str) -> Path:
+        return self.directory / f"{job_id}.json"
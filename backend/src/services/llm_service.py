@@ -0,0 +1,396 @@
+import asyncio
+import time
+from collections import deque
+from threading import Lock
+from typing import Any, AsyncIterator, Dict, Optional
+from src.core.config import settings
+from src.core.logging_config import get_logger
+from src.core.exceptions import LLMTimeoutError, LLMUnavailableError
+from src.core.admission import admission
+
+logger = get_logger(__name__)
+
+
+class LatencyTracker:
+    """
+    Sliding window of recent call latencies used to derive the hedging delay.
+    """
+
+    def __init__(self, window: int = None):
+        """
+        Args:
+            window: Number of recent samples kept (defaults to settings.LLM_LATENCY_WINDOW)
+        """
+        self._samples = deque(maxlen=window or settings.LLM_LATENCY_WINDOW)
+        self._lock = Lock()
+
+    def record(self, seconds: float):
+        """
+        Add a sample. Calls that ran into their full timeout are recorded at
+        the timeout, so the percentiles include the slow tail.
+        """
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        Return the p-th percentile (0-100) of the recorded latencies, or None without samples.
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(p / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+    Opens after `failure_threshold` failures in a row, rejects calls for
+    `reset_seconds`, then lets a single trial call through (half-open).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = None, reset_seconds: float = None):
+        """
+        Args:
+            failure_threshold: Failures before opening (defaults to settings.LLM_CIRCUIT_FAILURE_THRESHOLD)
+            reset_seconds: Open duration before a trial call (defaults to settings.LLM_CIRCUIT_RESET_SECONDS)
+        """
+        self.failure_threshold = failure_threshold or settings.LLM_CIRCUIT_FAILURE_THRESHOLD
+        self.reset_seconds = reset_seconds or settings.LLM_CIRCUIT_RESET_SECONDS
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        """Whether a call to the protected dependency may be attempted."""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = self.HALF_OPEN
+            self._trial_in_flight = False
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+        return self.state == self.CLOSED
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning("LLM circuit breaker opened after %s failure(s)", self.failures)
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+def build_llm(model: str, max_output_tokens: int = None):
+    """
+    Create a Gemini chat model with the configured timeout and retry policy.
+    When settings.GOOGLE_API_ENDPOINT is set, requests go to that endpoint over
+    REST (e.g. a local stub server) instead of the Google API.
+
+    Args:
+        model: Gemini model name
+        max_output_tokens: Answer length cap (None for the model default)
+
+    Returns:
+        ChatGoogleGenerativeAI instance
+    """
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    kwargs = {}
+    if settings.GOOGLE_API_ENDPOINT:
+        kwargs["client_options"] = {"api_endpoint": settings.GOOGLE_API_ENDPOINT}
+        kwargs["transport"] = "rest"
+    if max_output_tokens:
+        kwargs["max_output_tokens"] = max_output_tokens
+    return ChatGoogleGenerativeAI(
+        model=model,
+        temperature=settings.LLM_TEMPERATURE,
+        google_api_key=settings.GOOGLE_API_KEY,
+        timeout=settings.LLM_TIMEOUT_SECONDS,
+        max_retries=settings.LLM_MAX_RETRIES,
+        **kwargs,
+    )
+
+
+class LLMService:
+    """
+    Latency-controlled access to the answer-generation LLM.
+
+    Chains are built once. Each call gets a deadline; slow primary calls are
+    hedged with a second request after the observed p95 latency; failures,
+    timeouts and an open circuit breaker divert to the fallback model.
+    """
+
+    def __init__(self, prompt, model: str = None, fallback_model: str = None):
+        """
+        Build the primary and fallback chains.
+
+        Args:
+            prompt: ChatPromptTemplate producing the LLM input
+            model: Primary Gemini model (defaults to settings.LLM_MODEL)
+            fallback_model: Faster fallback model (defaults to settings.LLM_FALLBACK_MODEL, empty disables)
+        """
+        self.prompt = prompt
+        self.model = model or settings.LLM_MODEL
+        self.fallback_model = fallback_model if fallback_model is not None else settings.LLM_FALLBACK_MODEL
+        if self.fallback_model == self.model:
+            self.fallback_model = ""
+
+        logger.info("Initializing LLM: %s", self.model)
+        if self.fallback_model:
+            logger.info("Initializing fallback LLM: %s", self.fallback_model)
+        # Chains by answer length cap (None = uncapped), capped ones built on first use
+        self._chains = {None: self._build_chains(None)}
+        self.primary_chain, self.fallback_chain = self._chains[None]
+
+        self.latency = LatencyTracker()
+        self.breaker = CircuitBreaker()
+        self.calls = 0
+        self.hedges_sent = 0
+        self.hedge_wins = 0
+        self.fallbacks = 0
+        self.timeouts = 0
+        self.failures = 0
+
+    def hedge_delay(self) -> float:
+        """
+        Delay before a hedged second request is sent.
+        Uses the observed p95 latency once enough samples exist.
+        """
+        if len(self.latency) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return settings.LLM_HEDGE_DELAY_SECONDS
+        return max(settings.LLM_HEDGE_MIN_DELAY_SECONDS, self.latency.percentile(95))
+
+    async def ainvoke(self, inputs: Dict[str, Any], timeout: float = None, max_output_tokens: int = None,
+                      deadline: float = None) -> str:
+        """
+        Generate a complete answer.
+
+        Args:
+            inputs: Prompt variables
+            timeout: Deadline for the primary model in seconds (defaults to settings.LLM_TIMEOUT_SECONDS)
+            max_output_tokens: Answer length cap (None for the model default)
+            deadline: time.monotonic() by which the primary and any fallback
+                call must have answered, e.g. the end of the request's time budget
+
+        Returns:
+            str: Generated answer
+        """
+        async with admission.aslot("llm"):
+            return await self._invoke(inputs, timeout, self._chains_for(max_output_tokens), deadline)
+
+    async def astream(self, inputs: Dict[str, Any], timeout: float = None, max_output_tokens: int = None,
+                      deadline: float = None) -> AsyncIterator[str]:
+        """
+        Stream the answer as text pieces.
+        The deadline applies to the first token; the fallback model is used
+        only if the primary fails before producing any output.
+        The LLM slot is held until the stream ends.
+
+        Args:
+            inputs: Prompt variables
+            timeout: First-token deadline in seconds (defaults to settings.LLM_TIMEOUT_SECONDS)
+            max_output_tokens: Answer length cap (None for the model default)
+            deadline: time.monotonic() by which the primary or fallback model
+                must have produced its first token
+
+        Yields:
+            str: Pieces of the generated answer
+        """
+        async with admission.aslot("llm"):
+            async for text in self._stream(inputs, timeout, self._chains_for(max_output_tokens), deadline):
+                yield text
+
+    def _build_chains(self, max_output_tokens: Optional[int]):
+        """Primary and fallback (None when disabled) chains with an answer length cap."""
+        from langchain_core.output_parsers import StrOutputParser
+        primary = self.prompt | build_llm(self.model, max_output_tokens) | StrOutputParser()
+        fallback = None
+        if self.fallback_model:
+            fallback = self.prompt | build_llm(self.fallback_model, max_output_tokens) | StrOutputParser()
+        return primary, fallback
+
+    def _chains_for(self, max_output_tokens: Optional[int]):
+        chains = self._chains.get(max_output_tokens)
+        if chains is None:
+            chains = self._chains[max_output_tokens] = self._build_chains(max_output_tokens)
+        return chains
+
+    @staticmethod
+    def _bounded(timeout: float, deadline: Optional[float]) -> float:
+        """Timeout shortened to the time left before deadline (<= 0 once it passed)."""
+        if deadline is None:
+            return timeout
+        return min(timeout, deadline - time.monotonic())
+
+    async def _invoke(self, inputs: Dict[str, Any], timeout: float, chains, deadline: float = None) -> str:
+        primary_chain, fallback_chain = chains
+        self.calls += 1
+        configured_timeout = timeout or settings.LLM_TIMEOUT_SECONDS
+        timeout = self._bounded(configured_timeout, deadline)
+        if timeout <= 0:
+            raise LLMTimeoutError(f"No time left to call {self.model}")
+        primary_error = None
+
+        if self.breaker.allow():
+            started = time.monotonic()
+            try:
+                response = await asyncio.wait_for(self._hedged_invoke(inputs, primary_chain), timeout=timeout)
+                self.breaker.record_success()
+                self.latency.record(time.monotonic() - started)
+                return response
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                primary_error = LLMTimeoutError(f"{self.model} did not answer within {timeout:.1f}s")
+                if timeout >= configured_timeout:
+                    # Censored sample: the call took at least the full timeout. Timeouts cut
+                    # short by the request deadline and fast errors say nothing about the tail.
+                    self.latency.record(configured_timeout)
+            except Exception as e:
+                self.failures += 1
+                primary_error = e
+            self.breaker.record_failure()
+            logger.warning("Primary LLM call failed: %s", primary_error)
+        else:
+            primary_error = LLMUnavailableError(f"Circuit breaker open for {self.model}")
+
+        return await self._fallback_invoke(inputs, primary_error, fallback_chain, deadline)
+
+    async def _stream(self, inputs: Dict[str, Any], timeout: float, chains, deadline: float = None) -> AsyncIterator[str]:
+        primary_chain, fallback_chain = chains
+        self.calls += 1
+        timeout = self._bounded(timeout or settings.LLM_TIMEOUT_SECONDS, deadline)
+        if timeout <= 0:
+            raise LLMTimeoutError(f"No time left to call {self.model}")
+        primary_error = None
+
+        if self.breaker.allow():
+            stream = primary_chain.astream(inputs).__aiter__()
+            try:
+                first = await asyncio.wait_for(stream.__anext__(), timeout=timeout)
+            except StopAsyncIteration:
+                self.breaker.record_success()
+                return
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                primary_error = LLMTimeoutError(f"{self.model} produced no output within {timeout:.1f}s")
+            except Exception as e:
+                self.failures += 1
+                primary_error = e
+
+            if primary_error is None:
+                yield first
+                async for text in stream:
+                    yield text
+                self.breaker.record_success()
+                return
+
+            await self._close(stream)
+            self.breaker.record_failure()
+            logger.warning("Primary LLM stream failed: %s", primary_error)
+        else:
+            primary_error = LLMUnavailableError(f"Circuit breaker open for {self.model}")
+
+        fallback_timeout = self._bounded(settings.LLM_FALLBACK_TIMEOUT_SECONDS, deadline)
+        if fallback_chain is None or fallback_timeout <= 0:
+            raise primary_error
+        self.fallbacks += 1
+        logger.info("Streaming from fallback LLM %s", self.fallback_model)
+        stream = fallback_chain.astream(inputs).__aiter__()
+        try:
+            first = await asyncio.wait_for(stream.__anext__(), timeout=fallback_timeout)
+        except StopAsyncIteration:
+            return
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            await self._close(stream)
+            raise LLMTimeoutError(f"Fallback {self.fallback_model} produced no output within {fallback_timeout:.1f}s")
+        yield first
+        async for text in stream:
+            yield text
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        LLM call statistics (hedging, fallbacks, timeouts, breaker state, latency).
+        """
+        return {
+            "model": self.model,
+            "fallback_model": self.fallback_model if self.fallback_chain is not None else None,
+            "calls": self.calls,
+            "hedges_sent": self.hedges_sent,
+            "hedge_wins": self.hedge_wins,
+            "fallbacks": self.fallbacks,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "circuit_state": self.breaker.state,
+            "hedge_delay_seconds": self.hedge_delay(),
+            "latency_p50_seconds": self.latency.percentile(50),
+            "latency_p95_seconds": self.latency.percentile(95),
+        }
+
+    async def _hedged_invoke(self, inputs: Dict[str, Any], primary_chain) -> str:
+        """Invoke the primary chain, sending a second request if the first is slow."""
+        first = asyncio.ensure_future(primary_chain.ainvoke(inputs))
+        pending = {first}
+        try:
+            if not settings.LLM_HEDGE_ENABLED:
+                return await first
+
+            done, _ = await asyncio.wait(pending, timeout=self.hedge_delay())
+            if not done:
+                self.hedges_sent += 1
+                logger.debug("Hedging LLM request after %.2fs", self.hedge_delay())
+                pending.add(asyncio.ensure_future(primary_chain.ainvoke(inputs)))
+
+            last_error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _fallback_invoke(self, inputs: Dict[str, Any], primary_error: Exception, fallback_chain,
+                               deadline: float = None) -> str:
+        timeout = self._bounded(settings.LLM_FALLBACK_TIMEOUT_SECONDS, deadline)
+        if fallback_chain is None or timeout <= 0:
+            # No fallback, or no time left for one
+            raise primary_error
+        self.fallbacks += 1
+        logger.info("Falling back to LLM %s", self.fallback_model)
+        try:
+            return await asyncio.wait_for(fallback_chain.ainvoke(inputs), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise LLMTimeoutError(f"Fallback {self.fallback_model} did not answer within {timeout:.1f}s")
+
+    @staticmethod
+    async def _close(stream):
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            try:
+                await aclose()
+            except Exception:
+                pass
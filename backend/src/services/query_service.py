@@ -1,20 +1,33 @@
-from typing import List, Dict, Any
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+import asyncio
+import logging
+import time
+from threading import Lock
+from typing import List, Dict, Any, AsyncIterator, Optional
+from src.core.admission import admission
 from src.core.config import settings
+from src.core.context_builder import ContextBuilder
+from src.core.metrics import QUERY_STAGE_SECONDS, QUERY_DEGRADATIONS, ERRORS, timed, observe_stage
 from src.core.logging_config import get_logger
-from src.core.exceptions import QueryError, ConfigurationError
+from src.core.exceptions import QueryError, ConfigurationError, ServiceOverloadedError
+from src.core.request_context import get_budget
+from src.repositories.vector_store_repo import source_filenames
+from src.services.conversation_store import ConversationStore, ConversationState, cosine_similarity
+from src.services.llm_service import LLMService
+from src.utils.single_flight import SingleFlight
+from src.utils.text_normalization import normalize_query
 
 logger = get_logger(__name__)
 
+NO_RESULTS_RESPONSE = "I couldn't find any relevant information in the documents to answer your question."
+
 
 class QueryService:
     """
     Orchestrates the retrieval and generation pipeline.
     """
 
-    def __init__(self, vector_store_repo, embedder, reranker):
+    def __init__(self, vector_store_repo, embedder, reranker, context_builder=None, single_flight=None, llm_service=None,
+                 conversation_store=None):
         """
         Initialize with repositories and clients.
 
@@ -22,10 +35,19 @@ class QueryService:
             vector_store_repo: VectorStoreRepository instance
             embedder: EmbeddingService instance
             reranker: Reranker instance
+            context_builder: ContextBuilder instance (defaults to one built from settings)
+            single_flight: SingleFlight used to coalesce identical in-flight queries
+            llm_service: LLMService instance (defaults to one built from settings)
+            conversation_store: ConversationStore holding chat sessions (defaults to one built from settings)
         """
         self.vector_store_repo = vector_store_repo
         self.embedder = embedder
         self.reranker = reranker
+        self.context_builder = context_builder or ContextBuilder()
+        self.single_flight = single_flight or SingleFlight()
+        self.conversations = conversation_store or ConversationStore()
+        self.retrieval_modes = {"full": 0, "followup": 0}
+        self._retrieval_modes_lock = Lock()  # Retrievals run on admission pool threads
 
         # Initialize LLM (Gemini)
         if not settings.GOOGLE_API_KEY:
@@ -34,14 +56,8 @@ class QueryService:
                 "GOOGLE_API_KEY not found in environment variables"
             )
 
-        logger.info(f"Initializing LLM: {settings.LLM_MODEL}")
-        self.llm = ChatGoogleGenerativeAI(
-            model=settings.LLM_MODEL,
-            temperature=settings.LLM_TEMPERATURE,
-            google_api_key=settings.GOOGLE_API_KEY,
-        )
-
         # Define RAG Prompt
+        from langchain_core.prompts import ChatPromptTemplate
         self.prompt = ChatPromptTemplate.from_template("""
   You are a helpful legal assistant and advocate of Bangladesh Court. Use the provided context to answer the user's legal question when it is relevant and reliable.
 - Prefer the provided context for facts that are directly supported by it.
@@ -57,7 +73,174 @@ Answer:
 
         """)
 
-    async def query(self, query_text: str) -> Dict[str, Any]:
+        # LLM with deadlines, hedging and fallback; chains are built once
+        self.llm_service = llm_service or LLMService(self.prompt)
+
+        # Bounds the LLM calls of all running batches together
+        self.batch_semaphore = asyncio.Semaphore(settings.QUERY_BATCH_CONCURRENCY)
+
+    async def query(self, query_text: str, session_id: str = None) -> Dict[str, Any]:
+        """
+        Answer a query, coalescing identical in-flight queries.
+        Concurrent requests with the same normalized text and time budget
+        share one pipeline run. Queries of a chat session are not coalesced,
+        since their retrieval depends on the session's previous turns.
+
+        Args:
+            query_text: User's question
+            session_id: Chat session the question belongs to (None for a standalone question)
+
+        Returns:
+            Dict with 'response', 'sources' and the retrieved 'chunk_ids'
+        """
+        if session_id:
+            return await self._run_query(query_text, session_id)
+        return await self.single_flight.do(self._coalescing_key(query_text), lambda: self._run_query(query_text))
+
+    async def query_stream(self, query_text: str, session_id: str = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Answer a query as a stream of events, coalescing identical in-flight queries.
+        Subscribers joining a running stream receive every event from the start.
+
+        Events:
+            {"type": "sources", "sources": [...], "chunk_ids": [...]} once retrieval finished
+            {"type": "token", "text": "..."} for each generated piece of text
+            {"type": "done"} at the end
+
+        Args:
+            query_text: User's question
+            session_id: Chat session the question belongs to (None for a standalone question)
+
+        Yields:
+            Event dicts
+        """
+        if session_id:
+            async for event in self._run_query_stream(query_text, session_id):
+                yield event
+            return
+        async for event in self.single_flight.stream(self._coalescing_key(query_text),
+                                                     lambda: self._run_query_stream(query_text)):
+            yield event
+
+    async def query_batch(self, questions: List[str]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Answer many questions, yielding each result as soon as it is ready.
+
+        Questions are retrieved in groups of settings.QUERY_BATCH_RETRIEVAL_SIZE:
+        one embedding call, one vector store query and one re-ranking pass per
+        group. Answers are generated concurrently, at most
+        settings.QUERY_BATCH_CONCURRENCY LLM calls at a time, while the next
+        group is being retrieved. Identical questions are answered once.
+
+        Events:
+            {"type": "result", "index": i, "query": ..., "response": ..., "sources": [...]}
+            {"type": "error", "index": i, "query": ..., "message": ...} for a failed question
+            {"type": "done", "total": n, "failed": f} at the end
+
+        Args:
+            questions: User questions
+
+        Yields:
+            Event dicts, in completion order
+        """
+        positions: Dict[str, List[int]] = {}
+        unique = []
+        for index, question in enumerate(questions):
+            key = normalize_query(question)
+            if key not in positions:
+                positions[key] = []
+                unique.append(question)
+            positions[key].append(index)
+
+        logger.info("Processing batch of %s question(s) (%s unique)", len(questions), len(unique))
+        completed: asyncio.Queue = asyncio.Queue()
+        tasks = []
+
+        async def answer(question: str, retrieval: Dict[str, Any]):
+            try:
+                if retrieval["context"] is None:
+                    response = NO_RESULTS_RESPONSE
+                else:
+                    async with self.batch_semaphore:
+                        with timed(QUERY_STAGE_SECONDS, "llm"):
+                            response = await self.llm_service.ainvoke({"context": retrieval["context"], "question": question})
+                await completed.put((question, {"type": "result", "response": response, "sources": retrieval["sources"]}))
+            except Exception as e:
+                ERRORS.labels(component="query").inc()
+                logger.error("Batch question failed: %s", e)
+                await completed.put((question, {"type": "error", "message": str(e)}))
+
+        async def retrieve_groups():
+            group_size = max(1, settings.QUERY_BATCH_RETRIEVAL_SIZE)
+            for start in range(0, len(unique), group_size):
+                group = unique[start:start + group_size]
+                try:
+                    with timed(QUERY_STAGE_SECONDS, "retrieval"):
+                        retrievals = await asyncio.to_thread(self._retrieve_batch, group)
+                except Exception as e:
+                    ERRORS.labels(component="query").inc()
+                    logger.error("Batch retrieval failed: %s", e, exc_info=True)
+                    for question in group:
+                        await completed.put((question, {"type": "error", "message": f"Retrieval failed: {e}"}))
+                    continue
+                for question, retrieval in zip(group, retrievals):
+                    tasks.append(asyncio.create_task(answer(question, retrieval)))
+
+        tasks.append(asyncio.create_task(retrieve_groups()))
+        failed = 0
+        try:
+            for _ in range(len(unique)):
+                question, event = await completed.get()
+                for index in positions[normalize_query(question)]:
+                    if event["type"] == "error":
+                        failed += 1
+                    yield dict(event, index=index, query=questions[index])
+            logger.info("Batch processed: %s question(s), %s failed", len(questions), failed)
+            yield {"type": "done", "total": len(questions), "failed": failed}
+        finally:
+            # The client went away (or everything finished): stop outstanding work
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    def _coalescing_key(query_text: str) -> str:
+        """
+        Single-flight key of a standalone query. Requests only share a run
+        with requests of the same time budget: a later arrival with the same
+        budget has a later deadline, so the first request's degradations and
+        deadline never shortchange it.
+        """
+        key = normalize_query(query_text)
+        budget = get_budget()
+        return key if budget is None else f"{key}\x00budget={budget.seconds:g}"
+
+    def coalescing_stats(self) -> Dict[str, Any]:
+        """
+        Request coalescing statistics (leaders, coalesced requests, ratio).
+        """
+        return self.single_flight.stats()
+
+    def conversation_stats(self) -> Dict[str, Any]:
+        """
+        Chat session statistics (live sessions, expirations, retrievals by mode).
+        """
+        with self._retrieval_modes_lock:
+            retrievals = dict(self.retrieval_modes)
+        return {**self.conversations.stats(), "retrievals": retrievals}
+
+    def end_session(self, session_id: str) -> bool:
+        """
+        Forget the conversation state of a chat session.
+
+        Args:
+            session_id: Chat session ID
+
+        Returns:
+            bool: True if the session existed
+        """
+        return self.conversations.delete(session_id)
+
+    async def _run_query(self, query_text: str, session_id: str = None) -> Dict[str, Any]:
         """
         Main logic for answering queries:
         1. Generate query embedding (Embedder).
@@ -67,77 +250,413 @@ Answer:
 
         Args:
             query_text: User's question
+            session_id: Chat session the question belongs to (None for a standalone question)
 
         Returns:
             Dict with 'response' and 'sources'
         """
-        logger.info(f"Processing query: {query_text[:100]}...")
+        logger.info("Processing query: %s...", query_text[:100])
 
         try:
-            # 1. Generate embedding
-            logger.debug("Generating query embedding")
-            query_embedding = self.embedder.embed_query(query_text)
-
-            # 2. Retrieve relevant chunks using HYBRID SEARCH (BM25 + Vector)
-            # Retrieve more candidates (2x) for re-ranking
-            initial_k = settings.TOP_K_RESULTS * 2
-            logger.debug(f"Performing hybrid search (top_k={initial_k}, alpha={settings.HYBRID_SEARCH_ALPHA})")
-            
-            search_results = self.vector_store_repo.hybrid_search(
-                query_embedding=query_embedding,
-                query_text=query_text,
-                k=initial_k,
-                alpha=settings.HYBRID_SEARCH_ALPHA,
-            )
-
-            documents = search_results["documents"]
-            metadatas = search_results["metadatas"]
-
-            if not documents:
-                logger.warning("No relevant documents found in vector store")
+            with timed(QUERY_STAGE_SECONDS, "retrieval"):
+                # On the admission thread pool: model stages may wait for a slot
+                if session_id:
+                    retrieval = await admission.run(self._retrieve_in_session, query_text, session_id)
+                else:
+                    retrieval = await admission.run(self._retrieve, query_text)
+            if retrieval["context"] is None:
                 return {
-                    "response": "I couldn't find any relevant information in the documents to answer your question.",
+                    "response": NO_RESULTS_RESPONSE,
                     "sources": [],
+                    "chunk_ids": [],
                     "context_used": [],
+                    "degradations": self._degradations(),
+                    "debug": retrieval["debug"],
                 }
 
-            # 3. Re-ranking
-            logger.debug(f"Re-ranking {len(documents)} documents")
-            reranked_results = self.reranker.rerank(
-                query=query_text,
-                documents=documents,
-                top_k=settings.TOP_K_RESULTS
-            )
-            
-            # Extract re-ranked docs and metadatas
-            ranked_docs = []
-            ranked_metadatas = []
-            
-            for doc_text, score, original_idx in reranked_results:
-                ranked_docs.append(doc_text)
-                ranked_metadatas.append(metadatas[original_idx])
-            
-            logger.debug(f"Selected top {len(ranked_docs)} documents after re-ranking")
-
-            # Format context
-            context = "\n\n".join(ranked_docs)
-
             # 4. Generate answer
             logger.debug("Generating LLM response")
-            chain = self.prompt | self.llm | StrOutputParser()
-            response = await chain.ainvoke({"context": context, "question": query_text})
+            with timed(QUERY_STAGE_SECONDS, "llm"):
+                response = await self.llm_service.ainvoke(
+                    {"context": retrieval["context"], "question": retrieval.get("question", query_text)},
+                    max_output_tokens=self._generation_cap(),
+                    deadline=self._llm_deadline(),
+                )
 
-            # Extract unique sources
-            sources = list(set([m.get("filename", "Unknown") for m in ranked_metadatas]))
-
-            logger.info(f"Query processed successfully. Sources: {sources}")
+            logger.info("Query processed successfully. Sources: %s", retrieval['sources'])
 
             return {
                 "response": response,
-                "sources": sources,
-                "context_used": ranked_docs,
+                "sources": retrieval["sources"],
+                "chunk_ids": _chunk_ids(retrieval),
+                "context_used": retrieval["ranked_docs"],
+                "degradations": self._degradations(),
+                "debug": retrieval["debug"],
             }
 
+        except (QueryError, ServiceOverloadedError):
+            ERRORS.labels(component="query").inc()
+            raise
         except Exception as e:
-            logger.error(f"Query processing failed: {str(e)}", exc_info=True)
+            ERRORS.labels(component="query").inc()
+            logger.error("Query processing failed: %s", str(e), exc_info=True)
             raise QueryError(f"Failed to process query: {str(e)}")
+
+    async def _run_query_stream(self, query_text: str, session_id: str = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of _run_query, yielding sources first and then answer tokens.
+        """
+        logger.info("Processing streaming query: %s...", query_text[:100])
+
+        try:
+            with timed(QUERY_STAGE_SECONDS, "retrieval"):
+                # On the admission thread pool: model stages may wait for a slot
+                if session_id:
+                    retrieval = await admission.run(self._retrieve_in_session, query_text, session_id)
+                else:
+                    retrieval = await admission.run(self._retrieve, query_text)
+            if retrieval["context"] is None:
+                yield {"type": "sources", "sources": [], "chunk_ids": []}
+                yield {"type": "token", "text": NO_RESULTS_RESPONSE}
+                yield {"type": "done", "degradations": self._degradations()}
+                return
+
+            yield {"type": "sources", "sources": retrieval["sources"], "chunk_ids": _chunk_ids(retrieval)}
+
+            logger.debug("Streaming LLM response")
+            llm_started = time.perf_counter()
+            async for text in self.llm_service.astream(
+                {"context": retrieval["context"], "question": retrieval.get("question", query_text)},
+                max_output_tokens=self._generation_cap(),
+                deadline=self._llm_deadline(),
+            ):
+                if text:
+                    yield {"type": "token", "text": text}
+                if not self._within_budget("truncated_generation", 0):
+                    # Out of time: end the answer here (closing the stream frees the LLM slot)
+                    break
+
+            observe_stage(QUERY_STAGE_SECONDS, "llm", time.perf_counter() - llm_started)
+            logger.info("Streaming query processed successfully. Sources: %s", retrieval['sources'])
+            yield {"type": "done", "degradations": self._degradations()}
+
+        except (QueryError, ServiceOverloadedError):
+            ERRORS.labels(component="query").inc()
+            raise
+        except Exception as e:
+            ERRORS.labels(component="query").inc()
+            logger.error("Streaming query processing failed: %s", str(e), exc_info=True)
+            raise QueryError(f"Failed to process query: {str(e)}")
+
+    def _retrieve(self, query_text: str) -> Dict[str, Any]:
+        """
+        Run the retrieval stages (embedding, hybrid search, re-ranking, context assembly).
+
+        Args:
+            query_text: User's question
+
+        Returns:
+            Dict with 'context' (None when no relevant documents were found),
+            'ranked_docs', 'ranked_metadatas', 'sources' and a 'debug' payload
+            with candidate counts, fusion scores and re-rank scores
+        """
+        return self._retrieve_batch([query_text])[0]
+
+    def _retrieve_batch(self, query_texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Run the retrieval stages for several questions, batching the model and store calls.
+
+        Args:
+            query_texts: User questions
+
+        Returns:
+            One _retrieve result dict per question, in input order
+        """
+        # 1. Generate embeddings (one encode call)
+        logger.debug("Generating %s query embedding(s)", len(query_texts))
+        with timed(QUERY_STAGE_SECONDS, "embed"):
+            query_embeddings = self.embedder.embed_queries(query_texts)
+
+        search_results, reranked = self._search_batch(query_texts, query_embeddings)
+        return [
+            self._assemble(search_result, reranked.get(i))
+            for i, search_result in enumerate(search_results)
+        ]
+
+    def _search_batch(self, query_texts: List[str], query_embeddings: List[List[float]]):
+        """
+        Hybrid search and re-ranking for several embedded questions.
+
+        Returns:
+            Tuple of (hybrid search result per question, re-ranked candidates
+            by question position for questions with candidates)
+        """
+        # 2. Retrieve relevant chunks using HYBRID SEARCH (BM25 + Vector)
+        # Retrieve more candidates (2x) for re-ranking, unless the time budget runs low
+        initial_k = settings.TOP_K_RESULTS * 2
+        if not self._within_budget("reduced_initial_k", settings.QUERY_DEGRADE_REDUCE_K_BELOW_MS):
+            initial_k = settings.TOP_K_RESULTS
+        lexical = self._within_budget("skipped_lexical", settings.QUERY_DEGRADE_SKIP_LEXICAL_BELOW_MS)
+        logger.debug("Performing hybrid search (top_k=%s, alpha=%s, lexical=%s)", initial_k, settings.HYBRID_SEARCH_ALPHA, lexical)
+        
+        with timed(QUERY_STAGE_SECONDS, "hybrid_search"):
+            search_results = self.vector_store_repo.hybrid_search_batch(
+                query_embeddings=query_embeddings,
+                query_texts=query_texts,
+                k=initial_k,
+                alpha=settings.HYBRID_SEARCH_ALPHA,
+                lexical=lexical,
+            )
+
+        # 3. Re-ranking (one cross-encoder pass over all candidates)
+        rerank_positions = [i for i, result in enumerate(search_results) if result["documents"]]
+        reranked = {}
+        if rerank_positions and not self._within_budget("skipped_rerank", settings.QUERY_DEGRADE_SKIP_RERANK_BELOW_MS):
+            reranked = {i: _search_order(search_results[i], settings.TOP_K_RESULTS) for i in rerank_positions}
+        elif rerank_positions:
+            logger.debug("Re-ranking candidates of %s query(s)", len(rerank_positions))
+            with timed(QUERY_STAGE_SECONDS, "rerank"):
+                batches = self.reranker.rerank_batch(
+                    queries=[query_texts[i] for i in rerank_positions],
+                    documents_per_query=[search_results[i]["documents"] for i in rerank_positions],
+                    top_k=settings.TOP_K_RESULTS
+                )
+            reranked = dict(zip(rerank_positions, batches))
+
+        return search_results, reranked
+
+    def _retrieve_in_session(self, query_text: str, session_id: str) -> Dict[str, Any]:
+        """
+        Retrieval for a question asked in a chat session.
+
+        A follow-up reuses the previous turn's candidates: they are re-ranked
+        together with a small vector-only retrieval
+        (settings.CONVERSATION_INCREMENTAL_K) against the question joined to
+        the previous one, instead of running a full hybrid search. A full
+        retrieval runs for the first turn, after the index changed, or when
+        the question's embedding is too far from the conversation
+        (settings.CONVERSATION_TOPIC_SHIFT_SIMILARITY).
+
+        Args:
+            query_text: User's question
+            session_id: Chat session ID
+
+        Returns:
+            _retrieve result dict, plus the 'question' to send to the LLM
+        """
+        state = self.conversations.get(session_id)
+        generation = self.vector_store_repo.index_generation.current()
+        if state is not None and (state.generation != generation or not state.candidate_ids):
+            state = None
+
+        context_text = f"{state.question} {query_text}" if state is not None else query_text
+        with timed(QUERY_STAGE_SECONDS, "embed"):
+            if state is not None:
+                question_embedding, context_embedding = self.embedder.embed_queries([query_text, context_text])
+            else:
+                question_embedding = context_embedding = self.embedder.embed_query(query_text)
+
+        followup = (
+            state is not None
+            and cosine_similarity(question_embedding, state.query_embedding) >= settings.CONVERSATION_TOPIC_SHIFT_SIMILARITY
+        )
+        if followup:
+            search_result, reranked = self._followup_search(state, context_text, context_embedding)
+            question = f"Previous question: {state.question}\nFollow-up question: {query_text}"
+            turns = state.turns + 1
+        else:
+            context_text, context_embedding = query_text, question_embedding
+            search_results, reranked_by_position = self._search_batch([query_text], [question_embedding])
+            search_result, reranked = search_results[0], reranked_by_position.get(0)
+            question = query_text
+            turns = 1
+        with self._retrieval_modes_lock:
+            self.retrieval_modes["followup" if followup else "full"] += 1
+
+        # Keep the best candidates (re-ranked first) for the next turn
+        order = [idx for _, _, idx in reranked or []]
+        kept = set(order)
+        order += [idx for idx in range(len(search_result["documents"])) if idx not in kept]
+        order = order[:settings.CONVERSATION_MAX_CANDIDATES]
+        self.conversations.put(session_id, ConversationState(
+            question=query_text,
+            query_text=context_text,
+            query_embedding=context_embedding,
+            candidate_ids=[search_result["ids"][idx] for idx in order],
+            candidate_documents=[search_result["documents"][idx] for idx in order],
+            candidate_metadatas=[search_result["metadatas"][idx] for idx in order],
+            generation=generation,
+            turns=turns,
+        ))
+
+        retrieval = self._assemble(search_result, reranked)
+        retrieval["question"] = question
+        retrieval["debug"]["conversation"] = {
+            "session_id": session_id,
+            "mode": "followup" if followup else "full",
+            "turn": turns,
+        }
+        return retrieval
+
+    def _followup_search(self, state: ConversationState, context_text: str, context_embedding: List[float]):
+        """
+        Re-rank the cached candidates of a session plus a small vector-only retrieval.
+
+        Returns:
+            Tuple of (search result dict over the candidate pool, re-ranked candidates)
+        """
+        with timed(QUERY_STAGE_SECONDS, "incremental_search"):
+            fresh = self.vector_store_repo.search(context_embedding, k=settings.CONVERSATION_INCREMENTAL_K)
+
+        ids = list(state.candidate_ids)
+        documents = list(state.candidate_documents)
+        metadatas = list(state.candidate_metadatas)
+        known = set(ids)
+        added = 0
+        for doc_id, document, metadata in zip(fresh["ids"], fresh["documents"], fresh["metadatas"]):
+            if doc_id not in known:
+                known.add(doc_id)
+                ids.append(doc_id)
+                documents.append(document)
+                metadatas.append(metadata or {})
+                added += 1
+        logger.debug("Follow-up retrieval: %s cached + %s new candidate(s)", len(state.candidate_ids), added)
+
+        search_result = {
+            "ids": ids,
+            "documents": documents,
+            "metadatas": metadatas,
+            "vector_candidates": added,
+            "lexical_candidates": 0,
+            "cached_candidates": len(state.candidate_ids),
+        }
+        if not self._within_budget("skipped_rerank", settings.QUERY_DEGRADE_SKIP_RERANK_BELOW_MS):
+            return search_result, _search_order(search_result, settings.TOP_K_RESULTS)
+        with timed(QUERY_STAGE_SECONDS, "rerank"):
+            reranked = self.reranker.rerank(context_text, documents, top_k=settings.TOP_K_RESULTS)
+        return search_result, reranked
+
+    @staticmethod
+    def _within_budget(step: str, threshold_ms: float) -> bool:
+        """
+        Whether the current request has at least threshold_ms of its time
+        budget left (always True without a budget). Otherwise the
+        degradation step is recorded and False is returned.
+        """
+        budget = get_budget()
+        if budget is None or budget.remaining_ms() >= threshold_ms:
+            return True
+        if budget.degrade(step):
+            QUERY_DEGRADATIONS.labels(step=step).inc()
+            logger.info("Degrading query (%s): %.0f ms of budget left", step, budget.remaining_ms())
+        return False
+
+    @staticmethod
+    def _llm_deadline() -> Optional[float]:
+        """
+        End of the current request's time budget (time.monotonic()), which
+        bounds the LLM call and its fallback; None without a budget.
+        """
+        budget = get_budget()
+        return budget.deadline if budget is not None else None
+
+    def _generation_cap(self) -> Optional[int]:
+        """Answer length cap for the current request (None unless its budget runs low)."""
+        if self._within_budget("capped_generation", settings.QUERY_DEGRADE_CAP_GENERATION_BELOW_MS):
+            return None
+        return settings.QUERY_DEGRADED_MAX_OUTPUT_TOKENS
+
+    @staticmethod
+    def _degradations() -> List[str]:
+        """Degradation steps applied to the current request, in order."""
+        budget = get_budget()
+        return list(budget.degradations) if budget is not None else []
+
+    def _assemble(self, search_results: Dict[str, Any], reranked_results) -> Dict[str, Any]:
+        """
+        Build the context, sources and debug payload of one question from its
+        hybrid search results and re-ranked candidates.
+        """
+        documents = search_results["documents"]
+        metadatas = search_results["metadatas"]
+        ids = search_results.get("ids") or [None] * len(documents)
+        fusion_scores = search_results.get("scores") or [None] * len(documents)
+
+        debug = {
+            "candidates": {
+                "vector": search_results.get("vector_candidates", len(documents)),
+                "lexical": search_results.get("lexical_candidates", 0),
+                "fused": len(documents),
+                **({"cached": search_results["cached_candidates"]} if "cached_candidates" in search_results else {}),
+            },
+            "fusion": [
+                _debug_entry(doc_id, metadata, score)
+                for doc_id, metadata, score in zip(ids, metadatas, fusion_scores)
+            ],
+            "rerank": [],
+        }
+
+        if not documents:
+            logger.warning("No relevant documents found in vector store")
+            return {"context": None, "ranked_docs": [], "ranked_metadatas": [], "sources": [], "debug": debug}
+
+        # Extract re-ranked docs and metadatas
+        ranked_docs = []
+        ranked_metadatas = []
+        ranked_chunks = []
+        
+        for doc_text, score, original_idx in reranked_results:
+            ranked_docs.append(doc_text)
+            ranked_metadatas.append(metadatas[original_idx])
+            ranked_chunks.append((doc_text, score, metadatas[original_idx]))
+            debug["rerank"].append(_debug_entry(ids[original_idx], metadatas[original_idx], score))
+        
+        logger.debug("Selected top %s documents after re-ranking", len(ranked_docs))
+
+        # Format context: merge adjacent chunks, drop overlap, pack into token budget
+        with timed(QUERY_STAGE_SECONDS, "context"):
+            context, context_blocks = self.context_builder.build(ranked_chunks)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Context assembled from %s block(s), ~%s tokens",
+                         len(context_blocks), self.context_builder.estimate_tokens(context))
+
+        # Extract unique sources, including (a few) documents whose near-duplicate chunks were stored once
+        sources = list(set([
+            filename
+            for m in ranked_metadatas
+            for filename in source_filenames(m, limit=settings.DEDUP_MAX_SOURCE_FILENAMES)
+        ]))
+
+        return {
+            "context": context,
+            "ranked_docs": ranked_docs,
+            "ranked_metadatas": ranked_metadatas,
+            "sources": sources,
+            "debug": debug,
+        }
+
+
+def _chunk_ids(retrieval: Dict[str, Any]) -> List[Optional[str]]:
+    """IDs of the chunks a question's context was built from, in rank order."""
+    return [entry["chunk_id"] for entry in retrieval["debug"]["rerank"]]
+
+
+def _debug_entry(chunk_id: Optional[str], metadata: Dict[str, Any], score: Optional[float]) -> Dict[str, Any]:
+    """Compact description of a scored chunk for the debug payload."""
+    metadata = metadata or {}
+    return {
+        "chunk_id": chunk_id,
+        "filename": metadata.get("filename"),
+        "chunk_index": metadata.get("chunk_index"),
+        "score": float(score) if score is not None else None,
+    }
+
+
+def _search_order(search_result: Dict[str, Any], top_k: int) -> List[tuple]:
+    """
+    Top candidates in search order, shaped like re-ranker output, for when
+    re-ranking is skipped. Scores are the fusion scores, or 1/rank for
+    vector-only results.
+    """
+    scores = search_result.get("scores") or [1.0 / (rank + 1) for rank in range(len(search_result["documents"]))]
+    return [(doc, float(score), idx) for idx, (doc, score) in enumerate(zip(search_result["documents"], scores))][:top_k]
@@ -0,0 +1,231 @@
+import base64
+import binascii
+import json
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+from src.core.config import settings
+from src.core.exceptions import InvalidCursorError, QueryError, ServiceOverloadedError
+from src.core.logging_config import get_logger
+from src.core.metrics import QUERY_STAGE_SECONDS, ERRORS, timed
+from src.utils.text_normalization import normalize_query, content_hash
+
+logger = get_logger(__name__)
+
+
+class RankedListCache:
+    """
+    Bounded LRU cache of ranked result lists with a time-to-live.
+    Lets later pages of a search be served without re-running retrieval.
+    """
+
+    def __init__(self, max_size: int = None, ttl_seconds: float = None):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_size: Maximum number of cached lists (defaults to settings.SEARCH_CACHE_SIZE)
+            ttl_seconds: Lifetime of a cached list (defaults to settings.SEARCH_CACHE_TTL_SECONDS)
+        """
+        self.max_size = max_size if max_size is not None else settings.SEARCH_CACHE_SIZE
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.SEARCH_CACHE_TTL_SECONDS
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple) -> Optional[List[Dict[str, Any]]]:
+        """Return the cached list for key (or None if missing or expired)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Tuple, results: List[Dict[str, Any]]):
+        """Store a ranked list, evicting the least recently used lists beyond max_size."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache size, hits, misses and hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def snapshot_id(ranked: List[Dict[str, Any]]) -> str:
+    """Fingerprint of a ranked list (its chunk IDs in order)."""
+    return content_hash("|".join(str(result["chunk_id"]) for result in ranked))[:16]
+
+
+def encode_cursor(query_key: str, generation: int, snapshot: str, offset: int) -> str:
+    """Opaque cursor pointing at `offset` in one ranked list (snapshot) of a query."""
+    payload = json.dumps({"q": query_key, "g": generation, "s": snapshot, "o": offset},
+                         separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, query_key: str) -> Tuple[int, str, int]:
+    """
+    Decode a cursor and check that it belongs to the query.
+
+    Args:
+        cursor: Cursor from a previous page
+        query_key: Key of the current query
+
+    Returns:
+        Tuple of (index generation, snapshot ID, offset of the next result)
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        generation, snapshot, offset = int(payload["g"]), str(payload["s"]), int(payload["o"])
+    except (ValueError, KeyError, TypeError, binascii.Error, UnicodeEncodeError):
+        raise InvalidCursorError("Malformed cursor")
+    if payload.get("q") != query_key or offset < 0:
+        raise InvalidCursorError("Cursor does not belong to this search")
+    return generation, snapshot, offset
+
+
+class SearchService:
+    """
+    Retrieval-only search: embedding, hybrid search and optional re-ranking,
+    without LLM generation.
+    """
+
+    def __init__(self, vector_store_repo, embedder, reranker, cache: RankedListCache = None):
+        """
+        Initialize with repositories and models.
+
+        Args:
+            vector_store_repo: VectorStoreRepository instance
+            embedder: EmbeddingService instance
+            reranker: Reranker instance
+            cache: RankedListCache for paginating (defaults to one built from settings)
+        """
+        self.vector_store_repo = vector_store_repo
+        self.embedder = embedder
+        self.reranker = reranker
+        self.cache = cache or RankedListCache()
+
+    def search(self, query_text: str, limit: int = 10, cursor: str = None, rerank: bool = True) -> Dict[str, Any]:
+        """
+        Return one page of ranked passages for a query.
+
+        The full ranked list (up to settings.SEARCH_MAX_RESULTS) is computed
+        on the first page and cached per index generation; following pages are
+        sliced from it. The cursor names the generation and a fingerprint of
+        the list it came from. A later page is served from that list while it
+        is cached, or from a fresh ranking identical to it (e.g. on another
+        worker); otherwise the cursor is rejected with InvalidCursorError so
+        the client restarts from the first page instead of getting duplicated
+        or skipped results.
+
+        Args:
+            query_text: Search text
+            limit: Page size
+            cursor: Cursor returned with the previous page (None for the first page)
+            rerank: Re-rank candidates with the cross-encoder
+
+        Returns:
+            Dict with 'results' (chunk_id, text, metadata, rank, scores),
+            'total' and 'next_cursor' (None on the last page)
+        """
+        query_key = content_hash(f"{normalize_query(query_text)}|{int(rerank)}")
+        generation, snapshot, offset = decode_cursor(cursor, query_key) if cursor else (None, None, 0)
+
+        try:
+            ranked = self.cache.get((query_key, generation)) if cursor else None
+            if ranked is None:
+                current = self.vector_store_repo.index_generation.current()
+                if cursor and generation != current:
+                    raise InvalidCursorError("Results changed since the previous page; restart the search")
+                generation = current
+                ranked = self.cache.get((query_key, generation))
+                if ranked is None:
+                    ranked = self._rank(query_text, rerank)
+                    self.cache.put((query_key, generation), ranked)
+            if cursor and snapshot_id(ranked) != snapshot:
+                raise InvalidCursorError("Results changed since the previous page; restart the search")
+        except (QueryError, ServiceOverloadedError):
+            raise
+        except Exception as e:
+            ERRORS.labels(component="search").inc()
+            logger.error("Search failed: %s", e, exc_info=True)
+            raise QueryError(f"Failed to search documents: {e}")
+
+        page = ranked[offset:offset + limit]
+        next_offset = offset + len(page)
+        return {
+            "results": page,
+            "total": len(ranked),
+            "next_cursor": (encode_cursor(query_key, generation, snapshot_id(ranked), next_offset)
+                            if next_offset < len(ranked) else None),
+        }
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """
+        Ranked list cache statistics (size, hits, misses, hit rate).
+        """
+        return self.cache.stats()
+
+    def _rank(self, query_text: str, rerank: bool) -> List[Dict[str, Any]]:
+        """
+        Run the retrieval stages and build the full ranked list.
+        """
+        logger.debug("Searching: %s... (rerank=%s)", query_text[:100], rerank)
+        with timed(QUERY_STAGE_SECONDS, "embed"):
+            query_embedding = self.embedder.embed_query(query_text)
+
+        with timed(QUERY_STAGE_SECONDS, "hybrid_search"):
+            search_results = self.vector_store_repo.hybrid_search(
+                query_embedding=query_embedding,
+                query_text=query_text,
+                k=settings.SEARCH_MAX_RESULTS,
+                alpha=settings.HYBRID_SEARCH_ALPHA,
+            )
+
+        documents = search_results["documents"]
+        metadatas = search_results["metadatas"]
+        ids = search_results.get("ids") or [None] * len(documents)
+        fusion_scores = search_results.get("scores") or [None] * len(documents)
+        stage_scores = search_results.get("stage_scores") or [{} for _ in documents]
+
+        order = [(idx, None) for idx in range(len(documents))]
+        if rerank and documents:
+            with timed(QUERY_STAGE_SECONDS, "rerank"):
+                reranked = self.reranker.rerank(query_text, documents, top_k=len(documents))
+            order = [(idx, score) for _, score, idx in reranked]
+
+        ranked = []
+        for rank, (idx, rerank_score) in enumerate(order, start=1):
+            scores = {"fusion": fusion_scores[idx], **stage_scores[idx]}
+            if rerank_score is not None:
+                scores["rerank"] = rerank_score
+            ranked.append({
+                "chunk_id": ids[idx],
+                "text": documents[idx],
+                "metadata": metadatas[idx],
+                "rank": rank,
+                "scores": scores,
+            })
+        return ranked
@@ -0,0 +1,239 @@
+"""
+Inference backend selection for the embedding and re-ranking models.
+
+Both models can run on plain PyTorch (``torch``), on an exported ONNX graph
+(``onnx``) or on a dynamically int8-quantized ONNX graph (``onnx-int8``).
+ONNX variants are exported once, cached under ``settings.MODEL_CACHE_DIR`` and
+checked against the PyTorch reference before they are trusted. The check is
+repeated (with a fresh export) whenever the quantization target or the
+tolerance it was checked against changes.
+"""
+import json
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, Tuple
+import numpy as np
+from src.core.config import settings
+from src.core.logging_config import get_logger
+from src.core.exceptions import ConfigurationError
+
+logger = get_logger(__name__)
+
+SUPPORTED_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+EQUIVALENCE_FILE = "equivalence.json"
+
+# Probe inputs used for the equivalence check (mixed English/Bengali legal text)
+PROBE_TEXTS = [
+    "The tenant shall pay the rent on or before the seventh day of each month.",
+    "Section 302 of the Penal Code prescribes the punishment for murder.",
+    "A writ petition under Article 102 may be filed before the High Court Division.",
+    "ভাড়াটিয়া প্রতি মাসের সাত তারিখের মধ্যে ভাড়া পরিশোধ করিবেন।",
+    "দণ্ডবিধির ৩০২ ধারায় খুনের শাস্তির বিধান রয়েছে।",
+]
+PROBE_QUERY = "What is the punishment for murder in Bangladesh?"
+
+# First sentence-transformers release whose model class accepts backend="onnx"
+MIN_ONNX_VERSIONS = {"SentenceTransformer": (3, 2), "CrossEncoder": (4, 1)}
+
+
+def resolve_backend(backend: str = None) -> str:
+    """
+    Validate and normalize the requested inference backend.
+
+    Args:
+        backend: Backend name (defaults to settings.INFERENCE_BACKEND)
+
+    Returns:
+        str: One of SUPPORTED_BACKENDS
+    """
+    backend = (backend or settings.INFERENCE_BACKEND).lower()
+    if backend not in SUPPORTED_BACKENDS:
+        raise ConfigurationError(
+            f"Unsupported inference backend '{backend}'. Expected one of: {', '.join(SUPPORTED_BACKENDS)}"
+        )
+    return backend
+
+
+def _supports_onnx(model_cls) -> bool:
+    """Whether the installed sentence-transformers can run model_cls on ONNX."""
+    import sentence_transformers
+    installed = tuple(int(part) for part in re.findall(r"\d+", sentence_transformers.__version__)[:2])
+    return installed >= MIN_ONNX_VERSIONS[model_cls.__name__]
+
+
+def _cache_path(model_name: str, backend: str) -> Path:
+    """Directory holding the exported model for a (model, backend, quantization target)."""
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]", "__", model_name)
+    if backend == "onnx-int8":
+        backend = f"{backend}-{settings.ONNX_QUANTIZATION_CONFIG}"
+    return Path(settings.MODEL_CACHE_DIR) / backend / safe_name
+
+
+def _quantized_file_name() -> str:
+    """Relative path of the int8 ONNX graph written by the quantization export."""
+    return f"onnx/model_qint8_{settings.ONNX_QUANTIZATION_CONFIG}.onnx"
+
+
+def _read_equivalence(cache_path: Path):
+    marker = cache_path / EQUIVALENCE_FILE
+    if not marker.exists():
+        return None
+    try:
+        return json.loads(marker.read_text(encoding="utf-8"))
+    except Exception as e:
+        logger.warning("Ignoring unreadable equivalence marker %s: %s", marker, e)
+        return None
+
+
+def _write_equivalence(cache_path: Path, result: dict):
+    (cache_path / EQUIVALENCE_FILE).write_text(json.dumps(result, indent=2), encoding="utf-8")
+
+
+def _export(model_cls, model_name: str, backend: str, cache_path: Path):
+    """
+    Export an ONNX (optionally int8-quantized) copy of the model into cache_path.
+    """
+    try:
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+    except ImportError as e:
+        raise ConfigurationError(
+            f"ONNX backends require sentence-transformers with ONNX support "
+            f"(pip install 'optimum[onnxruntime]'): {e}"
+        )
+
+    logger.info("Exporting %s to ONNX at %s", model_name, cache_path)
+    cache_path.mkdir(parents=True, exist_ok=True)
+    onnx_model = model_cls(model_name, backend="onnx")
+    onnx_model.save_pretrained(str(cache_path))
+
+    if backend == "onnx-int8":
+        logger.info("Quantizing %s to int8 (%s)", model_name, settings.ONNX_QUANTIZATION_CONFIG)
+        export_dynamic_quantized_onnx_model(
+            onnx_model,
+            quantization_config=settings.ONNX_QUANTIZATION_CONFIG,
+            model_name_or_path=str(cache_path),
+        )
+
+
+def _load_onnx(model_cls, cache_path: Path, backend: str):
+    model_kwargs = {"file_name": _quantized_file_name()} if backend == "onnx-int8" else None
+    return model_cls(str(cache_path), backend="onnx", model_kwargs=model_kwargs)
+
+
+def _load(
+    model_cls,
+    model_name: str,
+    backend: str,
+    compare: Callable[[object, object], Tuple[float, bool]],
+    tolerance: Dict[str, Any],
+):
+    """
+    Load a model on the requested backend, exporting and verifying it on first use.
+
+    Falls back to PyTorch when the exported model failed its equivalence check,
+    the cached export cannot be loaded or the installed sentence-transformers
+    is too old for ONNX.
+
+    Args:
+        tolerance: Settings the equivalence check depends on; a cached result
+            recorded with different values is checked again
+    """
+    backend = resolve_backend(backend)
+    if backend == "torch":
+        return model_cls(model_name), "torch"
+
+    if not _supports_onnx(model_cls):
+        logger.warning("%s backend for %s needs sentence-transformers>=%s; using torch",
+                       backend, model_cls.__name__, ".".join(map(str, MIN_ONNX_VERSIONS[model_cls.__name__])))
+        return model_cls(model_name), "torch"
+
+    cache_path = _cache_path(model_name, backend)
+    equivalence = _read_equivalence(cache_path)
+    if equivalence is not None and equivalence.get("tolerance") != tolerance:
+        logger.info("Tolerance of %s %s changed since its equivalence check; exporting again", backend, model_name)
+        equivalence = None
+
+    if equivalence is not None and not equivalence.get("passed"):
+        logger.warning("%s export of %s previously failed its equivalence check (deviation=%s); using torch",
+                       backend, model_name, equivalence.get('deviation'))
+        return model_cls(model_name), "torch"
+
+    if equivalence is not None:
+        logger.info("Loading cached %s model from %s", backend, cache_path)
+        try:
+            return _load_onnx(model_cls, cache_path, backend), backend
+        except Exception as e:
+            logger.error("Could not load cached %s model from %s (%s); using torch", backend, cache_path, e)
+            return model_cls(model_name), "torch"
+
+    _export(model_cls, model_name, backend, cache_path)
+    model = _load_onnx(model_cls, cache_path, backend)
+
+    reference = model_cls(model_name)
+    deviation, passed = compare(reference, model)
+    _write_equivalence(cache_path, {
+        "model_name": model_name,
+        "backend": backend,
+        "tolerance": tolerance,
+        "deviation": deviation,
+        "passed": passed,
+    })
+
+    if not passed:
+        logger.error("%s export of %s deviates from torch output (deviation=%.4f); falling back to torch",
+                     backend, model_name, deviation)
+        return reference, "torch"
+
+    logger.info("%s export of %s verified (deviation=%.4f)", backend, model_name, deviation)
+    del reference
+    return model, backend
+
+
+def _compare_embeddings(reference, candidate) -> Tuple[float, bool]:
+    """Minimum cosine similarity between reference and candidate embeddings."""
+    ref = reference.encode(PROBE_TEXTS, convert_to_numpy=True, normalize_embeddings=True)
+    cand = candidate.encode(PROBE_TEXTS, convert_to_numpy=True, normalize_embeddings=True)
+    min_similarity = float(np.min(np.sum(ref * cand, axis=1)))
+    return 1.0 - min_similarity, min_similarity >= settings.ONNX_MIN_COSINE_SIMILARITY
+
+
+def _compare_scores(reference, candidate) -> Tuple[float, bool]:
+    """Maximum absolute deviation between reference and candidate cross-encoder scores."""
+    pairs = [[PROBE_QUERY, text] for text in PROBE_TEXTS]
+    ref = np.asarray(reference.predict(pairs), dtype=np.float32)
+    cand = np.asarray(candidate.predict(pairs), dtype=np.float32)
+    max_deviation = float(np.max(np.abs(ref - cand)))
+    return max_deviation, max_deviation <= settings.ONNX_MAX_SCORE_DEVIATION
+
+
+def load_sentence_transformer(model_name: str, backend: str = None):
+    """
+    Load a SentenceTransformer on the requested inference backend.
+
+    Args:
+        model_name: HuggingFace model name
+        backend: 'torch', 'onnx' or 'onnx-int8' (defaults to settings.INFERENCE_BACKEND)
+
+    Returns:
+        Tuple of (model, backend actually in use)
+    """
+    from sentence_transformers import SentenceTransformer
+    return _load(SentenceTransformer, model_name, backend, _compare_embeddings,
+                 {"min_cosine_similarity": settings.ONNX_MIN_COSINE_SIMILARITY})
+
+
+def load_cross_encoder(model_name: str, backend: str = None):
+    """
+    Load a CrossEncoder on the requested inference backend.
+
+    Args:
+        model_name: HuggingFace model name
+        backend: 'torch', 'onnx' or 'onnx-int8' (defaults to settings.INFERENCE_BACKEND)
+
+    Returns:
+        Tuple of (model, backend actually in use)
+    """
+    from sentence_transformers import CrossEncoder
+    return _load(CrossEncoder, model_name, backend, _compare_scores,
+                 {"max_score_deviation": settings.ONNX_MAX_SCORE_DEVIATION})
@@ -0,0 +1,163 @@
+"""
+Near-duplicate detection with MinHash signatures and LSH banding.
+
+A text is reduced to its set of word shingles (runs of `shingle_size`
+words). MinHash estimates the Jaccard similarity of two shingle sets from
+fixed-size signatures, and locality-sensitive hashing splits a signature
+into bands so that texts sharing any band become candidates. Candidates are
+then verified with the exact Jaccard similarity of their shingle sets.
+"""
+import hashlib
+import itertools
+import re
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+import numpy as np
+
+# Fixed seed: signatures must be identical across processes and restarts
+MINHASH_SEED = 20261019
+WORD_PATTERN = re.compile(r"\w+")
+
+
+class MinHasher:
+    """
+    Computes shingle sets, MinHash signatures and LSH band keys.
+    """
+
+    def __init__(self, shingle_size: int = 5, num_perm: int = 128, bands: int = 16):
+        """
+        Args:
+            shingle_size: Words per shingle
+            num_perm: Hash permutations (signature length)
+            bands: LSH bands; num_perm must be a multiple of it
+        """
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.shingle_size = max(1, shingle_size)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        # Multiply-shift hash family over 32-bit shingle hashes
+        rng = np.random.RandomState(MINHASH_SEED)
+        self._a = rng.randint(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.randint(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+        # Stored band keys are only comparable between identical parameters
+        self.scheme = f"{self.shingle_size}:{num_perm}:{bands}"
+
+    def shingles(self, text: str) -> FrozenSet[int]:
+        """
+        32-bit hashes of the text's word shingles (lower-cased, punctuation
+        ignored). Texts shorter than one shingle yield a single shingle.
+        """
+        words = WORD_PATTERN.findall(text.lower())
+        if not words:
+            return frozenset()
+        size = min(self.shingle_size, len(words))
+        return frozenset(
+            int.from_bytes(hashlib.blake2b(" ".join(words[i:i + size]).encode("utf-8"), digest_size=4).digest(), "little")
+            for i in range(len(words) - size + 1)
+        )
+
+    def signature(self, shingles: Iterable[int]) -> np.ndarray:
+        """
+        MinHash signature of a shingle set.
+
+        Returns:
+            Array of num_perm uint32 values (all 0xFFFFFFFF for an empty set)
+        """
+        values = np.fromiter(shingles, dtype=np.uint64)
+        if values.size == 0:
+            return np.full(self.num_perm, 0xFFFFFFFF, dtype=np.uint32)
+        with np.errstate(over="ignore"):
+            hashed = (values[:, None] * self._a[None, :] + self._b[None, :]) >> np.uint64(32)
+        return hashed.min(axis=0).astype(np.uint32)
+
+    def band_keys(self, signature: np.ndarray) -> Tuple[str, ...]:
+        """One hex key per band; texts sharing a key are near-duplicate candidates."""
+        return tuple(
+            hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(),
+                            digest_size=8, person=band.to_bytes(2, "little")).hexdigest()
+            for band in range(self.bands)
+        )
+
+    def fingerprint(self, text: str) -> Tuple[FrozenSet[int], Tuple[str, ...]]:
+        """Shingle set and band keys of a text."""
+        shingles = self.shingles(text)
+        return shingles, self.band_keys(self.signature(shingles))
+
+    def encode(self, keys: Tuple[str, ...]) -> str:
+        """Band keys as a metadata string tagged with the hashing scheme."""
+        return f"{self.scheme}|{' '.join(keys)}"
+
+    def decode(self, value: Optional[str]) -> Optional[Tuple[str, ...]]:
+        """Band keys from encode(), or None if missing or from another scheme."""
+        if not value:
+            return None
+        scheme, _, keys = value.partition("|")
+        if scheme != self.scheme:
+            return None
+        return tuple(keys.split())
+
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    """Jaccard similarity of two shingle sets (1.0 for two empty sets)."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class NearDuplicateIndex:
+    """
+    In-memory LSH index: band key -> IDs of the texts having it.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[str, Set[str]] = defaultdict(set)
+        self._keys: Dict[str, Tuple[str, ...]] = {}
+        self._added: Dict[str, int] = {}
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, item_id: str, keys: Tuple[str, ...]):
+        """Index an ID under its band keys, replacing earlier keys of the same ID."""
+        self.remove(item_id)
+        self._keys[item_id] = keys
+        self._added[item_id] = next(self._sequence)
+        for key in keys:
+            self._buckets[key].add(item_id)
+
+    def remove(self, item_id: str):
+        self._added.pop(item_id, None)
+        for key in self._keys.pop(item_id, ()):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(item_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def keys(self, item_id: str) -> Optional[Tuple[str, ...]]:
+        return self._keys.get(item_id)
+
+    def candidates(self, keys: Tuple[str, ...], limit: int, exclude: str = None) -> List[str]:
+        """
+        IDs sharing at least one band key, most shared bands first and, among
+        those sharing as many, the most recently added first.
+
+        Args:
+            keys: Band keys of the probe
+            limit: Maximum number of candidates
+            exclude: ID left out of the result (the probe itself)
+        """
+        shared: Dict[str, int] = defaultdict(int)
+        for key in keys:
+            for item_id in self._buckets.get(key, ()):
+                if item_id != exclude:
+                    shared[item_id] += 1
+        return sorted(shared, key=lambda item_id: (-shared[item_id], -self._added[item_id]))[:limit]
+
+    def clear(self):
+        self._buckets.clear()
+        self._keys.clear()
+        self._added.clear()
@@ -1,13 +1,12 @@
-from pypdf import PdfReader
-import docx
-from PIL import Image
-import google.generativeai as genai
 from src.core.config import settings
 from src.core.logging_config import get_logger
 from src.core.exceptions import UnsupportedFileTypeError, DocumentProcessingError
+from src.core.admission import admission
 
 logger = get_logger(__name__)
 
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.heic', '.heif')
+
 class FileParser:
     """
     Handles parsing of different file types (PDF, DOCX, Images).
@@ -17,11 +16,16 @@ class FileParser:
         """Initialize Gemini for vision tasks."""
         if settings.GOOGLE_API_KEY:
             try:
-                genai.configure(api_key=settings.GOOGLE_API_KEY)
+                import google.generativeai as genai
+                configure_kwargs = {"api_key": settings.GOOGLE_API_KEY}
+                if settings.GOOGLE_API_ENDPOINT:
+                    configure_kwargs["client_options"] = {"api_endpoint": settings.GOOGLE_API_ENDPOINT}
+                    configure_kwargs["transport"] = "rest"
+                genai.configure(**configure_kwargs)
                 self.vision_model = genai.GenerativeModel('gemini-2.5-flash')
                 logger.info("Vision model initialized for image parsing")
             except Exception as e:
-                logger.warning(f"Failed to initialize vision model: {e}")
+                logger.warning("Failed to initialize vision model: %s", e)
                 self.vision_model = None
         else:
             logger.warning("GOOGLE_API_KEY not set. Image parsing will not be available.")
@@ -39,15 +43,16 @@ class FileParser:
             str: Extracted text from all pages
         """
         try:
-            logger.debug(f"Parsing PDF: {file_path}")
+            logger.debug("Parsing PDF: %s", file_path)
+            from pypdf import PdfReader
             reader = PdfReader(file_path)
             text = ""
             for page in reader.pages:
                 text += page.extract_text() + "\n"
-            logger.debug(f"Extracted {len(text)} characters from PDF")
+            logger.debug("Extracted %s characters from PDF", len(text))
             return text.strip()
         except Exception as e:
-            logger.error(f"Failed to parse PDF {file_path}: {e}")
+            logger.error("Failed to parse PDF %s: %s", file_path, e)
             raise DocumentProcessingError(f"Failed to parse PDF: {e}")
 
     @staticmethod
@@ -62,13 +67,14 @@ class FileParser:
             str: Extracted text from all paragraphs
         """
         try:
-            logger.debug(f"Parsing DOCX: {file_path}")
+            logger.debug("Parsing DOCX: %s", file_path)
+            import docx
             doc = docx.Document(file_path)
             text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-            logger.debug(f"Extracted {len(text)} characters from DOCX")
+            logger.debug("Extracted %s characters from DOCX", len(text))
             return text.strip()
         except Exception as e:
-            logger.error(f"Failed to parse DOCX {file_path}: {e}")
+            logger.error("Failed to parse DOCX %s: %s", file_path, e)
             raise DocumentProcessingError(f"Failed to parse DOCX: {e}")
     
     def parse_image(self, file_path: str) -> str:
@@ -86,9 +92,10 @@ class FileParser:
             raise DocumentProcessingError("Gemini API key not configured for vision tasks")
         
         try:
-            logger.debug(f"Parsing image with vision model: {file_path}")
+            logger.debug("Parsing image with vision model: %s", file_path)
             
             # Open image
+            from PIL import Image
             image = Image.open(file_path)
             
             # Use Gemini Vision to extract text
@@ -98,14 +105,28 @@ class FileParser:
             If the text is in Bengali (বাংলা), preserve it exactly as shown.
             """
             
-            response = self.vision_model.generate_content([prompt, image])
+            with admission.slot("ocr"):
+                response = self.vision_model.generate_content([prompt, image])
             text = response.text.strip()
-            logger.debug(f"Extracted {len(text)} characters from image")
+            logger.debug("Extracted %s characters from image", len(text))
             return text
         except Exception as e:
-            logger.error(f"Failed to parse image {file_path}: {e}")
+            logger.error("Failed to parse image %s: %s", file_path, e)
             raise DocumentProcessingError(f"Failed to parse image: {e}")
     
+    @staticmethod
+    def requires_ocr(file_path: str) -> bool:
+        """
+        Whether parsing this file goes through the vision model (OCR).
+        
+        Args:
+            file_path: Path to the file
+            
+        Returns:
+            bool: True for image files
+        """
+        return file_path.lower().endswith(IMAGE_EXTENSIONS)
+    
     def parse(self, file_path: str) -> str:
         """
         Auto-detect file type and parse accordingly.
@@ -116,15 +137,15 @@ class FileParser:
         Returns:
             str: Extracted text
         """
-        logger.info(f"Parsing file: {file_path}")
+        logger.info("Parsing file: %s", file_path)
         file_lower = file_path.lower()
         
         if file_lower.endswith('.pdf'):
             return self.parse_pdf(file_path)
         elif file_lower.endswith('.docx'):
             return self.parse_docx(file_path)
-        elif file_lower.endswith(('.png', '.jpg', '.jpeg', '.webp', '.heic', '.heif')):
+        elif file_lower.endswith(IMAGE_EXTENSIONS):
             return self.parse_image(file_path)
         else:
-            logger.error(f"Unsupported file type: {file_path}")
+            logger.error("Unsupported file type: %s", file_path)
             raise UnsupportedFileTypeError(f"Unsupported file type: {file_path}")
@@ -0,0 +1,62 @@
+"""
+Scrubbing of personal data from free text before it is stored.
+
+Pattern based: e-mail addresses, payment card numbers (Luhn-checked),
+national ID / social security style numbers, IP addresses, phone numbers
+and other long digit runs are replaced with placeholders. Names and postal
+addresses are not detected.
+"""
+import re
+
+EMAIL_PATTERN = re.compile(r"\b[\w.+-]+@[\w-]+(?:\.[\w-]+)+\b")
+CARD_PATTERN = re.compile(r"\b\d(?:[ -]?\d){12,18}\b")
+SSN_PATTERN = re.compile(r"\b\d{3}-\d{2}-\d{4}\b")
+IPV4_PATTERN = re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}\b")
+PHONE_PATTERN = re.compile(r"(?<![\w/])\+?\d[\d ().-]{7,}\d\b")
+LONG_NUMBER_PATTERN = re.compile(r"\b\d{9,}\b")
+# Fewer digits than this is a date, year range or citation rather than a phone number
+PHONE_MIN_DIGITS = 9
+
+
+def _luhn_valid(digits: str) -> bool:
+    total = 0
+    for position, digit in enumerate(reversed(digits)):
+        value = int(digit)
+        if position % 2:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return total % 10 == 0
+
+
+def _scrub_card(match: re.Match) -> str:
+    digits = re.sub(r"\D", "", match.group())
+    return "<CARD>" if _luhn_valid(digits) else match.group()
+
+
+def _scrub_phone(match: re.Match) -> str:
+    value = match.group()
+    if sum(character.isdigit() for character in value) < PHONE_MIN_DIGITS:
+        return value
+    # A bare run of digits is more likely an account or ID number
+    return "<NUMBER>" if value.isdigit() else "<PHONE>"
+
+
+def scrub_pii(text: str) -> str:
+    """
+    Replace personal data in a text with placeholders such as <EMAIL>.
+    Short numbers (years, section and case numbers) are kept.
+
+    Args:
+        text: Free text, e.g. a user's question
+
+    Returns:
+        str: The text with personal data replaced
+    """
+    text = EMAIL_PATTERN.sub("<EMAIL>", text)
+    text = CARD_PATTERN.sub(_scrub_card, text)
+    text = SSN_PATTERN.sub("<ID_NUMBER>", text)
+    text = IPV4_PATTERN.sub("<IP>", text)
+    text = PHONE_PATTERN.sub(_scrub_phone, text)
+    return LONG_NUMBER_PATTERN.sub("<NUMBER>", text)
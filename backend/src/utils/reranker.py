@@ -1,67 +1,226 @@
-from sentence_transformers import CrossEncoder
-from typing import List, Tuple
+from collections import OrderedDict
+from threading import Lock
+from typing import List, Tuple, Dict, Any
 from src.core.config import settings
 from src.core.logging_config import get_logger
-from src.core.exceptions import ConfigurationError
+from src.core.exceptions import ConfigurationError, ServiceOverloadedError
+from src.core.admission import admission
+from src.utils.model_backends import load_cross_encoder
+from src.utils.text_normalization import normalize_query, content_hash
 
 logger = get_logger(__name__)
 
+class ScoreCache:
+    """
+    Bounded LRU cache of cross-encoder scores.
+    Keys are (normalized query hash, chunk content hash, model name).
+    """
+
+    def __init__(self, max_size: int = None):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_size: Maximum number of cached scores (defaults to settings.RERANKER_CACHE_SIZE)
+        """
+        self.max_size = max_size if max_size is not None else settings.RERANKER_CACHE_SIZE
+        self._scores = OrderedDict()
+        self._keys_by_chunk = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: Tuple[str, str, str]):
+        """Return the cached score for key (or None), marking it as recently used."""
+        with self._lock:
+            score = self._scores.get(key)
+            if score is None:
+                self.misses += 1
+                return None
+            self._scores.move_to_end(key)
+            self.hits += 1
+            return score
+
+    def put(self, key: Tuple[str, str, str], score: float):
+        """Store a score, evicting the least recently used entries beyond max_size."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._scores[key] = score
+            self._scores.move_to_end(key)
+            self._keys_by_chunk.setdefault(key[1], set()).add(key)
+            while len(self._scores) > self.max_size:
+                evicted, _ = self._scores.popitem(last=False)
+                self._forget_chunk_key(evicted)
+
+    def invalidate_chunks(self, chunk_hashes: List[str]) -> int:
+        """
+        Drop every cached score for the given chunks.
+
+        Args:
+            chunk_hashes: Content hashes of deleted or changed chunks
+
+        Returns:
+            int: Number of cache entries removed
+        """
+        removed = 0
+        with self._lock:
+            for chunk_hash in chunk_hashes:
+                for key in self._keys_by_chunk.pop(chunk_hash, ()):
+                    if self._scores.pop(key, None) is not None:
+                        removed += 1
+            self.invalidations += removed
+        return removed
+
+    def clear(self):
+        """Remove all entries and reset statistics."""
+        with self._lock:
+            self._scores.clear()
+            self._keys_by_chunk.clear()
+            self.hits = self.misses = self.invalidations = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Cache statistics.
+
+        Returns:
+            Dict with size, max_size, hits, misses, hit_rate and invalidations
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._scores),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+    def _forget_chunk_key(self, key):
+        keys = self._keys_by_chunk.get(key[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_chunk[key[1]]
+
 class Reranker:
     """
     Handles re-ranking of retrieved documents using a Cross-Encoder.
     """
-    
-    def __init__(self, model_name: str = None):
+
+    def __init__(self, model_name: str = None, backend: str = None, cache_size: int = None):
         """
         Initialize the CrossEncoder model.
-        
+
         Args:
             model_name: Name of the CrossEncoder model (defaults to settings.RERANKER_MODEL_NAME)
+            backend: Inference backend - 'torch', 'onnx' or 'onnx-int8' (defaults to settings.INFERENCE_BACKEND)
+            cache_size: Maximum number of cached scores (defaults to settings.RERANKER_CACHE_SIZE)
         """
         try:
             model_name = model_name or settings.RERANKER_MODEL_NAME
-            logger.info(f"Loading CrossEncoder model: {model_name}")
-            self.model = CrossEncoder(model_name)
-            logger.info("CrossEncoder model loaded successfully")
+            logger.info("Loading CrossEncoder model: %s", model_name)
+            self.model_name = model_name
+            self.model, self.backend = load_cross_encoder(model_name, backend)
+            self.cache = ScoreCache(cache_size)
+            logger.info("CrossEncoder model loaded successfully (backend=%s)", self.backend)
+        except ConfigurationError:
+            raise
         except Exception as e:
-            logger.error(f"Failed to load CrossEncoder model: {e}")
+            logger.error("Failed to load CrossEncoder model: %s", e)
             raise ConfigurationError(f"Failed to load CrossEncoder model: {e}")
 
     def rerank(self, query: str, documents: List[str], top_k: int = 3) -> List[Tuple[str, float, int]]:
         """
         Re-rank the documents based on relevance to the query.
-        
+        Scores already in the cache are reused; only uncached pairs are scored.
+
         Args:
             query: The user query
             documents: List of document texts
             top_k: Number of top results to return
-            
+
         Returns:
             List of tuples (document_text, score, original_index) sorted by score
         """
-        if not documents:
-            return []
-            
+        return self.rerank_batch([query], [documents], top_k=top_k)[0]
+
+    def rerank_batch(self, queries: List[str], documents_per_query: List[List[str]], top_k: int = 3) -> List[List[Tuple[str, float, int]]]:
+        """
+        Re-rank the candidates of several queries in one cross-encoder pass.
+        Uncached (query, document) pairs of all queries are scored together.
+
+        Args:
+            queries: The user queries
+            documents_per_query: Candidate document texts for each query
+            top_k: Number of top results to return per query
+
+        Returns:
+            One list of (document_text, score, original_index) tuples per query, sorted by score
+        """
+        if not any(documents_per_query):
+            return [[] for _ in queries]
+
         try:
-            # Create pairs of (query, document)
-            pairs = [[query, doc] for doc in documents]
-            
-            # Predict scores
-            scores = self.model.predict(pairs)
-            
+            keys_per_query = []
+            scores_per_query = []
+            missing = []  # (query position, document position)
+            for q, (query, documents) in enumerate(zip(queries, documents_per_query)):
+                query_hash = content_hash(normalize_query(query))
+                keys = [(query_hash, content_hash(doc), self.model_name) for doc in documents]
+                scores = [self.cache.get(key) for key in keys]
+                missing.extend((q, idx) for idx, score in enumerate(scores) if score is None)
+                keys_per_query.append(keys)
+                scores_per_query.append(scores)
+
+            # Predict scores for uncached (query, document) pairs only
+            if missing:
+                pairs = [[queries[q], documents_per_query[q][idx]] for q, idx in missing]
+                with admission.slot("rerank"):
+                    predicted = self.model.predict(pairs)
+                for (q, idx), score in zip(missing, predicted):
+                    scores_per_query[q][idx] = float(score)
+                    self.cache.put(keys_per_query[q][idx], scores_per_query[q][idx])
+
             # Combine docs with scores and original indices
             # Result: (doc_text, score, original_index)
-            results = []
-            for idx, (doc, score) in enumerate(zip(documents, scores)):
-                results.append((doc, float(score), idx))
-            
-            # Sort by score descending
-            ranked_results = sorted(results, key=lambda x: x[1], reverse=True)
-            
-            logger.debug(f"Re-ranked {len(documents)} documents. Top score: {ranked_results[0][1] if ranked_results else 0}")
-            
-            return ranked_results[:top_k]
+            ranked = []
+            for documents, scores in zip(documents_per_query, scores_per_query):
+                results = [(doc, float(score), idx) for idx, (doc, score) in enumerate(zip(documents, scores))]
+                # Sort by score descending
+                ranked.append(sorted(results, key=lambda x: x[1], reverse=True)[:top_k])
+
+            total = sum(len(documents) for documents in documents_per_query)
+            logger.debug("Re-ranked %s documents for %s query(s) (%s cached)",
+                         total, len(queries), total - len(missing))
+
+            return ranked
+        except ServiceOverloadedError:
+            raise
         except Exception as e:
-            logger.error(f"Re-ranking failed: {e}")
+            logger.error("Re-ranking failed: %s", e)
             # Fallback: return original documents with 0 score, preserving order
-            return [(doc, 0.0, idx) for idx, doc in enumerate(documents[:top_k])]
+            return [[(doc, 0.0, idx) for idx, doc in enumerate(documents[:top_k])] for documents in documents_per_query]
+
+    def invalidate_documents(self, documents: List[str]) -> int:
+        """
+        Invalidate cached scores for deleted or changed chunks.
+
+        Args:
+            documents: Texts of the affected chunks
+
+        Returns:
+            int: Number of cache entries removed
+        """
+        removed = self.cache.invalidate_chunks([content_hash(doc) for doc in documents])
+        if removed:
+            logger.debug("Invalidated %s cached re-ranking score(s)", removed)
+        return removed
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """
+        Score cache statistics (size, hits, misses, hit rate).
+        """
+        return self.cache.stats()
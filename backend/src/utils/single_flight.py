@@ -0,0 +1,191 @@
+"""
+Single-flight request coalescing.
+
+Concurrent calls that share a key run the underlying coroutine once; every
+caller awaits (or, for streams, subscribes to) the same in-flight execution.
+The work runs in the first caller's request context; the others take over
+its stage timings when it finishes and log its request ID. A shared stream
+is cancelled as soon as its last subscriber leaves, so an abandoned answer
+does not keep holding its LLM slot.
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+from src.core.exceptions import QueryError
+from src.core.logging_config import get_logger
+from src.core.request_context import RequestTimings, get_request_id, get_timings
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class _Call:
+    """One in-flight execution and the request that started it."""
+    future: asyncio.Future
+    request_id: Optional[str]
+    timings: Optional[RequestTimings]
+
+
+def _share_timings(leader_request_id: Optional[str], leader_timings: Optional[RequestTimings]):
+    timings = get_timings()
+    if timings is not None and leader_timings is not None and timings is not leader_timings:
+        timings.share(leader_timings, leader_request_id)
+
+class _Broadcast:
+    """
+    Fan-out buffer for one streaming execution.
+    Subscribers replay every event from the start, so late joiners see the full stream.
+    """
+
+    def __init__(self):
+        self.events: List[Any] = []
+        self.done = False
+        self.error = None
+        self.task = None
+        self.subscribers = 0
+        self.request_id = get_request_id()
+        self.timings = get_timings()
+        self._condition = asyncio.Condition()
+
+    async def publish(self, event: Any):
+        async with self._condition:
+            self.events.append(event)
+            self._condition.notify_all()
+
+    async def finish(self, error: Exception = None):
+        async with self._condition:
+            self.done = True
+            self.error = error
+            self._condition.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        position = 0
+        while True:
+            async with self._condition:
+                await self._condition.wait_for(lambda: position < len(self.events) or self.done)
+                pending = self.events[position:]
+                position = len(self.events)
+                finished = self.done
+                error = self.error
+            for event in pending:
+                yield event
+            if finished:
+                if error is not None:
+                    raise error
+                return
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight calls.
+    The first caller for a key (the leader) starts the work; callers arriving
+    while it runs share its result instead of starting their own.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._streams: Dict[Hashable, _Broadcast] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.stream_leaders = 0
+        self.stream_coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn once for all concurrent callers with the same key.
+
+        The shared execution is shielded, so a cancelled caller does not
+        cancel the work for the others. Callers that joined it get the stage
+        timings of the caller that started it.
+
+        Args:
+            key: Coalescing key
+            fn: Zero-argument coroutine function producing the result
+
+        Returns:
+            The result of the shared execution
+        """
+        call = self._calls.get(key)
+        if call is None:
+            self.leaders += 1
+            call = _Call(asyncio.ensure_future(fn()), get_request_id(), get_timings())
+            self._calls[key] = call
+            call.future.add_done_callback(lambda done: self._forget(self._calls, key, call))
+            return await asyncio.shield(call.future)
+        self.coalesced += 1
+        logger.info("Coalesced with in-flight request %s", call.request_id)
+        try:
+            return await asyncio.shield(call.future)
+        finally:
+            _share_timings(call.request_id, call.timings)
+
+    async def stream(self, key: Hashable, factory: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """
+        Stream the events of one shared async generator to all concurrent subscribers.
+
+        Args:
+            key: Coalescing key
+            factory: Zero-argument callable returning the async iterator to share
+
+        Yields:
+            Events produced by the shared iterator
+        """
+        broadcast = self._streams.get(key)
+        leader = broadcast is None
+        if leader:
+            self.stream_leaders += 1
+            broadcast = _Broadcast()
+            self._streams[key] = broadcast
+            broadcast.task = asyncio.ensure_future(self._pump(key, broadcast, factory))
+        else:
+            self.stream_coalesced += 1
+            logger.info("Coalesced with in-flight request %s", broadcast.request_id)
+        broadcast.subscribers += 1
+        try:
+            async for event in broadcast.subscribe():
+                yield event
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.task.done():
+                # Nobody is listening any more: stop generating
+                self._forget(self._streams, key, broadcast)
+                broadcast.task.cancel()
+            if not leader:
+                _share_timings(broadcast.request_id, broadcast.timings)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Coalescing statistics.
+
+        Returns:
+            Dict with leader/coalesced counts, coalesce ratio and in-flight counts
+        """
+        total = self.leaders + self.coalesced + self.stream_leaders + self.stream_coalesced
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "stream_leaders": self.stream_leaders,
+            "stream_coalesced": self.stream_coalesced,
+            "coalesced_ratio": (self.coalesced + self.stream_coalesced) / total if total else 0.0,
+            "in_flight": len(self._calls),
+            "in_flight_streams": len(self._streams),
+        }
+
+    async def _pump(self, key: Hashable, broadcast: _Broadcast, factory: Callable[[], AsyncIterator[Any]]):
+        error = None
+        try:
+            async for event in factory():
+                await broadcast.publish(event)
+        except asyncio.CancelledError:
+            # Subscribers still waiting must see an error, not a clean end of stream
+            error = QueryError("The shared answer stream was cancelled")
+            raise
+        except Exception as e:
+            error = e
+        finally:
+            self._forget(self._streams, key, broadcast)
+            await broadcast.finish(error)
+
+    @staticmethod
+    def _forget(registry: Dict[Hashable, Any], key: Hashable, entry: Any):
+        if registry.get(key) is entry:
+            del registry[key]
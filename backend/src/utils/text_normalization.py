@@ -0,0 +1,31 @@
+"""
+Text normalization and hashing helpers shared by caches and request coalescing.
+"""
+import hashlib
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize a query so trivially different spellings map to the same key.
+    Lower-cases the text and collapses all whitespace runs to a single space.
+    
+    Args:
+        text: Raw query text
+        
+    Returns:
+        str: Normalized query
+    """
+    return " ".join(text.lower().split())
+
+
+def content_hash(text: str) -> str:
+    """
+    Stable hash of a piece of text.
+    
+    Args:
+        text: Text to hash
+        
+    Returns:
+        str: Hex-encoded SHA-1 digest
+    """
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
@@ -1,47 +1,206 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+import hashlib
+import json
 import os
+import time
+import uuid
 
 # API Configuration
-API_URL = "http://localhost:8000" # Points to src.api.main:app
+API_URL = os.getenv("LEGALAI_API_URL", "http://localhost:8000")  # Points to src.api.main:app
+CONNECT_TIMEOUT = 5  # Seconds to establish a connection
+READ_TIMEOUT = 120  # Seconds to wait for the next bytes of a response
+UPLOAD_TIMEOUT = 600  # Seconds allowed for sending an upload
+JOB_POLL_INTERVAL = 1.0  # Seconds between ingestion status polls
+RESUMABLE_UPLOAD_THRESHOLD = 32 * 1024 * 1024  # Larger files use the resumable upload protocol
+UPLOAD_PART_SIZE = 8 * 1024 * 1024
+UPLOAD_PART_RETRIES = 5  # Attempts per part before giving up
+
+# Progress weight of each stage a file goes through
+STAGE_PROGRESS = {"pending": 0.0, "save": 0.15, "parse": 0.4, "chunk": 0.5, "embed": 0.8, "store": 0.9, "ingested": 1.0}
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """HTTP session shared by all reruns, reusing pooled keep-alive connections to the API."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+http = get_http_session()
+
+def stream_answer(prompt: str, placeholder) -> str:
+    """Render answer tokens from /query/stream as they arrive and return the final text."""
+    answer, sources = "", []
+    with http.post(
+        f"{API_URL}/query/stream",
+        json={"query": prompt, "session_id": st.session_state.session_id},
+        stream=True,
+        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+    ) as response:
+        if response.status_code != 200:
+            return "Error: Could not get response from API."
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            event = json.loads(line)
+            if event["type"] == "sources":
+                sources = event["sources"]
+            elif event["type"] == "token":
+                answer += event["text"]
+                placeholder.markdown(answer + "▌")
+            elif event["type"] == "error":
+                answer += f"\n\nError: {event['message']}"
+    # Append sources if available
+    if sources:
+        answer += "\n\n**Sources:**\n" + "\n".join([f"- {s}" for s in sources])
+    return answer
+
+def upload_resumable(file) -> dict:
+    """
+    Send a large file in checksummed parts. A part that fails is retried,
+    and a retry first asks the server which parts it already has, so a
+    dropped connection only costs the part in flight.
+    Returns the ingestion job started on completion.
+    """
+    progress = st.progress(0.0, text=f"Uploading {file.name}...")
+    upload = http.post(
+        f"{API_URL}/ingest/uploads",
+        json={"filename": file.name, "size": file.size, "part_size": UPLOAD_PART_SIZE},
+        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+    )
+    upload.raise_for_status()
+    upload = upload.json()
+    missing = upload["missing_parts"]
+    for attempt in range(UPLOAD_PART_RETRIES):
+        for part_number in missing:
+            file.seek((part_number - 1) * upload["part_size"])
+            data = file.read(upload["part_size"])
+            try:
+                http.put(
+                    f"{API_URL}/ingest/uploads/{upload['upload_id']}/parts/{part_number}",
+                    data=data,
+                    headers={"X-Part-SHA256": hashlib.sha256(data).hexdigest()},
+                    timeout=(CONNECT_TIMEOUT, UPLOAD_TIMEOUT),
+                ).raise_for_status()
+            except requests.RequestException:
+                break  # Resume from the server's view of the upload
+            progress.progress(part_number / upload["part_count"], text=f"Uploading {file.name}...")
+        status = http.get(f"{API_URL}/ingest/uploads/{upload['upload_id']}", timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        status.raise_for_status()
+        missing = status.json()["missing_parts"]
+        if not missing:
+            break
+        time.sleep(2 ** attempt)
+    if missing:
+        raise RuntimeError(f"Upload of {file.name} failed: {len(missing)} part(s) could not be sent")
+    progress.empty()
+    response = http.post(f"{API_URL}/ingest/uploads/{upload['upload_id']}/complete", timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    response.raise_for_status()
+    return response.json()["job"]
+
+def run_ingest_job(files):
+    """Upload files as a background ingestion job and show per-file progress until it finishes."""
+    response = http.post(
+        f"{API_URL}/ingest/jobs",
+        files=[("files", (file.name, file, file.type)) for file in files],
+        timeout=(CONNECT_TIMEOUT, UPLOAD_TIMEOUT),
+    )
+    if response.status_code != 202:
+        st.error(f"Error: {response.text}")
+        return None
+    return poll_ingest_job(response.json())
+
+def poll_ingest_job(job):
+    """Show a job's per-file progress until it finishes and return its final status."""
+    overall = st.progress(0.0, text="Processing...")
+    file_status = st.empty()
+    while True:
+        files_done = sum(
+            1.0 if f["status"] == "failed" else STAGE_PROGRESS.get(f["stage"], 0.0)
+            for f in job["files"]
+        )
+        overall.progress(
+            files_done / max(1, job["total_files"]),
+            text=f"Processed {job['completed_files']} of {job['total_files']} file(s)",
+        )
+        file_status.markdown("\n".join(
+            f"- {'❌' if f['status'] == 'failed' else '✅' if f['status'] == 'ingested' else '⏳'} "
+            f"{f['filename']}: {f['error'] if f['status'] == 'failed' else f['stage']}"
+            for f in job["files"]
+        ))
+        if job["status"] in ("completed", "failed", "interrupted"):
+            return job
+        time.sleep(JOB_POLL_INTERVAL)
+        response = http.get(f"{API_URL}/ingest/jobs/{job['job_id']}", timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        if response.status_code == 200:
+            job = response.json()
 
 st.set_page_config(page_title="Legal AI Doc Assistant", layout="wide")
 
 st.title("⚖️ Legal AI Doc Assistant")
 st.markdown("### Your AI Advocate & Legal Advisor")
 
+# Files already sent in this browser session (name, size), so they are not uploaded again
+if "uploaded" not in st.session_state:
+    st.session_state.uploaded = set()
+
 # Sidebar for configuration and file upload
 with st.sidebar:
     st.header("Configuration")
     # API Key is now handled by the backend, but we might want to pass it or keep it there.
     # For now, let's assume the backend has the key from .env
-    
+
     st.header("Upload Documents")
     uploaded_files = st.file_uploader(
-        "Upload PDF, DOCX, or Images", 
-        accept_multiple_files=True, 
+        "Upload PDF, DOCX, or Images",
+        accept_multiple_files=True,
         type=["pdf", "docx", "png", "jpg", "jpeg", "webp"]
     )
-    
+
     if st.button("Process Documents"):
-        if uploaded_files:
-            with st.spinner("Uploading and processing..."):
-                try:
-                    files = [("files", (file.name, file, file.type)) for file in uploaded_files]
-                    response = requests.post(f"{API_URL}/ingest", files=files)
-                    if response.status_code == 200:
-                        data = response.json()
-                        st.success(f"✅ Successfully processed {data['total_files']} file(s): {', '.join(data['files_ingested'])}")
-                    else:
-                        st.error(f"Error: {response.text}")
-                except Exception as e:
-                    st.error(f"Failed to connect to API: {e}")
+        new_files = [f for f in uploaded_files or [] if (f.name, f.size) not in st.session_state.uploaded]
+        if new_files:
+            try:
+                small_files = [f for f in new_files if f.size <= RESUMABLE_UPLOAD_THRESHOLD]
+                jobs = [run_ingest_job(small_files)] if small_files else []
+                for large_file in (f for f in new_files if f.size > RESUMABLE_UPLOAD_THRESHOLD):
+                    jobs.append(poll_ingest_job(upload_resumable(large_file)))
+                for job in jobs:
+                    if job and job["status"] == "completed":
+                        result = job["result"]
+                        ingested = set(result["files_ingested"])
+                        st.session_state.uploaded.update((f.name, f.size) for f in new_files if f.name in ingested)
+                        if result["success_count"]:
+                            st.success(f"✅ Successfully processed {result['success_count']} of {result['total_files']} file(s): {', '.join(result['files_ingested'])}")
+                        for failure in result["files_failed"]:
+                            st.error(f"{failure['filename']}: {failure['error']}")
+                    elif job:
+                        st.error(f"Error: {job.get('error')}")
+            except Exception as e:
+                st.error(f"Failed to connect to API: {e}")
+        elif uploaded_files:
+            st.info("These files were already processed.")
         else:
             st.warning("Please upload files first.")
 
 # Main chat interface
 if "messages" not in st.session_state:
     st.session_state.messages = []
+# Lets the backend reuse retrieval across follow-up questions
+if "session_id" not in st.session_state:
+    st.session_state.session_id = str(uuid.uuid4())
+
+with st.sidebar:
+    if st.button("New Conversation"):
+        try:
+            http.delete(f"{API_URL}/query/session/{st.session_state.session_id}", timeout=(CONNECT_TIMEOUT, 5))
+        except Exception:
+            pass  # The session expires on its own
+        st.session_state.messages = []
+        st.session_state.session_id = str(uuid.uuid4())
 
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
@@ -52,20 +211,12 @@ if prompt := st.chat_input("Ask for legal advice..."):
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    with st.spinner("Thinking..."):
+    with st.chat_message("assistant"):
+        placeholder = st.empty()
+        placeholder.markdown("Thinking...")
         try:
-            response = requests.post(f"{API_URL}/query", json={"query": prompt})
-            if response.status_code == 200:
-                data = response.json()
-                bot_response = data["response"]
-                # Append sources if available
-                if data.get("sources"):
-                    bot_response += "\n\n**Sources:**\n" + "\n".join([f"- {s}" for s in data["sources"]])
-            else:
-                bot_response = "Error: Could not get response from API."
+            bot_response = stream_answer(prompt, placeholder)
         except Exception as e:
             bot_response = f"Error: Failed to connect to API. Is it running? ({e})"
-    
-    with st.chat_message("assistant"):
-        st.markdown(bot_response)
+        placeholder.markdown(bot_response)
     st.session_state.messages.append({"role": "assistant", "content": bot_response})